@@ -20,9 +20,16 @@
 
 import os
 import os.path
+import stat
 import tempfile
+import time
 import re
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 DOCUMENTATION = '''
 ---
 module: assemble
@@ -92,6 +99,16 @@ options:
     required: false
     default: null
     version_added: "2.0"
+  manifest:
+    description:
+      - Path of a file recording the fragments C(dest) was last assembled from, keyed on their
+        names, sizes, inodes, mtimes and ctimes and on the C(delimiter).
+      - When none of the fragments changed and C(dest) was not modified since the last run,
+        the fragments are not read and no temporary file is written.
+      - Should not be placed in C(src), or it would be assembled as a fragment.
+    required: false
+    default: null
+    version_added: "2.3"
 author: "Stephen Fromm (@sfromm)"
 extends_documentation_fragment:
     - files
@@ -106,50 +123,146 @@ EXAMPLES = '''
 
 # Copy a new "sshd_config" file into place, after passing validation with sshd
 - assemble: src=/etc/ssh/conf.d/ dest=/etc/ssh/sshd_config validate='/usr/sbin/sshd -t -f %s'
+
+# Skip reading thousands of fragments when none of them changed since the last run
+- assemble: src=/etc/someapp/fragments dest=/etc/someapp/someapp.conf manifest=/var/lib/someapp/someapp.conf.manifest
 '''
 
 # ===========================================
 # Support method
 
-def assemble_from_fragments(src_path, delimiter=None, compiled_regexp=None, ignore_hidden=False):
-    ''' assemble a file from a directory of fragments '''
-    tmpfd, temp_path = tempfile.mkstemp()
-    tmp = os.fdopen(tmpfd,'w')
-    delimit_me = False
-    add_newline = False
+# size of the chunks fragments are copied and hashed in
+BUFSIZE = 65536
 
+
+def list_fragments(src_path, compiled_regexp=None, ignore_hidden=False):
+    ''' return the fragments to assemble in order, as (path, stat) pairs '''
+    fragments = []
     for f in sorted(os.listdir(src_path)):
         if compiled_regexp and not compiled_regexp.search(f):
             continue
+        if ignore_hidden and f.startswith('.'):
+            continue
         fragment = "%s/%s" % (src_path, f)
-        if not os.path.isfile(fragment) or (ignore_hidden and os.path.basename(fragment).startswith('.')):
+        try:
+            st = os.stat(fragment)
+        except OSError:
             continue
-        fragment_content = file(fragment).read()
-
-        # always put a newline between fragments if the previous fragment didn't end with a newline.
-        if add_newline:
-            tmp.write('\n')
-
-        # delimiters should only appear between fragments
-        if delimit_me:
-            if delimiter:
-                # un-escape anything like newlines
-                delimiter = delimiter.decode('unicode-escape')
-                tmp.write(delimiter)
-                # always make sure there's a newline after the
-                # delimiter, so lines don't run together
-                if delimiter[-1] != '\n':
-                    tmp.write('\n')
+        if not stat.S_ISREG(st.st_mode):
+            continue
+        fragments.append((fragment, st))
+    return fragments
+
+def stat_key(st):
+    ''' identify a version of a file by its metadata '''
+    stamps = []
+    for name in ('mtime', 'ctime'):
+        ns = getattr(st, 'st_%s_ns' % name, None)
+        if ns is None:
+            ns = int(getattr(st, 'st_%s' % name) * 1000000000)
+        stamps.append(ns)
+    return '%d:%d:%d:%d:%d' % (st.st_dev, st.st_ino, st.st_size, stamps[0], stamps[1])
+
+def fragments_digest(fragments, delimiter=None):
+    ''' digest of the fragment metadata, changes whenever the assembled file could '''
+    digest = AVAILABLE_HASH_ALGORITHMS['sha1']()
+    digest.update(to_bytes(repr(delimiter), errors='surrogate_or_strict'))
+    for fragment, st in fragments:
+        digest.update(b('\0'))
+        digest.update(to_bytes(fragment, errors='surrogate_or_strict'))
+        digest.update(b('\0' + stat_key(st)))
+    return digest.hexdigest()
+
+def assemble_from_fragments(fragments, delimiter=None):
+    '''
+    assemble a file from fragments, copying them in chunks and hashing on the way.
+    returns the path of the assembled file and its sha1 and md5 (None on FIPS systems)
+    '''
+    tmpfd, temp_path = tempfile.mkstemp()
+    tmp = os.fdopen(tmpfd,'wb')
+    sha1 = AVAILABLE_HASH_ALGORITHMS['sha1']()
+    try:
+        md5 = AVAILABLE_HASH_ALGORITHMS['md5']()
+    except (KeyError, ValueError):
+        # md5 raises ValueError on FIPS enabled systems
+        md5 = None
 
-        tmp.write(fragment_content)
-        delimit_me = True
-        if fragment_content.endswith('\n'):
-            add_newline = False
-        else:
-            add_newline = True
+    def write(data):
+        tmp.write(data)
+        sha1.update(data)
+        if md5 is not None:
+            md5.update(data)
 
-    tmp.close()
-    return temp_path
+    if delimiter:
+        # un-escape anything like newlines
+        delimiter = to_bytes(to_bytes(delimiter, errors='surrogate_or_strict').decode('unicode-escape'), errors='surrogate_or_strict')
+
+    delimit_me = False
+    add_newline = False
+    try:
+        for fragment, st in fragments:
+            # always put a newline between fragments if the previous fragment didn't end with a newline.
+            if add_newline:
+                write(b('\n'))
+
+            # delimiters should only appear between fragments
+            if delimit_me and delimiter:
+                write(delimiter)
+                # always make sure there's a newline after the
+                # delimiter, so lines don't run together
+                if not delimiter.endswith(b('\n')):
+                    write(b('\n'))
+
+            last = b('')
+            f = open(fragment, 'rb')
+            try:
+                data = f.read(BUFSIZE)
+                while data:
+                    write(data)
+                    last = data
+                    data = f.read(BUFSIZE)
+            finally:
+                f.close()
+
+            delimit_me = True
+            add_newline = not last.endswith(b('\n'))
+    finally:
+        tmp.close()
+
+    if md5 is not None:
+        md5 = md5.hexdigest()
+    return temp_path, sha1.hexdigest(), md5
+
+def load_manifest(path):
+    ''' the manifest of the previous run, or an empty one '''
+    try:
+        f = open(path, 'r')
+        try:
+            manifest = json.load(f)
+        finally:
+            f.close()
+        if isinstance(manifest, dict):
+            return manifest
+    except (IOError, OSError, ValueError):
+        pass
+    return {}
+
+def save_manifest(path, manifest, result):
+    ''' write the manifest atomically, failing to is not fatal '''
+    try:
+        manifest_dir = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(manifest_dir):
+            os.makedirs(manifest_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=manifest_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(manifest, f)
+        finally:
+            f.close()
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        e = get_exception()
+        result.setdefault('warnings', []).append('Unable to write manifest (%s): %s' % (path, str(e)))
 
 def cleanup(path, result=None):
     # cleanup just in case
@@ -178,6 +291,7 @@ def main():
             regexp = dict(required=False),
             ignore_hidden = dict(default=False, type='bool'),
             validate = dict(required=False, type='str'),
+            manifest = dict(required=False, type='path'),
         ),
         add_file_common_args=True
     )
@@ -193,6 +307,7 @@ def main():
     compiled_regexp = None
     ignore_hidden = module.params['ignore_hidden']
     validate = module.params.get('validate', None)
+    manifest_path = module.params['manifest']
 
     result = dict(src=src, dest=dest)
     if not os.path.exists(src):
@@ -211,45 +326,70 @@ def main():
     if validate and "%s" not in validate:
         module.fail_json(msg="validate must contain %%s: %s" % validate)
 
-    path = assemble_from_fragments(src, delimiter, compiled_regexp, ignore_hidden)
-    path_hash = module.sha1(path)
-    result['checksum'] = path_hash
-
-    # Backwards compat.  This won't return data if FIPS mode is active
-    try:
-        pathmd5 = module.md5(path)
-    except ValueError:
-        pathmd5 = None
-    result['md5sum'] = pathmd5
+    fragments = list_fragments(src, compiled_regexp, ignore_hidden)
+    digest = fragments_digest(fragments, delimiter)
 
+    dest_st = None
     if os.path.exists(dest):
-        dest_hash = module.sha1(dest)
-
-    if path_hash != dest_hash:
-        if validate:
-            (rc, out, err) = module.run_command(validate % path)
-            result['validation'] = dict(rc=rc, stdout=out, stderr=err)
-            if rc != 0:
-                cleanup(path)
-                module.fail_json(msg="failed to validate: rc:%s error:%s" % (rc, err))
-        if backup and dest_hash is not None:
-            result['backup_file'] = module.backup_local(dest)
-
-        module.atomic_move(path, dest, unsafe_writes=module.params['unsafe_writes'])
-        changed = True
-
-    cleanup(path, result)
+        dest_st = os.stat(dest)
+
+    manifest = {}
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+
+    if (dest_st is not None and manifest.get('fragments') == digest
+            and manifest.get('dest') == stat_key(dest_st) and manifest.get('checksum')):
+        # nothing changed since dest was last assembled
+        result['checksum'] = manifest['checksum']
+        result['md5sum'] = manifest.get('md5sum')
+    else:
+        path, path_hash, pathmd5 = assemble_from_fragments(fragments, delimiter)
+        result['checksum'] = path_hash
+        # Backwards compat.  This won't return data if FIPS mode is active
+        result['md5sum'] = pathmd5
+
+        # a dest of another size cannot have the same content
+        if dest_st is not None and dest_st.st_size == os.path.getsize(path):
+            dest_hash = module.sha1(dest)
+
+        if path_hash != dest_hash:
+            if validate:
+                (rc, out, err) = module.run_command(validate % path)
+                result['validation'] = dict(rc=rc, stdout=out, stderr=err)
+                if rc != 0:
+                    cleanup(path)
+                    module.fail_json(msg="failed to validate: rc:%s error:%s" % (rc, err))
+            if backup and dest_st is not None:
+                result['backup_file'] = module.backup_local(dest)
+
+            module.atomic_move(path, dest, unsafe_writes=module.params['unsafe_writes'])
+            changed = True
+
+        cleanup(path, result)
 
     # handle file permissions
     file_args = module.load_file_common_arguments(module.params)
     result['changed'] = module.set_fs_attributes_if_different(file_args, changed)
 
+    # a fragment modified within the timestamp granularity could change again without
+    # its stat changing, do not record those
+    now = time.time()
+    if manifest_path and not [f for f, st in fragments if now - st.st_mtime <= 2]:
+        # stat dest last, the attributes above change its ctime
+        new_manifest = dict(fragments=digest, dest=stat_key(os.stat(dest)),
+                            checksum=result['checksum'], md5sum=result['md5sum'])
+        if new_manifest != manifest:
+            save_manifest(manifest_path, new_manifest, result)
+
     # Mission complete
     result['msg'] = "OK"
     module.exit_json(**result)
 
 # import module snippets
 from ansible.module_utils.basic import *
+from ansible.module_utils.pycompat24 import get_exception
+from ansible.module_utils.six import b
+from ansible.module_utils._text import to_bytes
 
 main()
 
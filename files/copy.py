@@ -77,7 +77,10 @@ options:
   remote_src:
     description:
       - If False, it will search for src at originating/master machine, if True it will go to the remote/target machine for the src. Default is False.
-      - Currently remote_src does not support recursive copying.
+      - If src is a directory, it is copied recursively, since version 2.3. If it ends with "/" only
+        its contents are copied into dest, otherwise the directory itself is. Only files whose size
+        or mtime differ are considered, and files that only differ in mtime are compared by checksum
+        before they are copied.
     choices: [ "True", "False" ]
     required: false
     default: "no"
@@ -89,6 +92,14 @@ options:
     version_added: "1.8"
     description:
       - 'This flag indicates that filesystem links, if they exist, should be followed.'
+  checksum_cache:
+    description:
+      - Path of an on-host cache of file checksums. Files are keyed on their device, inode, size,
+        mtime and ctime, so an unchanged C(src) or C(dest) is not read again to compare them.
+      - The same cache can be shared with the M(stat) and M(get_url) modules.
+    required: false
+    default: null
+    version_added: "2.3"
 extends_documentation_fragment:
     - files
     - validate
@@ -115,6 +126,12 @@ EXAMPLES = '''
 
 # Copy a new "sudoers" file into place, after passing validation with visudo
 - copy: src=/mine/sudoers dest=/etc/sudoers validate='visudo -cf %s'
+
+# Sync a directory already on the target, only copying the files that changed
+- copy: src=/srv/release/current/ dest=/opt/app remote_src=yes
+
+# Copy a large image already on the target, without rehashing it when neither side changed
+- copy: src=/srv/images/base.qcow2 dest=/var/lib/libvirt/images/base.qcow2 remote_src=yes checksum_cache=/var/cache/ansible/checksums
 '''
 
 RETURN = '''
@@ -178,19 +195,228 @@ state:
     returned: success
     type: string
     sample: "file"
+changed_files:
+    description: paths relative to dest that were created or rewritten, when src is a directory
+    returned: success, when remote_src=yes and src is a directory
+    type: list
+    sample: [ "conf", "conf/app.ini" ]
+backup_files:
+    description: names of the backup files created of the files replaced, when src is a directory
+    returned: changed and if backup=yes, when remote_src=yes and src is a directory
+    type: list
+    sample: [ "/path/to/conf/app.ini.2015-02-12@22:09~" ]
 '''
 
+import errno
 import os
 import shutil
+import stat
+import sys
 import tempfile
+import time
 import traceback
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # import module snippets
-from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.basic import AnsibleModule, AVAILABLE_HASH_ALGORITHMS
 from ansible.module_utils.pycompat24 import get_exception
+from ansible.module_utils.six import b
 from ansible.module_utils._text import to_bytes, to_native
 
 
+# read size when hashing, large enough to keep syscall overhead low on big files
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def digest_file(module, path, algorithms):
+    '''
+    Compute several digests of path, feeding every hash object from the same buffered read.
+    Returns a dict of algorithm to hex digest, md5 is None when unavailable (FIPS), and the bytes read.
+    '''
+    hashes = {}
+    results = {}
+    for algorithm in algorithms:
+        try:
+            hashes[algorithm] = AVAILABLE_HASH_ALGORITHMS[algorithm]()
+        except (KeyError, ValueError):
+            # md5 raises ValueError on FIPS enabled systems
+            if algorithm != 'md5':
+                module.fail_json(msg="Could not hash file '%s' with algorithm '%s'. Available algorithms: %s" %
+                                     (path, algorithm, ', '.join(AVAILABLE_HASH_ALGORITHMS)))
+            results[algorithm] = None
+
+    read = 0
+    f = open(path, 'rb')
+    try:
+        data = f.read(HASH_BUFFER_SIZE)
+        while data:
+            for h in hashes.values():
+                h.update(data)
+            read += len(data)
+            data = f.read(HASH_BUFFER_SIZE)
+    finally:
+        f.close()
+
+    for algorithm, h in hashes.items():
+        results[algorithm] = h.hexdigest()
+    return results, read
+
+
+class ChecksumCache(object):
+    '''
+    Optional on-host store of file digests, so files that did not change are not hashed again.
+    The stat, copy and get_url modules share the same store. This class and digest_file() are
+    copied verbatim into each of them, files/stat.py holds the canonical copy: change it there
+    and copy it over.
+    '''
+
+    # entries kept, the least recently used ones are dropped first
+    max_entries = 4096
+
+    def __init__(self, module, path=None):
+        self.module = module
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        # bytes read and seconds spent hashing by the last digests() call
+        self.read = 0
+        self.elapsed = 0.0
+        if path is None:
+            return
+        try:
+            f = open(path, 'r')
+            try:
+                entries = json.load(f)
+            finally:
+                f.close()
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (IOError, OSError, ValueError):
+            # missing or unreadable, it is only a cache
+            pass
+
+    def _key(self, st, algorithm):
+        stamps = []
+        for name in ('mtime', 'ctime'):
+            ns = getattr(st, 'st_%s_ns' % name, None)
+            if ns is None:
+                ns = int(getattr(st, 'st_%s' % name) * 1000000000)
+            stamps.append(ns)
+        return '%d:%d:%d:%d:%d:%s' % (st.st_dev, st.st_ino, st.st_size, stamps[0], stamps[1], algorithm)
+
+    def _compute(self, filename, algorithm):
+        if algorithm == 'md5':
+            # keeps raising ValueError on FIPS enabled systems
+            return self.module.md5(filename)
+        return self.module.digest_from_file(filename, algorithm)
+
+    def digest(self, filename, algorithm='sha1'):
+        ''' Return the hex digest of filename, only reading the file when the cache has no entry for it. '''
+        if self.path is None:
+            return self._compute(filename, algorithm)
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return self._compute(filename, algorithm)
+
+        now = time.time()
+        key = self._key(st, algorithm)
+        entry = self.entries.get(key)
+        if entry is not None:
+            # only rewrite the store for access times once in a while
+            if now - entry[1] > 3600:
+                entry[1] = now
+                self.dirty = True
+            return entry[0]
+
+        value = self._compute(filename, algorithm)
+        # a file modified within the timestamp granularity could change again without its
+        # stat changing, do not trust those
+        if value is not None and now - st.st_mtime > 2:
+            self.entries[key] = [value, now]
+            self.dirty = True
+        return value
+
+    def digests(self, filename, algorithms):
+        '''
+        Return a dict of the hex digests of filename, hashing all the ones the cache has no entry
+        for in a single read. The bytes read and the seconds it took are left in read and elapsed.
+        '''
+        st = None
+        if self.path is not None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                pass
+
+        now = time.time()
+        self.read = 0
+        self.elapsed = 0.0
+        results = {}
+        keys = {}
+        missing = []
+        for algorithm in algorithms:
+            if st is not None:
+                keys[algorithm] = self._key(st, algorithm)
+                entry = self.entries.get(keys[algorithm])
+                if entry is not None:
+                    # only rewrite the store for access times once in a while
+                    if now - entry[1] > 3600:
+                        entry[1] = now
+                        self.dirty = True
+                    results[algorithm] = entry[0]
+                    continue
+            missing.append(algorithm)
+
+        if not missing:
+            return results
+
+        computed, self.read = digest_file(self.module, filename, missing)
+        self.elapsed = time.time() - now
+        for algorithm, value in computed.items():
+            results[algorithm] = value
+            # a file modified within the timestamp granularity could change again without its
+            # stat changing, do not trust those
+            if value is not None and st is not None and now - st.st_mtime > 2:
+                self.entries[keys[algorithm]] = [value, now]
+                self.dirty = True
+        return results
+
+    def save(self):
+        ''' Write the store back if anything changed, dropping the oldest entries past max_entries. '''
+        if self.path is None or not self.dirty:
+            return
+
+        if len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda item: item[1][1])[-self.max_entries:]
+            self.entries = dict(keep)
+
+        try:
+            cache_dir = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(self.entries, f)
+            finally:
+                f.close()
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+        self.dirty = False
+
+
 def split_pre_existing_dir(dirname):
     '''
     Return the first pre-existing directory and a list of the new directories that will be created.
@@ -219,6 +445,176 @@ def adjust_recursive_directory_permissions(pre_existing_dir, new_directory_list,
     return changed
 
 
+# Below this size the syscalls of a zero-copy transfer cost more than they save
+SENDFILE_MIN_SIZE = 1024 * 1024
+# ioctl sharing the extents of one file with another on btrfs, xfs and other CoW filesystems
+FICLONE = 0x40049409
+# errors telling a zero-copy method is not available for this pair of files
+ZERO_COPY_ERRNOS = [ errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.ENOTTY ]
+for name in ('ENOTSUP', 'EOPNOTSUPP'):
+    if hasattr(errno, name):
+        ZERO_COPY_ERRNOS.append(getattr(errno, name))
+
+
+def copy_file_data(b_src, b_dest):
+    '''
+    Copy the contents of b_src to b_dest, letting the kernel move the data for large files where it can:
+    a reflink on copy-on-write filesystems, then copy_file_range(), then sendfile(), then read/write.
+    '''
+
+    fsrc = open(b_src, 'rb')
+    try:
+        fdest = open(b_dest, 'wb')
+        try:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            if size >= SENDFILE_MIN_SIZE:
+                if fcntl is not None and sys.platform.startswith('linux'):
+                    try:
+                        fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+                        offset = size
+                    except (IOError, OSError):
+                        e = get_exception()
+                        if e.errno not in ZERO_COPY_ERRNOS:
+                            raise
+
+                for method in ('copy_file_range', 'sendfile'):
+                    if offset >= size or not hasattr(os, method):
+                        continue
+                    try:
+                        while offset < size:
+                            if method == 'copy_file_range':
+                                sent = os.copy_file_range(fsrc.fileno(), fdest.fileno(), size - offset, offset, offset)
+                            else:
+                                sent = os.sendfile(fdest.fileno(), fsrc.fileno(), offset, size - offset)
+                            if sent == 0:
+                                break
+                            offset += sent
+                    except OSError:
+                        e = get_exception()
+                        # older kernels lack these for regular files, or across filesystems
+                        if offset or e.errno not in ZERO_COPY_ERRNOS:
+                            raise
+
+            if offset < size:
+                fsrc.seek(offset)
+                fdest.seek(offset)
+                shutil.copyfileobj(fsrc, fdest, SENDFILE_MIN_SIZE)
+        finally:
+            fdest.close()
+    finally:
+        fsrc.close()
+
+
+def tree_manifest(b_root):
+    '''
+    Return a dict of every path below b_root, relative to it, and its lstat result. Symlinked directories are not followed.
+    '''
+
+    manifest = {}
+    if not os.path.isdir(b_root):
+        return manifest
+    for b_dirpath, b_dirnames, b_filenames in os.walk(b_root):
+        for b_name in b_dirnames + b_filenames:
+            b_path = os.path.join(b_dirpath, b_name)
+            manifest[os.path.relpath(b_path, b_root)] = os.lstat(b_path)
+    return manifest
+
+
+def copy_tree(module, b_src, b_dest, cache):
+    '''
+    Copy the tree at b_src over b_dest, only writing what differs, and return the relative paths that changed
+    and the backups made of the files replaced. Files with the same size and mtime are considered equal,
+    same size but different mtime is settled by checksum. Without force, nothing that exists in b_dest is replaced.
+    '''
+
+    src_manifest = tree_manifest(b_src)
+    dest_manifest = tree_manifest(b_dest)
+
+    force = module.params['force']
+    changed = []
+    backups = []
+    if not os.path.isdir(b_dest):
+        if os.path.lexists(b_dest):
+            module.fail_json(msg="Destination %s exists, but is not a directory" % to_native(b_dest, errors='surrogate_or_strict'))
+        changed.append('.')
+        if not module.check_mode:
+            os.makedirs(b_dest)
+
+    # Sorted, so every directory is handled before its contents
+    for b_relpath in sorted(src_manifest):
+        st = src_manifest[b_relpath]
+        dest_st = dest_manifest.get(b_relpath)
+        b_srcpath = os.path.join(b_src, b_relpath)
+        b_destpath = os.path.join(b_dest, b_relpath)
+        relpath = to_native(b_relpath, errors='surrogate_or_strict')
+
+        if stat.S_ISDIR(st.st_mode):
+            if dest_st is not None and stat.S_ISDIR(dest_st.st_mode):
+                continue
+            if dest_st is not None:
+                module.fail_json(msg="Destination %s exists, but is not a directory" % to_native(b_destpath, errors='surrogate_or_strict'))
+            changed.append(relpath)
+            if not module.check_mode:
+                os.mkdir(b_destpath)
+                shutil.copystat(b_srcpath, b_destpath)
+            continue
+
+        if dest_st is not None and not force:
+            continue
+
+        if dest_st is not None and stat.S_ISDIR(dest_st.st_mode):
+            module.fail_json(msg="Destination %s is a directory, but %s is not" % (to_native(b_destpath, errors='surrogate_or_strict'), relpath))
+
+        if stat.S_ISLNK(st.st_mode):
+            b_target = os.readlink(b_srcpath)
+            if dest_st is not None and stat.S_ISLNK(dest_st.st_mode) and os.readlink(b_destpath) == b_target:
+                continue
+            changed.append(relpath)
+            if not module.check_mode:
+                if dest_st is not None:
+                    os.unlink(b_destpath)
+                os.symlink(b_target, b_destpath)
+            continue
+
+        if not stat.S_ISREG(st.st_mode):
+            # sockets, fifos and devices are not copied
+            continue
+
+        if dest_st is not None and stat.S_ISREG(dest_st.st_mode) and dest_st.st_size == st.st_size:
+            if int(dest_st.st_mtime) == int(st.st_mtime):
+                continue
+            # Only same sized files with a different mtime are worth reading
+            if cache.digest(to_native(b_srcpath, errors='surrogate_or_strict')) == cache.digest(to_native(b_destpath, errors='surrogate_or_strict')):
+                continue
+
+        changed.append(relpath)
+        if not module.check_mode:
+            if dest_st is not None and stat.S_ISLNK(dest_st.st_mode):
+                os.unlink(b_destpath)
+            elif dest_st is not None and module.params['backup']:
+                backups.append(module.backup_local(to_native(b_destpath, errors='surrogate_or_strict')))
+            fd, b_tmppath = tempfile.mkstemp(dir=os.path.dirname(b_destpath))
+            os.close(fd)
+            copy_file_data(b_srcpath, b_tmppath)
+            if dest_st is None:
+                # a new file has no context or ownership to keep, renaming the
+                # temporary file from the same directory is enough
+                os.rename(b_tmppath, b_destpath)
+            else:
+                module.atomic_move(b_tmppath, to_native(b_destpath, errors='surrogate_or_strict'), unsafe_writes=module.params['unsafe_writes'])
+            shutil.copystat(b_srcpath, b_destpath)
+
+    # Copying files into a directory alters its mtime, restore those of the new ones
+    if not module.check_mode:
+        for relpath in reversed(changed):
+            b_srcpath = os.path.join(b_src, to_bytes(relpath, errors='surrogate_or_strict'))
+            if os.path.isdir(b_srcpath) and not os.path.islink(b_srcpath):
+                shutil.copystat(b_srcpath, os.path.join(b_dest, to_bytes(relpath, errors='surrogate_or_strict')))
+
+    return changed, backups
+
+
 def main():
 
     module = AnsibleModule(
@@ -233,6 +629,7 @@ def main():
             validate          = dict(required=False, type='str'),
             directory_mode    = dict(required=False),
             remote_src        = dict(required=False, type='bool'),
+            checksum_cache    = dict(required=False, type='path'),
         ),
         add_file_common_args=True,
         supports_check_mode=True,
@@ -254,16 +651,50 @@ def main():
         module.fail_json(msg="Source %s not found" % (src))
     if not os.access(b_src, os.R_OK):
         module.fail_json(msg="Source %s not readable" % (src))
+
+    cache = ChecksumCache(module, module.params['checksum_cache'])
+
     if os.path.isdir(b_src):
-        module.fail_json(msg="Remote copy does not support recursive copy of directory: %s" % (src))
+        if not remote_src:
+            module.fail_json(msg="Remote copy does not support recursive copy of directory: %s" % (src))
+        if validate:
+            module.fail_json(msg="validate is not supported when copying a directory: %s" % (src))
+
+        # Like the local recursive copy, a trailing slash copies the contents
+        # of the directory rather than the directory itself
+        if not src.endswith(os.sep):
+            dest = os.path.join(dest, os.path.basename(src))
+            b_dest = to_bytes(dest, errors='surrogate_or_strict')
+        changed_files, backup_files = copy_tree(module, b_src, b_dest, cache)
+        cache.save()
+
+        res_args = dict(dest=dest, src=src, changed=len(changed_files) > 0, changed_files=changed_files)
+        if backup_files:
+            res_args['backup_files'] = backup_files
+        if not module.check_mode:
+            # owner, group and mode apply to everything copied, directory_mode to the directories
+            file_args = module.load_file_common_arguments(module.params)
+            directory_mode = module.params['directory_mode']
+            for b_dirpath, b_dirnames, b_filenames in os.walk(b_src):
+                b_destdir = os.path.join(b_dest, os.path.relpath(b_dirpath, b_src))
+                for b_name in [b('.')] + b_dirnames + b_filenames:
+                    b_path = os.path.normpath(os.path.join(b_destdir, b_name))
+                    if os.path.islink(b_path):
+                        continue
+                    file_args['path'] = to_native(b_path, errors='surrogate_or_strict')
+                    if os.path.isdir(b_path):
+                        file_args['mode'] = directory_mode
+                    else:
+                        file_args['mode'] = mode
+                    res_args['changed'] = module.set_fs_attributes_if_different(file_args, res_args['changed'])
+        module.exit_json(**res_args)
 
-    checksum_src = module.sha1(src)
+    # Both digests of src come from a single read. md5 is backwards compat
+    # only, it will be None in FIPS mode
+    digests = cache.digests(src, ['sha1', 'md5'])
+    checksum_src = digests['sha1']
+    md5sum_src = digests['md5']
     checksum_dest = None
-    # Backwards compat only.  This will be None in FIPS mode
-    try:
-        md5sum_src = module.md5(src)
-    except ValueError:
-        md5sum_src = None
 
     changed = False
 
@@ -296,8 +727,9 @@ def main():
                 basename = original_basename
             dest = os.path.join(dest, basename)
             b_dest = to_bytes(dest, errors='surrogate_or_strict')
-        if os.access(b_dest, os.R_OK):
-            checksum_dest = module.sha1(dest)
+        # A file of another size differs, only read dest when the size cannot tell
+        if os.access(b_dest, os.R_OK) and os.path.getsize(b_dest) == os.path.getsize(b_src):
+            checksum_dest = cache.digest(dest)
     else:
         if not os.path.exists(os.path.dirname(b_dest)):
             try:
@@ -314,6 +746,8 @@ def main():
     if not os.access(os.path.dirname(b_dest), os.W_OK):
         module.fail_json(msg="Destination %s not writable" % (os.path.dirname(dest)))
 
+    cache.save()
+
     backup_file = None
     if checksum_src != checksum_dest or os.path.islink(b_dest):
         if not module.check_mode:
@@ -339,7 +773,8 @@ def main():
                 b_mysrc = b_src
                 if remote_src:
                     _, b_mysrc = tempfile.mkstemp(dir=os.path.dirname(b_dest))
-                    shutil.copy2(b_src, b_mysrc)
+                    copy_file_data(b_src, b_mysrc)
+                    shutil.copystat(b_src, b_mysrc)
                 module.atomic_move(b_mysrc, dest, unsafe_writes=module.params['unsafe_writes'])
             except IOError:
                 module.fail_json(msg="failed to copy: %s to %s" % (src, dest), traceback=traceback.format_exc())
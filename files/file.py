@@ -69,6 +69,8 @@ options:
     version_added: "1.1"
     description:
       - recursively set the specified file attributes (applies only to state=directory)
+      - Since 2.3 the number of entries below C(path) that were examined and changed is returned
+        as C(examined) and C(changed_entries).
   force:
     required: false
     default: "no"
@@ -107,10 +109,21 @@ EXAMPLES = '''
 '''
 
 import errno
+import grp
 import os
+import pwd
 import shutil
+import stat
 import time
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 # import module snippets
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.pycompat24 import get_exception
@@ -135,27 +148,193 @@ def get_state(b_path):
     return 'absent'
 
 
-def recursive_set_attributes(module, b_path, follow, file_args):
-    changed = False
-    for b_root, b_dirs, b_files in os.walk(b_path):
-        for b_fsobj in b_dirs + b_files:
-            b_fsname = os.path.join(b_root, b_fsobj)
-            if not os.path.islink(b_fsname):
-                tmp_file_args = file_args.copy()
-                tmp_file_args['path'] = to_native(b_fsname, errors='surrogate_or_strict')
-                changed |= module.set_fs_attributes_if_different(tmp_file_args, changed)
-            else:
-                tmp_file_args = file_args.copy()
-                tmp_file_args['path'] = to_native(b_fsname, errors='surrogate_or_strict')
-                changed |= module.set_fs_attributes_if_different(tmp_file_args, changed)
-                if follow:
-                    b_fsname = os.path.join(b_root, os.readlink(b_fsname))
-                    if os.path.isdir(b_fsname):
-                        changed |= recursive_set_attributes(module, b_fsname, follow, file_args)
-                    tmp_file_args = file_args.copy()
-                    tmp_file_args['path'] = to_native(b_fsname, errors='surrogate_or_strict')
-                    changed |= module.set_fs_attributes_if_different(tmp_file_args, changed)
-    return changed
+# errors from lchmod() on platforms that cannot set the mode of a symlink
+LCHMOD_UNSUPPORTED_ERRNOS = [errno.EPERM]
+for name in ('ENOTSUP', 'EOPNOTSUPP'):
+    if hasattr(errno, name):
+        LCHMOD_UNSUPPORTED_ERRNOS.append(getattr(errno, name))
+
+
+class RecursiveAttributes(object):
+    '''
+    Enforce owner, group, mode and SELinux context on everything below a directory.
+    The requested attributes are resolved once, every entry is lstat'ed once and
+    only touched when it differs.
+    '''
+
+    def __init__(self, module, file_args):
+        self.module = module
+        self.examined = 0
+        self.changed = 0
+
+        self.uid = self.gid = -1
+        if file_args['owner'] is not None:
+            try:
+                self.uid = int(file_args['owner'])
+            except ValueError:
+                try:
+                    self.uid = pwd.getpwnam(file_args['owner']).pw_uid
+                except KeyError:
+                    module.fail_json(path=file_args['path'], msg='chown failed: failed to look up user %s' % file_args['owner'])
+        if file_args['group'] is not None:
+            try:
+                self.gid = int(file_args['group'])
+            except ValueError:
+                try:
+                    self.gid = grp.getgrnam(file_args['group']).gr_gid
+                except KeyError:
+                    module.fail_json(path=file_args['path'], msg='chgrp failed: failed to look up group %s' % file_args['group'])
+
+        # An octal mode is the same for every entry, a symbolic one depends on each entry's current mode
+        self.mode = self.symbolic_mode = None
+        mode = file_args['mode']
+        if isinstance(mode, int):
+            self.mode = mode
+        elif mode is not None:
+            try:
+                self.mode = int(mode, 8)
+            except ValueError:
+                self.symbolic_mode = mode
+
+        # Only look at contexts when some part of one was asked for, and whether
+        # a filesystem forces its own context is looked up once per device
+        self.secontext = None
+        if [part for part in file_args['secontext'] if part is not None] and module.selinux_enabled():
+            self.secontext = file_args['secontext']
+        self.special_contexts = {}
+
+    def _new_mode(self, b_path, st):
+        if self.symbolic_mode is None:
+            return self.mode
+        try:
+            mode = self.module._symbolic_mode_to_octal(st, self.symbolic_mode)
+        except Exception:
+            e = get_exception()
+            self.module.fail_json(path=to_native(b_path, errors='surrogate_or_strict'),
+                                  msg="mode must be in octal or symbolic form", details=str(e))
+        if mode != stat.S_IMODE(mode):
+            self.module.fail_json(path=to_native(b_path, errors='surrogate_or_strict'),
+                                  msg="Invalid mode supplied, only permission info is allowed", details=mode)
+        return mode
+
+    def _context_differs(self, path, st):
+        if st.st_dev not in self.special_contexts:
+            self.special_contexts[st.st_dev] = self.module.is_special_selinux_path(path)
+        is_special_se, sp_context = self.special_contexts[st.st_dev]
+
+        cur_context = self.module.selinux_context(path)
+        if is_special_se:
+            return cur_context != sp_context
+        for i in range(len(cur_context)):
+            if len(self.secontext) > i and self.secontext[i] is not None and self.secontext[i] != cur_context[i]:
+                return True
+        return False
+
+    def apply(self, b_path, st):
+        ''' Bring a single entry in line, st being its lstat, returns whether it changed '''
+        self.examined += 1
+        changed = False
+        path = to_native(b_path, errors='surrogate_or_strict')
+
+        if self.secontext is not None and self._context_differs(path, st):
+            changed = self.module.set_context_if_different(path, self.secontext, changed)
+
+        uid = gid = -1
+        if self.uid != -1 and st.st_uid != self.uid:
+            uid = self.uid
+        if self.gid != -1 and st.st_gid != self.gid:
+            gid = self.gid
+        if uid != -1 or gid != -1:
+            changed = True
+            if not self.module.check_mode:
+                try:
+                    os.lchown(b_path, uid, gid)
+                except OSError:
+                    if uid != -1:
+                        self.module.fail_json(path=path, msg='chown failed')
+                    self.module.fail_json(path=path, msg='chgrp failed')
+
+        # The mode of a symlink cannot be set on most platforms, leave them be
+        if self.mode is not None or self.symbolic_mode is not None:
+            is_link = stat.S_ISLNK(st.st_mode)
+            mode = self._new_mode(b_path, st)
+            if stat.S_IMODE(st.st_mode) != mode and (not is_link or hasattr(os, 'lchmod')):
+                if self.module.check_mode:
+                    changed = True
+                elif is_link:
+                    try:
+                        os.lchmod(b_path, mode)
+                        changed = True
+                    except OSError:
+                        # lchmod() exists but refuses symlinks, as with glibc on Linux
+                        e = get_exception()
+                        if e.errno not in LCHMOD_UNSUPPORTED_ERRNOS:
+                            self.module.fail_json(path=path, msg='chmod failed', details=str(e))
+                else:
+                    try:
+                        os.chmod(b_path, mode)
+                        changed = True
+                    except OSError:
+                        e = get_exception()
+                        self.module.fail_json(path=path, msg='chmod failed', details=str(e))
+
+        if changed:
+            self.changed += 1
+        return changed
+
+    def apply_tree(self, b_top, follow):
+        ''' Apply the attributes to everything below b_top, following symlinks to their target if asked to '''
+        changed = False
+        pending = [b_top]
+        while pending:
+            b_root = pending.pop()
+            try:
+                entries = listdir(b_root)
+            except OSError:
+                e = get_exception()
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    # removed while we were walking
+                    continue
+                changed |= self.apply(entry.path, st)
+
+                if stat.S_ISDIR(st.st_mode):
+                    pending.append(entry.path)
+                elif follow and stat.S_ISLNK(st.st_mode):
+                    b_target = os.path.join(b_root, os.readlink(entry.path))
+                    if os.path.isdir(b_target):
+                        changed |= self.apply_tree(b_target, follow)
+                    try:
+                        changed |= self.apply(b_target, os.lstat(b_target))
+                    except OSError:
+                        # dangling symlink
+                        pass
+        return changed
+
+
+class DirEntry(object):
+    '''minimal stand in for os.DirEntry on pythons without scandir'''
+
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return os.stat(self.path)
+        return os.lstat(self.path)
+
+
+def listdir(b_path):
+    '''list the entries of a directory, stat'ing them through scandir where available'''
+    if scandir is not None:
+        return list(scandir(b_path))
+    return [DirEntry(b_path, name) for name in os.listdir(b_path)]
 
 
 def main():
@@ -331,7 +510,9 @@ def main():
         changed = module.set_fs_attributes_if_different(file_args, changed, diff)
 
         if recurse:
-            changed |= recursive_set_attributes(module, to_bytes(file_args['path'], errors='surrogate_or_strict'), follow, file_args)
+            engine = RecursiveAttributes(module, file_args)
+            changed |= engine.apply_tree(to_bytes(file_args['path'], errors='surrogate_or_strict'), follow)
+            module.exit_json(path=path, changed=changed, diff=diff, examined=engine.examined, changed_entries=engine.changed)
 
         module.exit_json(path=path, changed=changed, diff=diff)
 
@@ -25,6 +25,17 @@ import stat
 import fnmatch
 import time
 import re
+import mmap
+import heapq
+import threading
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
 DOCUMENTATION = '''
 ---
@@ -57,6 +68,7 @@ options:
         default: null
         description:
             - One or more regex patterns which should be matched against the file content
+            - Patterns are matched from the start of each line.
     paths:
         required: true
         aliases: [ "name", "path" ]
@@ -113,6 +125,58 @@ options:
         choices: [ True, False ]
         description:
             - If false the patterns are file globs (shell) if true they are python regexes
+    excludes:
+        required: false
+        default: null
+        version_added: "2.3"
+        description:
+            - One or more (shell or regex) patterns, which type is controled by C(use_regex) option.
+            - Items whose basenames match any of these patterns are not returned, and
+              matching directories are not descended into when C(recurse) is set.
+        aliases: ['exclude']
+    max_workers:
+        required: false
+        default: 4
+        version_added: "2.3"
+        description:
+            - Number of files checked against C(contains) at the same time.
+    read_limit:
+        required: false
+        default: null
+        version_added: "2.3"
+        description:
+            - Only search the first C(read_limit) bytes of each file for C(contains).
+              Unqualified values are in bytes, but b, k, m, g, and t can be appended to specify
+              bytes, kilobytes, megabytes, gigabytes, and terabytes, respectively.
+    fields:
+        required: false
+        default: null
+        version_added: "2.3"
+        description:
+            - Only return these keys for each match instead of the full stat output, C(path) is always returned.
+            - Listing C(checksum) implies C(get_checksum).
+    limit:
+        required: false
+        default: null
+        version_added: "2.3"
+        description:
+            - Return at most this many matches.
+            - Only the first C(limit) matches, or the best ones with C(sort_by), are kept while
+              searching. The search still runs to the end, so C(matched) counts all of them.
+    sort_by:
+        required: false
+        default: null
+        version_added: "2.3"
+        choices: [ "path", "size", "atime", "mtime", "ctime" ]
+        description:
+            - Sort the matches on this property instead of returning them in the order they were found.
+    sort_order:
+        required: false
+        default: "ascending"
+        version_added: "2.3"
+        choices: [ "ascending", "descending" ]
+        description:
+            - Direction used with C(sort_by).
 '''
 
 
@@ -131,6 +195,15 @@ EXAMPLES = '''
 
 # find /var/log files equal or greater than 10 megabytes ending with .old or .log.gz via regex
 - find: paths="/var/tmp" patterns="^.*?\.(?:old|log\.gz)$" size="10m" use_regex=True
+
+# find /var/log files with a traceback in their first megabyte, checking 8 files at a time
+- find: paths="/var/log" contains="Traceback" read_limit="1m" max_workers=8 recurse=yes
+
+# the 100 biggest files under /data, only returning their path, size and mtime
+- find: paths="/data" recurse=yes fields="size,mtime" sort_by=size sort_order=descending limit=100
+
+# find /data log files without descending into any .snapshot or cache directories
+- find: paths="/data" patterns="*.log" excludes=".snapshot,cache" recurse=yes
 '''
 
 RETURN = '''
@@ -149,7 +222,7 @@ files:
         },
         ]
 matched:
-    description: number of matches
+    description: number of matches, including those left out by C(limit)
     returned: success
     type: string
     sample: 14
@@ -160,22 +233,30 @@ examined:
     sample: 34
 '''
 
-def pfilter(f, patterns=None, use_regex=False):
-    '''filter using glob patterns'''
+# number of files collected before their content is checked in parallel
+CONTENT_BATCH = 1024
 
-    if patterns is None:
-        return True
+def compile_patterns(patterns, use_regex=False):
+    '''compile shell or regex patterns once instead of for every file'''
+
+    if not patterns:
+        return None
 
     if use_regex:
-        for p in patterns:
-            r =  re.compile(p)
-            if r.match(f):
-                return True
-    else:
+        return [re.compile(p) for p in patterns]
+
+    return [re.compile(fnmatch.translate(p)) for p in patterns]
+
+
+def pfilter(f, patterns=None):
+    '''filter using compiled glob or regex patterns'''
+
+    if patterns is None:
+        return True
 
-        for p in patterns:
-            if fnmatch.fnmatch(f, p):
-                return True
+    for p in patterns:
+        if p.match(f):
+            return True
 
     return False
 
@@ -200,23 +281,162 @@ def sizefilter(st, size):
 
     return False
 
-def contentfilter(fsname, pattern):
-    '''filter files which contain the given expression'''
-    if pattern is None: return True
+def linesearch(prog, data):
+    '''check if prog matches at the start of any line in data, as matching it line by line would'''
+    newline = to_bytes('\n')
+    pos = 0
+    while True:
+        # an unanchored search lets the regex engine skip ahead quickly, then confirm the match
+        # holds from the start of its line, moving on to the next line otherwise
+        m = prog.search(data, pos)
+        if m is None:
+            return False
+        start = data.rfind(newline, 0, m.start()) + 1
+        end = data.find(newline, m.start()) + 1
+        if end == 0:
+            end = len(data)
+        # the line is matched on its own, newline included, so nothing can match across it
+        if prog.match(data, start, end):
+            return True
+        pos = end
+        if pos == len(data):
+            return False
+
+
+def contentfilter(fsname, prog, read_limit=None):
+    '''filter files which contain the given compiled bytes expression'''
+    if prog is None: return True
 
     try:
-       f = open(fsname)
-       prog = re.compile(pattern)
-       for line in f:
-           if prog.match (line):
-               f.close()
-               return True
-
-       f.close() 
+        f = open(fsname, 'rb')
     except:
-       pass
+        return False
+
+    try:
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if read_limit is not None:
+                size = min(size, read_limit)
+
+            if size == 0:
+                # empty or a pseudo file that does not report its size, mmap cannot handle either
+                if read_limit is None:
+                    data = f.read()
+                else:
+                    data = f.read(read_limit)
+                return linesearch(prog, data)
+
+            # let the regex engine page through the file, it stops at the first match
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                return linesearch(prog, data)
+            finally:
+                data.close()
+        except:
+            return False
+    finally:
+        f.close()
+
+
+def parallel_filter(func, items, max_workers):
+    '''return the items func is true for, running up to max_workers at a time and keeping their order'''
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [i for i in items if func(i)]
+
+    results = [False] * len(items)
+    position = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            lock.acquire()
+            try:
+                idx = position[0]
+                position[0] = idx + 1
+            finally:
+                lock.release()
+            if idx >= len(items):
+                return
+            results[idx] = func(items[idx])
+
+    workers = []
+    for i in range(min(max_workers, len(items))):
+        t = threading.Thread(target=worker)
+        t.start()
+        workers.append(t)
+
+    for t in workers:
+        t.join()
+
+    return [i for i, found in zip(items, results) if found]
+
+
+class DirEntry(object):
+    '''minimal stand in for os.DirEntry on pythons without scandir, stats lazily and only once'''
+
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+        self._stat = None
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def _test(self, test, follow_symlinks):
+        try:
+            return test(self.stat(follow_symlinks=follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self, follow_symlinks=True):
+        return self._test(stat.S_ISDIR, follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self._test(stat.S_ISREG, follow_symlinks)
+
+    def is_symlink(self):
+        return self._test(stat.S_ISLNK, False)
+
+
+def listdir(path):
+    '''list the entries of a directory, reusing the type info from readdir when possible'''
+    if scandir is not None:
+        return list(scandir(path))
+    return [DirEntry(path, name) for name in os.listdir(path)]
+
+
+def walk(top, recurse=False, follow=False, excludes=None):
+    '''
+    Yield the entries below top, parents before their children, like a top down os.walk.
+    Directories matching excludes are yielded but never descended into.
+    '''
+    pending = [top]
+    while pending:
+        root = pending.pop()
+        try:
+            entries = listdir(root)
+        except OSError:
+            # os.walk ignores unreadable directories as well
+            continue
+
+        subdirs = []
+        for entry in entries:
+            yield entry
+            if recurse and entry.is_dir(follow_symlinks=follow) and \
+               (excludes is None or not pfilter(entry.name, excludes)):
+                subdirs.append(entry.path)
+
+        subdirs.reverse()
+        pending.extend(subdirs)
 
-    return False
 
 def statinfo(st):
     return {
@@ -266,14 +486,19 @@ def main():
             follow        = dict(default="False", type='bool'),
             get_checksum  = dict(default="False", type='bool'),
             use_regex     = dict(default="False", type='bool'),
+            excludes      = dict(default=None, type='list', aliases=['exclude']),
+            max_workers   = dict(default=4, type='int'),
+            read_limit    = dict(default=None, type='str'),
+            fields        = dict(default=None, type='list'),
+            limit         = dict(default=None, type='int'),
+            sort_by       = dict(default=None, choices=['path', 'size', 'atime', 'mtime', 'ctime'], type='str'),
+            sort_order    = dict(default="ascending", choices=['ascending', 'descending'], type='str'),
         ),
         supports_check_mode=True,
     )
 
     params = module.params
 
-    filelist = []
-
     if params['age'] is None:
         age = None
     else:
@@ -296,55 +521,150 @@ def main():
         else:
             module.fail_json(size=params['size'], msg="failed to process size")
 
+    if params['read_limit'] is None:
+        read_limit = None
+    else:
+        # convert read_limit to bytes:
+        m = re.match("^(\d+)(b|k|m|g|t)?$", params['read_limit'].lower())
+        bytes_per_unit = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+        if m:
+            read_limit = int(m.group(1)) * bytes_per_unit.get(m.group(2), 1)
+        else:
+            module.fail_json(read_limit=params['read_limit'], msg="failed to process read_limit")
+
+    fields = params['fields']
+    get_checksum = params['get_checksum']
+    if fields is not None:
+        known = list(statinfo(os.stat_result((0,) * 10)).keys()) + ['path', 'checksum']
+        unknown = [f for f in fields if f not in known]
+        if unknown:
+            module.fail_json(fields=unknown, msg="unknown fields requested, valid ones are: %s" % ', '.join(sorted(known)))
+        get_checksum = get_checksum or 'checksum' in fields
+
+    limit = params['limit']
+    if limit is not None and limit < 1:
+        module.fail_json(limit=limit, msg="limit must be a positive number")
+
+    if not params['use_regex'] and '*' in params['patterns']:
+        # everything matches, skip pattern matching altogether
+        patterns = None
+    else:
+        patterns = compile_patterns(params['patterns'], params['use_regex'])
+    excludes = compile_patterns(params['excludes'], params['use_regex'])
+
+    if params['contains'] is None:
+        contains = None
+    else:
+        # the raw bytes get searched, multiline so ^ and $ still work on each line
+        contains = re.compile(to_bytes(params['contains'], errors='surrogate_or_strict'), re.MULTILINE)
+
     now = time.time()
-    msg = ''
-    looked = 0
-    for npath in params['paths']:
-        if os.path.isdir(npath):
-
-            ''' ignore followlinks for python version < 2.6 '''
-            for root,dirs,files in (sys.version_info < (2,6,0) and os.walk(npath)) or \
-                                    os.walk( npath, followlinks=params['follow']):
-                looked = looked + len(files) + len(dirs)
-                for fsobj in (files + dirs):
-                    fsname=os.path.normpath(os.path.join(root, fsobj))
-
-                    if os.path.basename(fsname).startswith('.') and not params['hidden']:
-                       continue
-
-                    try:
-                        st = os.stat(fsname)
-                    except:
-                        msg+="%s was skipped as it does not seem to be a valid file or it cannot be accessed\n" % fsname
-                        continue
-
-                    r = {'path': fsname}
-                    if stat.S_ISDIR(st.st_mode) and params['file_type'] == 'directory':
-                        if pfilter(fsobj, params['patterns'], params['use_regex']) and agefilter(st, now, age, params['age_stamp']):
-
-                            r.update(statinfo(st))
-                            filelist.append(r)
-
-                    elif stat.S_ISREG(st.st_mode) and params['file_type'] == 'file':
-                        if pfilter(fsobj, params['patterns'], params['use_regex']) and \
-                           agefilter(st, now, age, params['age_stamp']) and \
-                           sizefilter(st, size) and \
-                           contentfilter(fsname, params['contains']):
-
-                            r.update(statinfo(st))
-                            if params['get_checksum']:
-                                r['checksum'] = module.sha1(fsname)
-                            filelist.append(r)
-
-                if not params['recurse']:
-                    break
+    summary = {'msg': '', 'examined': 0, 'matched': 0}
+
+    def content_matches(candidates):
+        return parallel_filter(lambda c: contentfilter(c[0], contains, read_limit), candidates, params['max_workers'])
+
+    def matches():
+        '''yield (path, stat) for every match, nothing else of a match is kept until results are built'''
+        # regular files that still need their content checked, a batch at a time
+        candidates = []
+
+        for npath in params['paths']:
+            if not os.path.isdir(npath):
+                summary['msg'] += "%s was skipped as it does not seem to be a valid directory or it cannot be accessed\n" % npath
+                continue
+
+            for entry in walk(npath, params['recurse'], params['follow'], excludes):
+                summary['examined'] += 1
+                fsobj = entry.name
+
+                if fsobj.startswith('.') and not params['hidden']:
+                    continue
+
+                if not pfilter(fsobj, patterns) or (excludes is not None and pfilter(fsobj, excludes)):
+                    continue
+
+                # the type comes from the directory listing, only stat once a filter or the result needs it,
+                # symlinks still get stat'ed so dangling ones are reported
+                if params['file_type'] == 'directory':
+                    wanted = entry.is_dir()
+                else:
+                    wanted = entry.is_file()
+                if not wanted and not entry.is_symlink():
+                    continue
+
+                fsname = os.path.normpath(entry.path)
+                try:
+                    st = entry.stat()
+                except:
+                    summary['msg'] += "%s was skipped as it does not seem to be a valid file or it cannot be accessed\n" % fsname
+                    continue
+
+                if stat.S_ISDIR(st.st_mode) and params['file_type'] == 'directory':
+                    if agefilter(st, now, age, params['age_stamp']):
+                        summary['matched'] += 1
+                        yield fsname, st
+
+                elif stat.S_ISREG(st.st_mode) and params['file_type'] == 'file':
+                    if agefilter(st, now, age, params['age_stamp']) and \
+                       sizefilter(st, size):
+
+                        if contains is None:
+                            summary['matched'] += 1
+                            yield fsname, st
+                            continue
+
+                        candidates.append((fsname, st))
+                        if len(candidates) >= CONTENT_BATCH:
+                            for c in content_matches(candidates):
+                                summary['matched'] += 1
+                                yield c
+                            candidates = []
+
+        for c in content_matches(candidates):
+            summary['matched'] += 1
+            yield c
+
+    if params['sort_by'] is None:
+        if limit is None:
+            found = matches()
+        else:
+            # keep going past limit, matched counts every match
+            found = []
+            for m in matches():
+                if len(found) < limit:
+                    found.append(m)
+    else:
+        if params['sort_by'] == 'path':
+            key = lambda m: m[0]
         else:
-            msg+="%s was skipped as it does not seem to be a valid directory or it cannot be accessed\n" % npath
+            attr = 'st_%s' % params['sort_by']
+            key = lambda m: getattr(m[1], attr)
+
+        # a heap of limit entries is all that is held when only the top matches are wanted,
+        # decorated by hand as the key argument of nlargest/nsmallest needs python 2.5; the
+        # index keeps ties in the order they were found and stat results out of comparisons
+        if limit is None:
+            found = sorted(matches(), key=key, reverse=params['sort_order'] == 'descending')
+        elif params['sort_order'] == 'descending':
+            found = [m for k, i, m in heapq.nlargest(limit, ((key(m), -i, m) for i, m in enumerate(matches())))]
+        else:
+            found = [m for k, i, m in heapq.nsmallest(limit, ((key(m), i, m) for i, m in enumerate(matches())))]
+
+    filelist = []
+    for fsname, st in found:
+        r = {'path': fsname}
+        r.update(statinfo(st))
+        if get_checksum and stat.S_ISREG(st.st_mode):
+            r['checksum'] = module.sha1(fsname)
+        if fields is not None:
+            r = dict([(k, r[k]) for k in ['path'] + fields if k in r])
+        filelist.append(r)
 
-    matched = len(filelist)
-    module.exit_json(files=filelist, changed=False, msg=msg, matched=matched, examined=looked)
+    module.exit_json(files=filelist, changed=False, msg=summary['msg'], matched=summary['matched'], examined=summary['examined'])
 
 # import module snippets
 from ansible.module_utils.basic import *
+from ansible.module_utils._text import to_bytes
 main()
 
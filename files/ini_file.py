@@ -41,6 +41,7 @@ options:
     description:
       - Section name in INI file. This is added if C(state=present) automatically when
         a single value is being set.
+      - Only optional when C(settings) is used, where it is the default section of the settings.
     required: true
     default: null
   option:
@@ -77,6 +78,16 @@ options:
      required: false
      default: false
      version_added: "2.1"
+  settings:
+     description:
+       - A list of changes to apply in order, each a hash of C(section), C(option), C(value)
+         and C(state), with the same meaning as the options of that name. C(section) and
+         C(state) are taken from the task when left out.
+       - The file is read and split into sections once, every change is made in memory and
+         the file is written once. Mutually exclusive with C(option) and C(value).
+     required: false
+     default: null
+     version_added: "2.3"
 notes:
    - While it is possible to add an I(option) without specifying a I(value), this makes
      no sense.
@@ -99,32 +110,138 @@ EXAMPLES = '''
             option=temperature
             value=cold
             backup=yes
+
+# Manage many options with a single rewrite of the file
+- ini_file:
+    dest: /etc/php.ini
+    section: PHP
+    settings:
+      - option: memory_limit
+        value: 256M
+      - option: expose_php
+        value: "Off"
+      - section: Date
+        option: date.timezone
+        value: UTC
+      - option: allow_url_include
+        state: absent
 '''
 
 import os
 import re
 
 # ==============================================================
-# match_opt
+# option_patterns
+
+def option_patterns(option):
+    ''' compile the patterns of an option line, commented out or not, and of an active one '''
+    option = re.escape(option)
+    return (re.compile('(# *|; *)?%s( |\t)*=' % option),
+            re.compile('%s( |\t)*=' % option))
+
+# ==============================================================
+# IniSection
 
-def match_opt(option, line):
-  option = re.escape(option)
-  return re.match('%s( |\t)*=' % option, line) \
-    or re.match('# *%s( |\t)*=' % option, line) \
-    or re.match('; *%s( |\t)*=' % option, line)
+class IniSection(object):
+    ''' a section header, None for the lines before the first one, and the lines up to the next '''
+
+    def __init__(self, header, name):
+        self.header = header
+        self.name = name
+        self.lines = []
+
+# ==============================================================
+# parse_ini
+
+def parse_ini(ini_lines):
+    ''' split ini_lines into sections, returning them in order and indexed by name '''
+    sections = [IniSection(None, None)]
+    index = {}
+    for line in ini_lines:
+        if line.startswith('['):
+            m = re.match(r'\[([^\]]*)\]', line)
+            name = m and m.group(1)
+            section = IniSection(line, name)
+            sections.append(section)
+            if name is not None:
+                index.setdefault(name, []).append(section)
+        else:
+            sections[-1].lines.append(line)
+    return sections, index
 
 # ==============================================================
-# match_active_opt
+# set_option
+
+def set_option(sections, index, section, option, value, state, assignment_format):
+    ''' make a single change to the parsed file, returns whether it changed anything '''
+    if not section:
+        target = sections[0]
+    elif index.get(section):
+        target = index[section][0]
+    else:
+        target = None
+
+    if target is None:
+        if option and state == 'present':
+            new_section = IniSection('[%s]\n' % section, section)
+            new_section.lines.append(assignment_format % (option, value))
+            sections.append(new_section)
+            index.setdefault(section, []).append(new_section)
+            return True
+        return False
+
+    lines = target.lines
+    if not option:
+        if state == 'absent':
+            # remove the entire section
+            sections.remove(target)
+            if target.name is not None:
+                index[target.name].remove(target)
+            return True
+        return False
 
-def match_active_opt(option, line):
-  option = re.escape(option)
-  return re.match('%s( |\t)*=' % option, line)
+    any_re, active_re = option_patterns(option)
+    if state == 'present':
+        newline = assignment_format % (option, value)
+        for i, line in enumerate(lines):
+            # change the existing option line
+            if any_re.match(line):
+                changed = lines[i] != newline
+                lines[i] = newline
+                if changed:
+                    # remove all possible option occurences from the rest of the section
+                    lines[i + 1:] = [l for l in lines[i + 1:] if not active_re.match(l)]
+                return changed
+
+        # insert missing option line at the end of the section
+        for i in range(len(lines), -1, -1):
+            # search backwards for previous non-blank or non-comment line
+            if i == 0:
+                if target.header is None:
+                    return False
+            elif re.match(r'^[ \t]*([#;].*)?$', lines[i - 1]):
+                continue
+            lines.insert(i, newline)
+            return True
+    else:
+        # comment out the existing option line
+        for i, line in enumerate(lines):
+            if active_re.match(line):
+                lines[i] = '#%s' % line
+                return True
+    return False
 
 # ==============================================================
 # do_ini
 
-def do_ini(module, filename, section=None, option=None, value=None, state='present', backup=False, no_extra_spaces=False):
+def do_ini(module, filename, section=None, option=None, value=None, state='present', backup=False, no_extra_spaces=False, settings=None):
+    '''
+    apply a change, or every change in settings in order, to filename.
+    the file is read and parsed once and written once.
+    '''
 
+    if settings is None:
+        settings = [dict(section=section, option=option, value=value, state=state)]
 
     if not os.path.exists(filename):
       try:
@@ -134,73 +251,19 @@ def do_ini(module, filename, section=None, option=None, value=None, state='prese
     ini_file = open(filename, 'r')
     try:
         ini_lines = ini_file.readlines()
-        # append a fake section line to simplify the logic
-        ini_lines.append('[')
     finally:
         ini_file.close()
 
-    within_section = not section
-    section_start = 0
-    changed = False
     if no_extra_spaces:
         assignment_format = '%s=%s\n'
     else:
         assignment_format = '%s = %s\n'
 
-    for index, line in enumerate(ini_lines):
-        if line.startswith('[%s]' % section):
-            within_section = True
-            section_start = index
-        elif line.startswith('['):
-            if within_section:
-                if state == 'present':
-                    # insert missing option line at the end of the section
-                    for i in range(index, 0, -1):
-                        # search backwards for previous non-blank or non-comment line
-                        if not re.match(r'^[ \t]*([#;].*)?$', ini_lines[i - 1]):
-                            ini_lines.insert(i, assignment_format % (option, value))
-                            changed = True
-                            break
-                elif state == 'absent' and not option:
-                    # remove the entire section
-                    del ini_lines[section_start:index]
-                    changed = True
-                break
-        else:
-            if within_section and option:
-                if state == 'present':
-                    # change the existing option line
-                    if match_opt(option, line):
-                        newline = assignment_format % (option, value)
-                        changed = ini_lines[index] != newline
-                        ini_lines[index] = newline
-                        if changed:
-                            # remove all possible option occurences from the rest of the section
-                            index = index + 1
-                            while index < len(ini_lines):
-                                line = ini_lines[index]
-                                if line.startswith('['):
-                                    break
-                                if match_active_opt(option, line):
-                                    del ini_lines[index]
-                                else:
-                                    index = index + 1
-                        break
-                else:
-                    # comment out the existing option line
-                    if match_active_opt(option, line):
-                        ini_lines[index] = '#%s' % ini_lines[index]
-                        changed = True
-                        break
-
-    # remove the fake section line
-    del ini_lines[-1:]
-
-    if not within_section and option and state == 'present':
-        ini_lines.append('[%s]\n' % section)
-        ini_lines.append(assignment_format % (option, value))
-        changed = True
-
+    sections, index = parse_ini(ini_lines)
+    changed = False
+    for setting in settings:
+        changed |= set_option(sections, index, setting['section'], setting['option'],
+                              setting['value'], setting['state'], assignment_format)
 
     backup_file = None
     if changed and not module.check_mode:
@@ -208,7 +271,10 @@ def do_ini(module, filename, section=None, option=None, value=None, state='prese
             backup_file = module.backup_local(filename)
         ini_file = open(filename, 'w')
         try:
-            ini_file.writelines(ini_lines)
+            for ini_section in sections:
+                if ini_section.header is not None:
+                    ini_file.write(ini_section.header)
+                ini_file.writelines(ini_section.lines)
         finally:
             ini_file.close()
 
@@ -222,13 +288,16 @@ def main():
     module = AnsibleModule(
         argument_spec = dict(
             dest = dict(required=True),
-            section = dict(required=True),
+            section = dict(required=False),
             option = dict(required=False),
             value = dict(required=False),
             backup = dict(default='no', type='bool'),
             state = dict(default='present', choices=['present', 'absent']),
-            no_extra_spaces = dict(required=False, default=False, type='bool')
+            no_extra_spaces = dict(required=False, default=False, type='bool'),
+            settings = dict(required=False, type='list'),
         ),
+        required_one_of = [['section', 'settings']],
+        mutually_exclusive = [['settings', 'option'], ['settings', 'value']],
         add_file_common_args = True,
         supports_check_mode = True
     )
@@ -241,7 +310,30 @@ def main():
     backup = module.params['backup']
     no_extra_spaces = module.params['no_extra_spaces']
 
-    (changed,backup_file) = do_ini(module, dest, section, option, value, state, backup, no_extra_spaces)
+    settings = None
+    if module.params['settings'] is not None:
+        settings = []
+        for item in module.params['settings']:
+            if not isinstance(item, dict):
+                module.fail_json(msg='settings must be a list of hashes: %s' % item)
+
+            # Anything a setting leaves out is taken from the task
+            setting = dict(section=section, option=None, value=None, state=state)
+            unsupported = set(item.keys()) - set(setting.keys())
+            if unsupported:
+                module.fail_json(msg='unsupported key(s) in settings: %s' % ', '.join(sorted(unsupported)))
+            setting.update(item)
+
+            if setting['section'] is None:
+                module.fail_json(msg='section is required in settings: %s' % item)
+            if setting['state'] not in ('present', 'absent'):
+                module.fail_json(msg='state must be one of present, absent in settings: %s' % setting['state'])
+            for key in ('section', 'option', 'value'):
+                if setting[key] is not None:
+                    setting[key] = '%s' % setting[key]
+            settings.append(setting)
+
+    (changed,backup_file) = do_ini(module, dest, section, option, value, state, backup, no_extra_spaces, settings)
 
     file_args = module.load_file_common_arguments(module.params)
     changed = module.set_fs_attributes_if_different(file_args, changed)
@@ -113,6 +113,17 @@ options:
      description:
        - Create a backup file including the timestamp information so you can
          get the original file back if you somehow clobbered it incorrectly.
+  lines:
+     required: false
+     version_added: "2.3"
+     description:
+       - A list of edits to apply in order to the file, each a line or a hash
+         of C(line), C(regexp), C(state), C(backrefs), C(insertafter) and
+         C(insertbefore), with the same meaning as the options of that name.
+         Keys left out of an edit are taken from the task.
+       - The file is read once, every edit is made in memory and the result
+         is validated and written once. Mutually exclusive with C(line) and
+         C(regexp).
   others:
      description:
        - All arguments accepted by the M(file) module also work here.
@@ -140,6 +151,19 @@ EXAMPLES = r"""
 
 # Validate the sudoers file before saving
 - lineinfile: dest=/etc/sudoers state=present regexp='^%ADMIN ALL\=' line='%ADMIN ALL=(ALL) NOPASSWD:ALL' validate='visudo -cf %s'
+
+# Make several edits with a single rewrite and validation of the file
+- lineinfile:
+    dest: /etc/ssh/sshd_config
+    validate: '/usr/sbin/sshd -t -f %s'
+    lines:
+      - regexp: '^PermitRootLogin '
+        line: 'PermitRootLogin no'
+      - regexp: '^PasswordAuthentication '
+        line: 'PasswordAuthentication no'
+      - regexp: '^UseDNS '
+        state: absent
+      - 'AllowGroups ssh-users'
 """
 
 import re
@@ -188,30 +212,9 @@ def check_file_attrs(module, changed, message, diff):
     return message, changed
 
 
-def present(module, dest, regexp, line, insertafter, insertbefore, create,
-            backup, backrefs):
-
-    diff = {'before': '',
-            'after': '',
-            'before_header': '%s (content)' % dest,
-            'after_header': '%s (content)' % dest}
-
-    b_dest = to_bytes(dest, errors='surrogate_or_strict')
-    if not os.path.exists(b_dest):
-        if not create:
-            module.fail_json(rc=257, msg='Destination %s does not exist !' % dest)
-        b_destpath = os.path.dirname(b_dest)
-        if not os.path.exists(b_destpath) and not module.check_mode:
-            os.makedirs(b_destpath)
-        b_lines = []
-    else:
-        f = open(b_dest, 'rb')
-        b_lines = f.readlines()
-        f.close()
-
-    if module._diff:
-        diff['before'] = to_native(b('').join(b_lines))
-
+def compile_edit(regexp, line, insertafter=None, insertbefore=None):
+    ''' Return the line and compiled regexps of an edit as bytes, so a batch compiles every pattern once '''
+    bre_m = bre_ins = None
     if regexp is not None:
         bre_m = re.compile(to_bytes(regexp, errors='surrogate_or_strict'))
 
@@ -219,16 +222,22 @@ def present(module, dest, regexp, line, insertafter, insertbefore, create,
         bre_ins = re.compile(to_bytes(insertafter, errors='surrogate_or_strict'))
     elif insertbefore not in (None, 'BOF'):
         bre_ins = re.compile(to_bytes(insertbefore, errors='surrogate_or_strict'))
-    else:
-        bre_ins = None
+
+    b_line = None
+    if line is not None:
+        b_line = to_bytes(line, errors='surrogate_or_strict')
+    return bre_m, b_line, bre_ins
+
+
+def present_lines(b_lines, bre_m, b_line, insertafter, insertbefore, bre_ins, backrefs):
+    ''' Ensure b_line is in the b_lines buffer, editing it in place, returns (msg, changed) '''
 
     # index[0] is the line num where regexp has been found
     # index[1] is the line num where insertafter/inserbefore has been found
     index = [-1, -1]
     m = None
-    b_line = to_bytes(line, errors='surrogate_or_strict')
     for lineno, b_cur_line in enumerate(b_lines):
-        if regexp is not None:
+        if bre_m is not None:
             match_found = bre_m.search(b_cur_line)
         else:
             match_found = b_line == b_cur_line.rstrip(b('\r\n'))
@@ -288,6 +297,53 @@ def present(module, dest, regexp, line, insertafter, insertbefore, create,
         msg = 'line added'
         changed = True
 
+    return msg, changed
+
+
+def absent_lines(b_lines, bre_c, b_line):
+    ''' Return the b_lines buffer without the matching lines, and the lines removed '''
+    found = []
+
+    def matcher(b_cur_line):
+        if bre_c is not None:
+            match_found = bre_c.search(b_cur_line)
+        else:
+            match_found = b_line == b_cur_line.rstrip(b('\r\n'))
+        if match_found:
+            found.append(b_cur_line)
+        return not match_found
+
+    b_lines = [l for l in b_lines if matcher(l)]
+    return b_lines, found
+
+
+def present(module, dest, regexp, line, insertafter, insertbefore, create,
+            backup, backrefs):
+
+    diff = {'before': '',
+            'after': '',
+            'before_header': '%s (content)' % dest,
+            'after_header': '%s (content)' % dest}
+
+    b_dest = to_bytes(dest, errors='surrogate_or_strict')
+    if not os.path.exists(b_dest):
+        if not create:
+            module.fail_json(rc=257, msg='Destination %s does not exist !' % dest)
+        b_destpath = os.path.dirname(b_dest)
+        if not os.path.exists(b_destpath) and not module.check_mode:
+            os.makedirs(b_destpath)
+        b_lines = []
+    else:
+        f = open(b_dest, 'rb')
+        b_lines = f.readlines()
+        f.close()
+
+    if module._diff:
+        diff['before'] = to_native(b('').join(b_lines))
+
+    bre_m, b_line, bre_ins = compile_edit(regexp, line, insertafter, insertbefore)
+    msg, changed = present_lines(b_lines, bre_m, b_line, insertafter, insertbefore, bre_ins, backrefs)
+
     if module._diff:
         diff['after'] = to_native(b('').join(b_lines))
 
@@ -329,21 +385,8 @@ def absent(module, dest, regexp, line, backup):
     if module._diff:
         diff['before'] = to_native(b('').join(b_lines))
 
-    if regexp is not None:
-        bre_c = re.compile(to_bytes(regexp, errors='surrogate_or_strict'))
-    found = []
-
-    b_line = to_bytes(line, errors='surrogate_or_strict')
-    def matcher(b_cur_line):
-        if regexp is not None:
-            match_found = bre_c.search(b_cur_line)
-        else:
-            match_found = b_line == b_cur_line.rstrip(b('\r\n'))
-        if match_found:
-            found.append(b_cur_line)
-        return not match_found
-
-    b_lines = [l for l in b_lines if matcher(l)]
+    bre_c, b_line, bre_ins = compile_edit(regexp, line)
+    b_lines, found = absent_lines(b_lines, bre_c, b_line)
     changed = len(found) > 0
 
     if module._diff:
@@ -369,6 +412,82 @@ def absent(module, dest, regexp, line, backup):
     module.exit_json(changed=changed, found=len(found), msg=msg, backup=backupdest, diff=difflist)
 
 
+def batch(module, dest, edits, create, backup):
+
+    diff = {'before': '',
+            'after': '',
+            'before_header': '%s (content)' % dest,
+            'after_header': '%s (content)' % dest}
+
+    # Compile every edit up front, they are applied one after the other to the same buffer
+    compiled = []
+    for edit in edits:
+        bre_m, b_line, bre_ins = compile_edit(edit['regexp'], edit['line'], edit['insertafter'], edit['insertbefore'])
+        compiled.append((edit, bre_m, b_line, bre_ins))
+
+    b_dest = to_bytes(dest, errors='surrogate_or_strict')
+    if not os.path.exists(b_dest):
+        if not [edit for edit in edits if edit['state'] == 'present']:
+            module.exit_json(changed=False, msg="file not present")
+        if not create:
+            module.fail_json(rc=257, msg='Destination %s does not exist !' % dest)
+        b_destpath = os.path.dirname(b_dest)
+        if not os.path.exists(b_destpath) and not module.check_mode:
+            os.makedirs(b_destpath)
+        b_lines = []
+    else:
+        f = open(b_dest, 'rb')
+        b_lines = f.readlines()
+        f.close()
+
+    if module._diff:
+        diff['before'] = to_native(b('').join(b_lines))
+
+    added = replaced = removed = 0
+    for edit, bre_m, b_line, bre_ins in compiled:
+        if edit['state'] == 'present':
+            msg, changed = present_lines(b_lines, bre_m, b_line, edit['insertafter'], edit['insertbefore'], bre_ins, edit['backrefs'])
+            if msg == 'line added':
+                added += 1
+            elif msg == 'line replaced':
+                replaced += 1
+        else:
+            b_lines, found = absent_lines(b_lines, bre_m, b_line)
+            removed += len(found)
+
+    msgs = []
+    if added:
+        msgs.append('%s line(s) added' % added)
+    if replaced:
+        msgs.append('%s line(s) replaced' % replaced)
+    if removed:
+        msgs.append('%s line(s) removed' % removed)
+    msg = ', '.join(msgs)
+    changed = len(msgs) > 0
+
+    if module._diff:
+        diff['after'] = to_native(b('').join(b_lines))
+
+    # However many edits there were, the result is validated and written once
+    backupdest = ""
+    if changed and not module.check_mode:
+        if backup and os.path.exists(b_dest):
+            backupdest = module.backup_local(dest)
+        write_changes(module, b_lines, dest)
+
+    if module.check_mode and not os.path.exists(b_dest):
+        module.exit_json(changed=changed, msg=msg, backup=backupdest, diff=diff)
+
+    attr_diff = {}
+    msg, changed = check_file_attrs(module, changed, msg, attr_diff)
+
+    attr_diff['before_header'] = '%s (file attributes)' % dest
+    attr_diff['after_header'] = '%s (file attributes)' % dest
+
+    difflist = [diff, attr_diff]
+    module.exit_json(changed=changed, msg=msg, backup=backupdest, diff=difflist)
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
@@ -382,8 +501,9 @@ def main():
             create=dict(default=False, type='bool'),
             backup=dict(default=False, type='bool'),
             validate=dict(default=None, type='str'),
+            lines=dict(default=None, type='list'),
         ),
-        mutually_exclusive=[['insertbefore', 'insertafter']],
+        mutually_exclusive=[['insertbefore', 'insertafter'], ['lines', 'line'], ['lines', 'regexp']],
         add_file_common_args=True,
         supports_check_mode=True
     )
@@ -398,6 +518,43 @@ def main():
     if os.path.isdir(b_dest):
         module.fail_json(rc=256, msg='Destination %s is a directory !' % dest)
 
+    if params['lines'] is not None:
+        edits = []
+        for item in params['lines']:
+            if not isinstance(item, dict):
+                item = dict(line=item)
+
+            # Anything an edit leaves out is taken from the task
+            edit = dict(state=params['state'], regexp=None, line=None, backrefs=backrefs,
+                        insertafter=None, insertbefore=None)
+            if 'insertafter' not in item and 'insertbefore' not in item:
+                edit['insertafter'] = params['insertafter']
+                edit['insertbefore'] = params['insertbefore']
+            unsupported = set(item.keys()) - set(edit.keys())
+            if unsupported:
+                module.fail_json(msg='unsupported key(s) in lines: %s' % ', '.join(sorted(unsupported)))
+            edit.update(item)
+            edit['backrefs'] = module.boolean(edit['backrefs'])
+
+            if edit['state'] not in ('present', 'absent'):
+                module.fail_json(msg='state must be one of present, absent in lines: %s' % edit['state'])
+            if edit['insertafter'] is not None and edit['insertbefore'] is not None:
+                module.fail_json(msg='parameters are mutually exclusive in lines: insertbefore, insertafter')
+
+            if edit['state'] == 'present':
+                if edit['backrefs'] and edit['regexp'] is None:
+                    module.fail_json(msg='regexp= is required with backrefs=true')
+                if edit['line'] is None:
+                    module.fail_json(msg='line= is required with state=present')
+                if edit['insertbefore'] is None and edit['insertafter'] is None:
+                    edit['insertafter'] = 'EOF'
+            elif edit['regexp'] is None and edit['line'] is None:
+                module.fail_json(msg='one of line= or regexp= is required with state=absent')
+
+            edits.append(edit)
+
+        batch(module, dest, edits, create, backup)
+
     if params['state'] == 'present':
         if backrefs and params['regexp'] is None:
             module.fail_json(msg='regexp= is required with backrefs=true')
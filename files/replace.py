@@ -18,8 +18,11 @@
 # You should have received a copy of the GNU General Public License
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
+import mmap
 import re
 import os
+import sre_constants
+import sre_parse
 import tempfile
 
 DOCUMENTATION = """
@@ -74,6 +77,18 @@ options:
     version_added: "1.9"
     description:
       - 'This flag indicates that filesystem links, if they exist, should be followed.'
+  stream:
+    required: false
+    default: "no"
+    choices: [ "yes", "no" ]
+    version_added: "2.3"
+    description:
+      - Do not load the whole file into memory, for very large files.
+      - When C(regexp) cannot match a newline, cannot match an empty string and does
+        not use C(\\A) or C(\\Z), the file is read and replaced in blocks of lines.
+        Otherwise it is searched through a read-only memory map.
+      - Either way the replaced file is only written once a replacement changes
+        something, and no C(diff) is reported.
 """
 
 EXAMPLES = r"""
@@ -82,8 +97,22 @@ EXAMPLES = r"""
 - replace: dest=/home/jdoe/.ssh/known_hosts regexp='^old\.host\.name[^\n]*\n' owner=jdoe group=jdoe mode=644
 
 - replace: dest=/etc/apache/ports regexp='^(NameVirtualHost|Listen)\s+80\s*$' replace='\1 127.0.0.1:8080' validate='/usr/sbin/apache2ctl -f %s -t'
+
+# Rewrite a multi-GB dump without reading it into memory
+- replace: dest=/srv/dumps/app.sql regexp='old\.example\.com' replace='new.example.com' stream=yes
 """
 
+# amount of lines read at once in stream mode, in bytes
+BLOCKSIZE = 1024 * 1024
+
+NEWLINE = ord('\n')
+
+# classes of characters that contain a newline, or not
+NEWLINE_CATEGORIES = (sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_NOT_DIGIT,
+                      sre_constants.CATEGORY_NOT_WORD, sre_constants.CATEGORY_LINEBREAK)
+OTHER_CATEGORIES = (sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_WORD,
+                    sre_constants.CATEGORY_NOT_SPACE, sre_constants.CATEGORY_NOT_LINEBREAK)
+
 def write_changes(module,contents,dest):
 
     tmpfd, tmpfile = tempfile.mkstemp()
@@ -91,6 +120,10 @@ def write_changes(module,contents,dest):
     f.write(contents)
     f.close()
 
+    install_changes(module, tmpfile, dest)
+
+def install_changes(module, tmpfile, dest):
+
     validate = module.params.get('validate', None)
     valid = not validate
     if validate:
@@ -104,6 +137,162 @@ def write_changes(module,contents,dest):
     if valid:
         module.atomic_move(tmpfile, dest, unsafe_writes=module.params['unsafe_writes'])
 
+def class_matches_newline(items):
+    ''' whether a parsed character class matches a newline, True when unsure '''
+    negate = False
+    matches = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            matches |= av == NEWLINE
+        elif op == sre_constants.RANGE:
+            matches |= av[0] <= NEWLINE <= av[1]
+        elif op == sre_constants.CATEGORY and av in NEWLINE_CATEGORIES:
+            matches = True
+        elif op != sre_constants.CATEGORY or av not in OTHER_CATEGORIES:
+            return True
+    return matches != negate
+
+def can_span_lines(pattern, flags):
+    '''
+    whether a parsed pattern can match a newline or depends on where the string
+    starts and ends, so that it cannot be applied to a file block by block. True when unsure
+    '''
+    for op, av in pattern:
+        if op == sre_constants.LITERAL:
+            if av == NEWLINE:
+                return True
+        elif op == sre_constants.NOT_LITERAL:
+            if av != NEWLINE:
+                return True
+        elif op == sre_constants.ANY:
+            if flags & re.DOTALL:
+                return True
+        elif op == sre_constants.IN:
+            if class_matches_newline(av):
+                return True
+        elif op == sre_constants.AT:
+            if av in (sre_constants.AT_BEGINNING_STRING, sre_constants.AT_END_STRING):
+                return True
+        elif op == sre_constants.BRANCH:
+            for item in av[1]:
+                if can_span_lines(item, flags):
+                    return True
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if can_span_lines(av[2], flags):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if can_span_lines(av[-1], flags):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if can_span_lines(av[1], flags):
+                return True
+        elif op == sre_constants.GROUPREF_EXISTS:
+            for item in av[1:]:
+                if item is not None and can_span_lines(item, flags):
+                    return True
+        elif op != sre_constants.GROUPREF:
+            return True
+    return False
+
+def is_linewise(regexp, mre):
+    ''' whether a pattern gives the same result when applied to a file block of lines by block '''
+    parsed = sre_parse.parse(regexp, mre.flags)
+    # empty matches would be found twice, at the end of a block and the start of the next
+    if parsed.getwidth()[0] == 0:
+        return False
+    return not can_span_lines(parsed, mre.flags)
+
+def line_replacements(mre, replace, f):
+    '''
+    replaced blocks of lines read from f as (start, end, replacement, count, differs),
+    where count is the number of matches replaced in the block
+    '''
+    offset = 0
+    block = b('').join(f.readlines(BLOCKSIZE))
+    while block:
+        new, count = mre.subn(replace, block)
+        if count:
+            yield offset, offset + len(block), new, count, new != block
+        offset += len(block)
+        block = b('').join(f.readlines(BLOCKSIZE))
+
+def mmap_replacements(mre, replace, contents):
+    ''' matches and their replacement as (start, end, replacement, 1, differs), searching a memory map '''
+    # expanding a template costs more than the search, skip it for plain replacements
+    literal = b('\\') not in replace
+    new = replace
+    for m in mre.finditer(contents):
+        if not literal:
+            new = m.expand(replace)
+        yield m.start(), m.end(), new, 1, new != m.group(0)
+
+def copy_range(src, out, start, end=None):
+    ''' copy bytes start to end of src, up to its end when end is None, to out in chunks '''
+    if src.tell() != start:
+        src.seek(start)
+    while end is None or start < end:
+        size = BLOCKSIZE
+        if end is not None:
+            size = min(size, end - start)
+        data = src.read(size)
+        if not data:
+            break
+        out.write(data)
+        start += len(data)
+
+def stream_replace(module, regexp, replace, dest):
+    '''
+    replace every match of regexp in dest without reading it into memory.
+    returns the number of replacements, whether they change the file and the
+    temp file holding the result, only created once a replacement changes something
+    '''
+    regexp = to_bytes(regexp, errors='surrogate_or_strict')
+    replace = to_bytes(replace, errors='surrogate_or_strict')
+    mre = re.compile(regexp, re.MULTILINE)
+    f = open(dest, 'rb')
+    src = f
+    if is_linewise(regexp, mre):
+        # blocks are read through their own file object, src is seeked to copy unchanged parts
+        src = open(dest, 'rb')
+        replacements = line_replacements(mre, replace, f)
+    elif os.fstat(f.fileno()).st_size == 0:
+        # empty files cannot be mapped, src stays the plain file object
+        replacements = mmap_replacements(mre, replace, b(''))
+    else:
+        # unchanged parts are copied from the map as well, without a read() per match
+        src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        replacements = mmap_replacements(mre, replace, src)
+
+    count = 0
+    changed = False
+    tmpfile = None
+    out = None
+    pos = 0
+    try:
+        for start, end, new, matches, differs in replacements:
+            count += matches
+            changed |= differs
+            if not differs or module.check_mode:
+                continue
+            if out is None:
+                tmpfd, tmpfile = tempfile.mkstemp()
+                out = os.fdopen(tmpfd, 'wb')
+            copy_range(src, out, pos, start)
+            out.write(new)
+            pos = end
+        if out is not None:
+            copy_range(src, out, pos)
+    finally:
+        if src is not f:
+            src.close()
+        f.close()
+        if out is not None:
+            out.close()
+
+    return count, changed, tmpfile
+
 def check_file_attrs(module, changed, message):
 
     file_args = module.load_file_common_arguments(module.params)
@@ -124,6 +313,7 @@ def main():
             replace=dict(default='', type='str'),
             backup=dict(default=False, type='bool'),
             validate=dict(default=None, type='str'),
+            stream=dict(default=False, type='bool'),
         ),
         add_file_common_args=True,
         supports_check_mode=True
@@ -138,43 +328,58 @@ def main():
 
     if not os.path.exists(dest):
         module.fail_json(rc=257, msg='Destination %s does not exist !' % dest)
+
+    if params['stream']:
+        count, changed, tmpfile = stream_replace(module, params['regexp'], params['replace'], dest)
+        msg = ''
+        if changed:
+            msg = '%s replacements made' % count
+
+        if changed and not module.check_mode:
+            if params['backup']:
+                module.backup_local(dest)
+            if params['follow'] and os.path.islink(dest):
+                dest = os.path.realpath(dest)
+            install_changes(module, tmpfile, dest)
     else:
         f = open(dest, 'rb')
         contents = f.read()
         f.close()
 
-    if module._diff:
-        diff = {
-            'before_header': dest,
-            'before': contents,
-        }
+        if module._diff:
+            diff = {
+                'before_header': dest,
+                'before': contents,
+            }
 
-    mre = re.compile(params['regexp'], re.MULTILINE)
-    result = re.subn(mre, params['replace'], contents, 0)
+        mre = re.compile(params['regexp'], re.MULTILINE)
+        result = re.subn(mre, params['replace'], contents, 0)
 
-    if result[1] > 0 and contents != result[0]:
-        msg = '%s replacements made' % result[1]
-        changed = True
-        if module._diff:
-            diff['after_header'] = dest
-            diff['after'] = result[0]
-    else:
-        msg = ''
-        changed = False
-        diff = dict()
+        if result[1] > 0 and contents != result[0]:
+            msg = '%s replacements made' % result[1]
+            changed = True
+            if module._diff:
+                diff['after_header'] = dest
+                diff['after'] = result[0]
+        else:
+            msg = ''
+            changed = False
+            diff = dict()
 
-    if changed and not module.check_mode:
-        if params['backup'] and os.path.exists(dest):
-            module.backup_local(dest)
-        if params['follow'] and os.path.islink(dest):
-            dest = os.path.realpath(dest)
-        write_changes(module, result[0], dest)
+        if changed and not module.check_mode:
+            if params['backup'] and os.path.exists(dest):
+                module.backup_local(dest)
+            if params['follow'] and os.path.islink(dest):
+                dest = os.path.realpath(dest)
+            write_changes(module, result[0], dest)
 
     msg, changed = check_file_attrs(module, changed, msg)
     module.exit_json(changed=changed, msg=msg, diff=diff)
 
 # this is magic, see lib/ansible/module_common.py
 from ansible.module_utils.basic import *
+from ansible.module_utils.six import b
+from ansible.module_utils._text import to_bytes
 
 if __name__ == '__main__':
     main()
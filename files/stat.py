@@ -25,8 +25,18 @@ options:
   path:
     description:
       - The full path of the file/object to get the facts of
-    required: true
+      - Either C(path) or C(paths) is required.
+    required: false
     default: null
+  paths:
+    description:
+      - List of full paths to get the facts of in one run, results are returned in C(stats) keyed by path.
+      - An entry can also be a dictionary with C(path), C(size) and C(mtime) keys, e.g. from an earlier
+        run, if the file still has that size and mtime no checksums are computed for it and
+        C(unchanged) is returned as C(true).
+    required: false
+    default: null
+    version_added: "2.3"
   follow:
     description:
       - Whether to follow symlinks
@@ -63,6 +73,23 @@ options:
     default: No
     version_added: "2.1"
     aliases: [ 'mime_type', 'mime-type' ]
+  checksum_cache:
+    description:
+      - Path of an on-host cache of file checksums. Files are keyed on their device, inode, size,
+        mtime and ctime, so C(md5) and C(checksum) are only computed again when the file changed.
+      - The same cache can be shared with the M(copy) and M(get_url) modules.
+    required: false
+    default: null
+    version_added: "2.3"
+  checksum_algorithms:
+    description:
+      - List of algorithms to compute checksums with, all of them (and C(md5) and C(checksum)
+        if requested) are computed in a single read of the file.
+      - The results are returned in C(checksums), keyed by algorithm, along with the time
+        spent reading in C(checksum_timing).
+    required: false
+    default: null
+    version_added: "2.3"
 author: "Bruce Pennypacker (@bpennypacker)"
 '''
 
@@ -103,12 +130,32 @@ EXAMPLES = '''
 
 # Use sha256 to calculate checksum
 - stat: path=/path/to/something checksum_algorithm=sha256
+
+# Get sha256 and sha512 checksums of a large file while reading it once
+- stat: path=/path/to/myhugefile get_md5=no get_checksum=no checksum_algorithms=sha256,sha512
+
+# Get the facts of several files at once, skipping checksums of the one that kept its size and mtime
+- stat:
+    paths:
+      - /etc/ssh/sshd_config
+      - path: /etc/ssh/ssh_config
+        size: 1669
+        mtime: 1424348972.575
+  register: configs
+- debug: msg="{{ configs.stats['/etc/ssh/sshd_config'].checksum }}"
+
+# Only hash a large artifact again when it changed since the last run
+- stat: path=/srv/images/base.qcow2 checksum_cache=/var/cache/ansible/checksums
 '''
 
 RETURN = '''
+stats:
+    description: dictionary of the dictionaries described in C(stat), keyed by path
+    returned: success and paths was given
+    type: dictionary
 stat:
     description: dictionary containing all the stat data
-    returned: success
+    returned: success and path was given
     type: dictionary
     contains:
         exists:
@@ -278,6 +325,25 @@ stat:
                 hashing and supplied checksum algorithm is available
             type: string
             sample: 50ba294cdf28c0d5bcde25708df53346825a429f
+        checksums:
+            description: hashes of the path, keyed by algorithm
+            returned: success, path exists, user can read stats, path supports
+                hashing and checksum_algorithms was given
+            type: dictionary
+            sample: {"sha256": "b5bb9d8014a0f9b1d61e21e796d78dccdf1352f23cd32812f4850b878ae4944c"}
+        checksum_timing:
+            description: bytes read to compute the hashes, the seconds it took and the resulting
+                rate, no bytes are read when every hash came from the checksum cache
+            returned: success, path exists, user can read stats, path supports
+                hashing and checksum_algorithms was given
+            type: dictionary
+            sample: {"bytes": 1048576000, "seconds": 2.5, "bytes_per_second": 419430400}
+        unchanged:
+            description: whether the path still has the size and mtime given for it in C(paths),
+                when true no checksums are returned
+            returned: success, path exists and an expected size and mtime were given
+            type: boolean
+            sample: True
         pw_name:
             description: User name of owner
             returned: success, path exists and user can read stats and installed python supports it
@@ -324,15 +390,221 @@ import grp
 import os
 import pwd
 import stat
+import tempfile
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
 
 # import module snippets
-from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.basic import AnsibleModule, AVAILABLE_HASH_ALGORITHMS
 from ansible.module_utils.pycompat24 import get_exception
 from ansible.module_utils._text import to_bytes
 
 
+# read size when hashing, large enough to keep syscall overhead low on big files
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def digest_file(module, path, algorithms):
+    '''
+    Compute several digests of path, feeding every hash object from the same buffered read.
+    Returns a dict of algorithm to hex digest, md5 is None when unavailable (FIPS), and the bytes read.
+    '''
+    hashes = {}
+    results = {}
+    for algorithm in algorithms:
+        try:
+            hashes[algorithm] = AVAILABLE_HASH_ALGORITHMS[algorithm]()
+        except (KeyError, ValueError):
+            # md5 raises ValueError on FIPS enabled systems
+            if algorithm != 'md5':
+                module.fail_json(msg="Could not hash file '%s' with algorithm '%s'. Available algorithms: %s" %
+                                     (path, algorithm, ', '.join(AVAILABLE_HASH_ALGORITHMS)))
+            results[algorithm] = None
+
+    read = 0
+    f = open(path, 'rb')
+    try:
+        data = f.read(HASH_BUFFER_SIZE)
+        while data:
+            for h in hashes.values():
+                h.update(data)
+            read += len(data)
+            data = f.read(HASH_BUFFER_SIZE)
+    finally:
+        f.close()
+
+    for algorithm, h in hashes.items():
+        results[algorithm] = h.hexdigest()
+    return results, read
+
+
+class ChecksumCache(object):
+    '''
+    Optional on-host store of file digests, so files that did not change are not hashed again.
+    The stat, copy and get_url modules share the same store. This class and digest_file() are
+    copied verbatim into each of them, files/stat.py holds the canonical copy: change it there
+    and copy it over.
+    '''
+
+    # entries kept, the least recently used ones are dropped first
+    max_entries = 4096
+
+    def __init__(self, module, path=None):
+        self.module = module
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        # bytes read and seconds spent hashing by the last digests() call
+        self.read = 0
+        self.elapsed = 0.0
+        if path is None:
+            return
+        try:
+            f = open(path, 'r')
+            try:
+                entries = json.load(f)
+            finally:
+                f.close()
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (IOError, OSError, ValueError):
+            # missing or unreadable, it is only a cache
+            pass
+
+    def _key(self, st, algorithm):
+        stamps = []
+        for name in ('mtime', 'ctime'):
+            ns = getattr(st, 'st_%s_ns' % name, None)
+            if ns is None:
+                ns = int(getattr(st, 'st_%s' % name) * 1000000000)
+            stamps.append(ns)
+        return '%d:%d:%d:%d:%d:%s' % (st.st_dev, st.st_ino, st.st_size, stamps[0], stamps[1], algorithm)
+
+    def _compute(self, filename, algorithm):
+        if algorithm == 'md5':
+            # keeps raising ValueError on FIPS enabled systems
+            return self.module.md5(filename)
+        return self.module.digest_from_file(filename, algorithm)
+
+    def digest(self, filename, algorithm='sha1'):
+        ''' Return the hex digest of filename, only reading the file when the cache has no entry for it. '''
+        if self.path is None:
+            return self._compute(filename, algorithm)
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return self._compute(filename, algorithm)
+
+        now = time.time()
+        key = self._key(st, algorithm)
+        entry = self.entries.get(key)
+        if entry is not None:
+            # only rewrite the store for access times once in a while
+            if now - entry[1] > 3600:
+                entry[1] = now
+                self.dirty = True
+            return entry[0]
+
+        value = self._compute(filename, algorithm)
+        # a file modified within the timestamp granularity could change again without its
+        # stat changing, do not trust those
+        if value is not None and now - st.st_mtime > 2:
+            self.entries[key] = [value, now]
+            self.dirty = True
+        return value
+
+    def digests(self, filename, algorithms):
+        '''
+        Return a dict of the hex digests of filename, hashing all the ones the cache has no entry
+        for in a single read. The bytes read and the seconds it took are left in read and elapsed.
+        '''
+        st = None
+        if self.path is not None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                pass
+
+        now = time.time()
+        self.read = 0
+        self.elapsed = 0.0
+        results = {}
+        keys = {}
+        missing = []
+        for algorithm in algorithms:
+            if st is not None:
+                keys[algorithm] = self._key(st, algorithm)
+                entry = self.entries.get(keys[algorithm])
+                if entry is not None:
+                    # only rewrite the store for access times once in a while
+                    if now - entry[1] > 3600:
+                        entry[1] = now
+                        self.dirty = True
+                    results[algorithm] = entry[0]
+                    continue
+            missing.append(algorithm)
+
+        if not missing:
+            return results
+
+        computed, self.read = digest_file(self.module, filename, missing)
+        self.elapsed = time.time() - now
+        for algorithm, value in computed.items():
+            results[algorithm] = value
+            # a file modified within the timestamp granularity could change again without its
+            # stat changing, do not trust those
+            if value is not None and st is not None and now - st.st_mtime > 2:
+                self.entries[keys[algorithm]] = [value, now]
+                self.dirty = True
+        return results
+
+    def save(self):
+        ''' Write the store back if anything changed, dropping the oldest entries past max_entries. '''
+        if self.path is None or not self.dirty:
+            return
+
+        if len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda item: item[1][1])[-self.max_entries:]
+            self.entries = dict(keep)
+
+        try:
+            cache_dir = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(self.entries, f)
+            finally:
+                f.close()
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+        self.dirty = False
+
+
+def lookup_name(names, getter, id):
+    ''' Return the user or group name for id, or None, remembering answers in names across paths. '''
+    key = (getter.__name__, id)
+    if key not in names:
+        try:
+            names[key] = getter(id)[0]
+        except:
+            names[key] = None
+    return names[key]
+
+
 def format_output(module, path, st, follow, get_md5, get_checksum,
-                  checksum_algorithm, mimetype=None, charset=None):
+                  checksum_algorithm, mimetype=None, charset=None, cache=None,
+                  checksum_algorithms=None, names=None):
+    if cache is None:
+        cache = ChecksumCache(module)
+
     mode = st.st_mode
 
     # back to ansible
@@ -375,25 +647,43 @@ def format_output(module, path, st, follow, get_md5, get_checksum,
     if stat.S_ISLNK(mode):
         output['lnk_source'] = os.path.realpath(path)
 
-    if stat.S_ISREG(mode) and get_md5 and os.access(path, os.R_OK):
-        # Will fail on FIPS-140 compliant systems
-        try:
-            output['md5'] = module.md5(path)
-        except ValueError:
-            output['md5'] = None
+    # every digest asked for comes out of a single read of the file
+    algorithms = []
+    if get_md5:
+        algorithms.append('md5')
+    if get_checksum:
+        algorithms.append(checksum_algorithm)
+    for algorithm in checksum_algorithms or []:
+        if algorithm not in algorithms:
+            algorithms.append(algorithm)
 
-    if stat.S_ISREG(mode) and get_checksum and os.access(path, os.R_OK):
-        output['checksum'] = module.digest_from_file(path, checksum_algorithm)
+    if stat.S_ISREG(mode) and algorithms and os.access(path, os.R_OK):
+        digests = cache.digests(path, algorithms)
 
-    try:
-        pw = pwd.getpwuid(st.st_uid)
+        if get_md5:
+            # None on FIPS-140 compliant systems
+            output['md5'] = digests['md5']
+
+        if get_checksum:
+            output['checksum'] = digests[checksum_algorithm]
 
-        output['pw_name'] = pw.pw_name
+        if checksum_algorithms:
+            output['checksums'] = dict([(a, digests[a]) for a in checksum_algorithms])
+            if cache.elapsed > 0:
+                rate = int(cache.read / cache.elapsed)
+            else:
+                rate = None
+            output['checksum_timing'] = dict(bytes=cache.read, seconds=cache.elapsed, bytes_per_second=rate)
 
-        grp_info = grp.getgrgid(st.st_gid)
-        output['gr_name'] = grp_info.gr_name
-    except:
-        pass
+    if names is None:
+        names = {}
+    pw_name = lookup_name(names, pwd.getpwuid, st.st_uid)
+    if pw_name is not None:
+        output['pw_name'] = pw_name
+
+        gr_name = lookup_name(names, grp.getgrgid, st.st_gid)
+        if gr_name is not None:
+            output['gr_name'] = gr_name
 
     if not (mimetype is None and charset is None):
         output['mime_type'] = mimetype
@@ -405,7 +695,8 @@ def format_output(module, path, st, follow, get_md5, get_checksum,
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            path=dict(required=True, type='path'),
+            path=dict(type='path'),
+            paths=dict(type='list'),
             follow=dict(default='no', type='bool'),
             get_md5=dict(default='yes', type='bool'),
             get_checksum=dict(default='yes', type='bool'),
@@ -413,52 +704,96 @@ def main():
                                     choices=['sha1', 'sha224', 'sha256', 'sha384', 'sha512'],
                                     aliases=['checksum_algo', 'checksum']),
             mime=dict(default=False, type='bool', aliases=['mime_type', 'mime-type']),
+            checksum_cache=dict(default=None, type='path'),
+            checksum_algorithms=dict(default=None, type='list'),
         ),
+        mutually_exclusive=[['path', 'paths']],
+        required_one_of=[['path', 'paths']],
         supports_check_mode=True
     )
 
     path = module.params.get('path')
-    b_path = to_bytes(path, errors='surrogate_or_strict')
+    paths = module.params.get('paths')
     follow = module.params.get('follow')
     get_mime = module.params.get('mime')
     get_md5 = module.params.get('get_md5')
     get_checksum = module.params.get('get_checksum')
     checksum_algorithm = module.params.get('checksum_algorithm')
+    checksum_algorithms = module.params.get('checksum_algorithms')
 
-    try:
-        if follow:
-            st = os.stat(b_path)
-        else:
-            st = os.lstat(b_path)
-    except OSError:
-        e = get_exception()
-        if e.errno == errno.ENOENT:
-            output = {'exists': False}
-            module.exit_json(changed=False, stat=output)
-
-        module.fail_json(msg=e.strerror)
-
-    mimetype = None
-    charset = None
-    if get_mime:
-        mimetype = 'unknown'
-        charset = 'unknown'
-
-        filecmd = [module.get_bin_path('file', True), '-i', path]
+    cache = ChecksumCache(module, module.params.get('checksum_cache'))
+    names = {}
+
+    def stat_path(path, expected=None):
+        b_path = to_bytes(path, errors='surrogate_or_strict')
         try:
-            rc, out, err = module.run_command(filecmd)
-            if rc == 0:
-                mimetype, charset = out.split(':')[1].split(';')
-                mimetype = mimetype.strip()
-                charset = charset.split('=')[1].strip()
-        except:
-            pass
+            if follow:
+                st = os.stat(b_path)
+            else:
+                st = os.lstat(b_path)
+        except OSError:
+            e = get_exception()
+            if e.errno == errno.ENOENT:
+                return {'exists': False}
 
-    output = format_output(module, path, st, follow, get_md5, get_checksum,
-                           checksum_algorithm, mimetype=mimetype,
-                           charset=charset)
+            module.fail_json(path=path, msg=e.strerror)
+
+        mimetype = None
+        charset = None
+        if get_mime:
+            mimetype = 'unknown'
+            charset = 'unknown'
+
+            filecmd = [module.get_bin_path('file', True), '-i', path]
+            try:
+                rc, out, err = module.run_command(filecmd)
+                if rc == 0:
+                    mimetype, charset = out.split(':')[1].split(';')
+                    mimetype = mimetype.strip()
+                    charset = charset.split('=')[1].strip()
+            except:
+                pass
+
+        # the caller already knows the checksums of a file that kept its size and mtime
+        unchanged = None
+        if expected is not None:
+            unchanged = False
+            try:
+                unchanged = int(expected['size']) == st.st_size and float(expected['mtime']) == st.st_mtime
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        if unchanged:
+            output = format_output(module, path, st, follow, False, False,
+                                   checksum_algorithm, mimetype=mimetype,
+                                   charset=charset, cache=cache, names=names)
+        else:
+            output = format_output(module, path, st, follow, get_md5, get_checksum,
+                                   checksum_algorithm, mimetype=mimetype,
+                                   charset=charset, cache=cache,
+                                   checksum_algorithms=checksum_algorithms, names=names)
+        if unchanged is not None:
+            output['unchanged'] = unchanged
+        return output
+
+    if paths is None:
+        output = stat_path(path)
+        cache.save()
+        module.exit_json(changed=False, stat=output)
+
+    outputs = {}
+    for item in paths:
+        if isinstance(item, dict):
+            if 'path' not in item:
+                module.fail_json(msg="each entry of paths needs a path key: %s" % item)
+            name = os.path.expanduser(os.path.expandvars(item['path']))
+            outputs[name] = stat_path(name, item)
+        else:
+            name = os.path.expanduser(os.path.expandvars(item))
+            outputs[name] = stat_path(name)
+    cache.save()
 
-    module.exit_json(changed=False, stat=output)
+    module.exit_json(changed=False, stats=outputs)
 
 if __name__ == '__main__':
     main()
@@ -164,6 +164,25 @@ options:
     default: no
     required: false
     version_added: "2.0"
+  batch:
+    description:
+      - A list of paths below C(src) to synchronize to the same path below C(dest), all in a single
+        rsync run, so the connection is set up and the file list built only once.
+      - An item can also be a hash of C(src) and C(dest), with C(dest) the trailing part of C(src)
+        it is synchronized to below C(dest), e.g. C(src=build/app1/conf dest=app1/conf).
+      - Implemented with rsync's C(--files-from). The changes are returned per item in C(batch_results).
+    required: false
+    default: null
+    version_added: "2.3"
+  stats:
+    description:
+      - Run rsync with C(--stats) and return its summary in C(stats), with the number of files
+        transferred, literal and matched bytes, bytes sent and received, the transfer rate,
+        the speedup and the elapsed time of the run.
+      - rsync then runs in the C locale, so its numbers can be read whatever the locale of the host.
+    choices: [ 'yes', 'no' ]
+    default: 'no'
+    version_added: "2.3"
 notes:
    - rsync must be installed on both the local and remote host.
    - For the C(synchronize) module, the "local host" is the host `the synchronize task originates on`, and the "destination host" is the host `synchronize is connecting to`.
@@ -252,9 +271,99 @@ synchronize:
     rsync_opts:
       - "--no-motd"
       - "--exclude=.git"
+
+# Synchronize many directories below src with one rsync run
+synchronize:
+    src: /srv/build/
+    dest: /var/www/
+    batch:
+      - site1
+      - site2/static
+      - src: releases/42/site3
+        dest: site3
+
+# Report how much was transferred and how fast
+synchronize: src=some/relative/path dest=/some/absolute/path stats=yes
+'''
+
+RETURN = '''
+changes:
+    description: every item rsync reported, parsed from its itemized changes
+    returned: success
+    type: list
+    sample: [{"path": "conf/app.conf", "update": "sent", "type": "file", "created": false, "attributes": ["checksum", "size", "time"]}]
+batch_results:
+    description: the items of C(batch), each with whether it changed and its C(changes)
+    returned: success, when C(batch) is used
+    type: list
+    sample: [{"src": "site1", "dest": "site1", "changed": true, "changes": []}]
+stats:
+    description: the transfer summary of rsync, numbers of bytes except for the C(files) counts,
+                 C(bytes_per_sec), C(speedup) and the times, which are in seconds
+    returned: success, when C(stats=yes)
+    type: dict
+    sample: {"files": 1234, "files_created": 10, "files_deleted": 0, "files_transferred": 12,
+             "total_file_size": 123456, "total_transferred_file_size": 12345,
+             "literal_data": 1234, "matched_data": 11111, "file_list_size": 0,
+             "file_list_generation_time": 0.001, "file_list_transfer_time": 0.0,
+             "bytes_sent": 2345, "bytes_received": 123, "bytes_per_sec": 4936.0,
+             "speedup": 50.02, "elapsed": 0.512}
 '''
+
+import os
+import re
+import tempfile
+import time
+
 client_addr = None
 
+# first letter of an itemized change, the kind of update
+ITEMIZED_UPDATES = {
+    '<': 'sent',
+    '>': 'received',
+    'c': 'created',
+    'h': 'hardlink',
+    '.': 'attributes',
+    '*': 'message',
+}
+
+# second letter, the type of the item
+ITEMIZED_TYPES = {
+    'f': 'file',
+    'd': 'directory',
+    'L': 'symlink',
+    'D': 'device',
+    'S': 'special',
+}
+
+# the letters after that, in order
+ITEMIZED_ATTRIBUTES = ('checksum', 'size', 'time', 'permissions', 'owner', 'group', 'atime', 'acl', 'xattr')
+
+ITEMIZED_RE = re.compile(r'^([<>ch.*]\S*) +(.*)$')
+
+# lines of rsync --stats output, older rsyncs name some of them differently
+STATS_FIELDS = {
+    'Number of files': 'files',
+    'Number of created files': 'files_created',
+    'Number of deleted files': 'files_deleted',
+    'Number of regular files transferred': 'files_transferred',
+    'Number of files transferred': 'files_transferred',
+    'Total file size': 'total_file_size',
+    'Total transferred file size': 'total_transferred_file_size',
+    'Literal data': 'literal_data',
+    'Matched data': 'matched_data',
+    'File list size': 'file_list_size',
+    'File list generation time': 'file_list_generation_time',
+    'File list transfer time': 'file_list_transfer_time',
+    'Total bytes sent': 'bytes_sent',
+    'Total bytes received': 'bytes_received',
+}
+
+# a number with a unit suffix, from --human-readable, is left out
+STATS_RE = re.compile(r'^([A-Z][A-Za-z ]+): ([\d,.]+)(?: |$)')
+STATS_RATE_RE = re.compile(r'^sent [\d,.]+ bytes +received [\d,.]+ bytes +([\d,.]+) bytes/sec')
+STATS_SPEEDUP_RE = re.compile(r'^total size is [\d,.]+ +speedup is ([\d,.]+)')
+
 
 def substitute_controller(path):
     global client_addr
@@ -276,6 +385,120 @@ def substitute_controller(path):
     return path
 
 
+def parse_itemized(line):
+    ''' parse a line of rsync --itemize-changes output, None when it is something else '''
+    m = ITEMIZED_RE.match(line)
+    if not m:
+        return None
+    flags, path = m.groups()
+
+    if flags[0] == '*':
+        # e.g. *deleting
+        return dict(path=path, update='message', message=flags[1:], type=None, created=False, attributes=[])
+
+    target = None
+    if flags[1:2] == 'L' and ' -> ' in path:
+        path, target = path.split(' -> ', 1)
+
+    attributes = []
+    created = '+' in flags[2:]
+    if not created:
+        for i, letter in enumerate(flags[2:]):
+            if letter not in '. ' and i < len(ITEMIZED_ATTRIBUTES):
+                attributes.append(ITEMIZED_ATTRIBUTES[i])
+
+    change = dict(path=path, update=ITEMIZED_UPDATES[flags[0]], type=ITEMIZED_TYPES.get(flags[1:2]),
+                  created=created, attributes=attributes)
+    if target is not None:
+        change['target'] = target
+    return change
+
+
+def stats_number(value):
+    ''' convert a number from rsync output, which may have thousands separators, None if it is not one '''
+    value = value.replace(',', '')
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_stats(out):
+    ''' parse the summary rsync prints with --stats '''
+    stats = {}
+    for line in out.split('\n'):
+        line = line.strip()
+        m = STATS_RE.match(line)
+        if m and m.group(1) in STATS_FIELDS:
+            stats[STATS_FIELDS[m.group(1)]] = stats_number(m.group(2))
+            continue
+        m = STATS_RATE_RE.match(line)
+        if m:
+            stats['bytes_per_sec'] = stats_number(m.group(1))
+            continue
+        m = STATS_SPEEDUP_RE.match(line)
+        if m:
+            stats['speedup'] = stats_number(m.group(1))
+    return stats
+
+
+def batch_entries(module, batch):
+    '''
+    normalize the items of batch to (src, dest) pairs and return them with the
+    lines of the --files-from list, where /./ marks the part of src kept below dest
+    '''
+    entries = []
+    files_from = []
+    for item in batch:
+        if isinstance(item, dict):
+            unsupported = set(item.keys()) - set(['src', 'dest'])
+            if unsupported or 'src' not in item:
+                module.fail_json(msg='batch items must be a path or a hash of src and dest: %s' % item)
+            src = item['src']
+            dest = item.get('dest') or src
+        else:
+            src = dest = item
+
+        src = os.path.normpath(src)
+        dest = os.path.normpath(dest)
+        for path in (src, dest):
+            if os.path.isabs(path) or path == '..' or path.startswith('../'):
+                module.fail_json(msg='batch paths must be relative and below src and dest: %s' % path)
+
+        if src == dest:
+            files_from.append(src)
+        elif src.endswith('/' + dest):
+            files_from.append('%s/./%s' % (src[:-len(dest) - 1], dest))
+        else:
+            module.fail_json(msg='the dest of a batch item must be the trailing part of its src: %s' % item)
+        entries.append((src, dest))
+    return entries, files_from
+
+
+def batch_results(entries, changes):
+    ''' split the changes of a batch run between the items they belong to '''
+    results = []
+    for src, dest in entries:
+        results.append(dict(src=src, dest=dest, changed=False, changes=[]))
+
+    for change in changes:
+        path = change['path'].rstrip('/')
+        # the most specific item wins when one is nested in another
+        best = None
+        for i, (src, dest) in enumerate(entries):
+            if path == dest or path.startswith(dest + '/'):
+                if best is None or len(dest) > len(entries[best][1]):
+                    best = i
+        if best is not None:
+            results[best]['changes'].append(change)
+            results[best]['changed'] = True
+    return results
+
+
 def main():
     module = AnsibleModule(
         argument_spec = dict(
@@ -306,6 +529,8 @@ def main():
             partial = dict(default='no', type='bool'),
             verify_host = dict(default='no', type='bool'),
             mode = dict(default='push', choices=['push', 'pull']),
+            batch = dict(type='list'),
+            stats = dict(default='no', type='bool'),
         ),
         supports_check_mode = True
     )
@@ -342,6 +567,8 @@ def main():
     rsync_opts = module.params['rsync_opts']
     ssh_args = module.params['ssh_args']
     verify_host = module.params['verify_host']
+    batch = module.params['batch']
+    stats = module.params['stats']
 
     if '/' not in rsync:
         rsync = module.get_bin_path(rsync, required=True)
@@ -428,6 +655,23 @@ def main():
     if partial:
         cmd = cmd + " --partial"
 
+    if stats:
+        cmd = cmd + " --stats"
+
+    files_from_path = None
+    if batch:
+        entries, files_from = batch_entries(module, batch)
+        fd, files_from_path = tempfile.mkstemp()
+        f = os.fdopen(fd, 'w')
+        try:
+            f.write('\n'.join(files_from) + '\n')
+        finally:
+            f.close()
+        cmd = cmd + " --files-from='%s'" % files_from_path
+        # --archive does not imply --recursive with --files-from
+        if recursive is True or (archive and recursive is not False):
+            cmd = cmd + " --recursive"
+
     changed_marker = '<<CHANGED>>'
     cmd = cmd + " --out-format='" + changed_marker + "%i %n%L'"
 
@@ -439,7 +683,16 @@ def main():
 
     cmd = ' '.join([cmd, source, dest])
     cmdstr = cmd
-    (rc, out, err) = module.run_command(cmd)
+    start = time.time()
+    try:
+        if stats:
+            # --stats numbers are formatted for the locale, only the C one is parsed
+            (rc, out, err) = module.run_command(cmd, environ_update=dict(LC_ALL='C'))
+        else:
+            (rc, out, err) = module.run_command(cmd)
+    finally:
+        if files_from_path is not None:
+            os.remove(files_from_path)
     if rc:
         return module.fail_json(msg=err, rc=rc, cmd=cmdstr)
     else:
@@ -448,14 +701,24 @@ def main():
         out_lines=out_clean.split('\n')
         while '' in out_lines: 
             out_lines.remove('')
+
+        changes = []
+        for line in out.split('\n'):
+            if line.startswith(changed_marker):
+                change = parse_itemized(line[len(changed_marker):])
+                if change is not None:
+                    changes.append(change)
+        result = dict(changed=changed, msg=out_clean, rc=rc, cmd=cmdstr,
+                      stdout_lines=out_lines, changes=changes)
+        if batch:
+            result['batch_results'] = batch_results(entries, changes)
+        if stats:
+            result['stats'] = parse_stats(out)
+            result['stats']['elapsed'] = round(time.time() - start, 3)
+
         if module._diff:
-            diff = {'prepared': out_clean}
-            return module.exit_json(changed=changed, msg=out_clean,
-                                    rc=rc, cmd=cmdstr, stdout_lines=out_lines,
-                                    diff=diff)
-        else:
-            return module.exit_json(changed=changed, msg=out_clean,
-                                    rc=rc, cmd=cmdstr, stdout_lines=out_lines)
+            result['diff'] = {'prepared': out_clean}
+        return module.exit_json(**result)
 
 # import module snippets
 from ansible.module_utils.basic import *
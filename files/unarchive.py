@@ -97,6 +97,29 @@ options:
     default: "yes"
     choices: ["yes", "no"]
     version_added: "2.2"
+  incremental:
+    description:
+      - When the archive differs from the destination, only extract the members that are missing or differ
+        instead of the whole archive.
+      - Zip members are written by python's zipfile module, falling back to a full C(unzip) when it cannot
+        extract them. Tar members are handed to gtar as a file list.
+      - Only has an effect when the archive could be compared in-process, so not in combination with
+        C(extra_opts), nor with C(exclude) for tar files.
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.3"
+  stream:
+    description:
+      - When C(src) is a URL, extract tar archives while they are downloaded instead of saving them to the
+        target first, so the archive never needs disk space of its own.
+      - Zip archives and anything else gtar cannot read from a pipe are still downloaded first.
+      - A streamed archive cannot be compared with the destination beforehand, so it is always extracted and
+        reported as changed, use C(creates) to skip it. Throughput is returned in C(extract_results).
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.3"
 author: "Dag Wieers (@dagwieers)"
 todo:
     - re-implement tar support using native tarfile module
@@ -104,8 +127,11 @@ todo:
 notes:
     - requires C(gtar)/C(unzip) command on target host
     - can handle I(.zip) files using C(unzip) as well as I(.tar), I(.tar.gz), I(.tar.bz2) and I(.tar.xz) files using C(gtar)
-    - uses gtar's C(--diff arg) to calculate if changed or not. If this C(arg) is not
-      supported, it will always unpack the archive
+    - compares the archive with the destination in-process using python's zipfile and tarfile
+      modules, only comparing CRCs of zip members whose size matches but mtime does not
+    - falls back to C(unzip -ZT) for zip files python cannot read, and to gtar's C(--diff arg)
+      for tar files using C(extra_opts) or C(exclude) or a compression python does not support.
+      If this C(arg) is not supported, it will always unpack the archive
     - existing files/directories in the destination which are not in the archive
       are not touched.  This is the same behavior as a normal archive extraction
     - existing files/directories in the destination which are not in the archive
@@ -121,6 +147,12 @@ EXAMPLES = '''
 
 # Unarchive a file that needs to be downloaded (added in 2.0)
 - unarchive: src=https://example.com/example.zip dest=/usr/local/bin remote_src=yes
+
+# Extract a tarball while it downloads, without a copy of it on the target
+- unarchive: src=https://example.com/example.tar.gz dest=/usr/local/bin remote_src=yes stream=yes
+
+# Only rewrite the files that changed since the previous release was unpacked
+- unarchive: src=/srv/releases/app.zip dest=/opt/app remote_src=yes incremental=yes
 '''
 
 import re
@@ -130,16 +162,30 @@ import pwd
 import grp
 import datetime
 import time
+import shutil
+import tempfile
 import binascii
 import codecs
+import errno
+import struct
+import subprocess
+import tarfile
 from zipfile import ZipFile, BadZipfile
-from ansible.module_utils._text import to_text
+from ansible.module_utils._text import to_bytes, to_native, to_text
 
 try:  # python 3.3+
     from shlex import quote
 except ImportError:  # older python
     from pipes import quote
 
+try:  # python 3.5+
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 # String from tar that shows the tar contents are different from the
 # filesystem
 OWNER_DIFF_RE = re.compile(r': Uid differs$')
@@ -153,10 +199,61 @@ ZIP_FILE_MODE_RE = re.compile(r'([r-][w-][SsTtx-]){3}')
 # When downloading an archive, how much of the archive to download before
 # saving to a tempfile (64k)
 BUFSIZE = 65536
+# tarfile read modes for the tar compression flags
+TARFILE_MODES = {'': 'r:*', '-z': 'r:gz', '-j': 'r:bz2', '-J': 'r:xz'}
+# Leading bytes of the gzip, bzip2 and xz streams gtar can extract from a pipe
+STREAM_MAGIC = (('1f8b', '-z'), ('425a68', '-j'), ('fd377a585a00', '-J'))
 
 def crc32(path):
     ''' Return a CRC32 checksum of a file '''
-    return binascii.crc32(open(path).read()) & 0xffffffff
+    crc = 0
+    f = open(path, 'rb')
+    try:
+        block = f.read(BUFSIZE)
+        while block:
+            crc = binascii.crc32(block, crc)
+            block = f.read(BUFSIZE)
+    finally:
+        f.close()
+    return crc & 0xffffffff
+
+def zipinfo_mtime(info):
+    ''' Return the mtime unzip restores for a zip member, preferring its extended timestamp over the DOS one '''
+    extra = info.extra
+    while len(extra) >= 4:
+        tag, length = struct.unpack('<HH', extra[:4])
+        # 'UT' extra field, the first flag tells whether the mtime is present
+        if tag == 0x5455 and length >= 5 and ord(extra[4:5]) & 1:
+            return struct.unpack('<i', extra[5:9])[0]
+        extra = extra[4 + length:]
+    return time.mktime(info.date_time + (0, 0, -1))
+
+class DirectoryListing(object):
+    ''' lstat paths by listing each parent directory only once, paths missing from a listing cost no further calls '''
+
+    def __init__(self):
+        self._listings = dict()
+
+    def lstat(self, path):
+        parent, name = os.path.split(path.rstrip('/'))
+        if name in ('', '.', '..'):
+            return os.lstat(path)
+
+        if parent not in self._listings:
+            try:
+                if scandir is not None:
+                    self._listings[parent] = dict([(entry.name, entry) for entry in scandir(parent)])
+                else:
+                    self._listings[parent] = dict.fromkeys(os.listdir(parent))
+            except OSError:
+                self._listings[parent] = dict()
+
+        listing = self._listings[parent]
+        if name not in listing:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        if listing[name] is None:
+            return os.lstat(path)
+        return listing[name].stat(follow_symlinks=False)
 
 def shell_escape(string):
     ''' Quote meta-characters in the args for the unix shell '''
@@ -176,6 +273,7 @@ class ZipArchive(object):
         self.module = module
         self.excludes = module.params['exclude']
         self.includes = []
+        self.touched = []
         self.cmd_path = self.module.get_bin_path('unzip')
         self._files_in_archive = []
         self._infodict = dict()
@@ -259,13 +357,100 @@ class ZipArchive(object):
             archive.close()
         return self._files_in_archive
 
+    def _zipinfo_type(self, info, path):
+        ''' Return the (ztype, permstr) unzip -ZT would show for a member '''
+        mode = info.external_attr >> 16
+        if info.create_system == 3 and mode:
+            # Unix attributes, the same unzip would restore
+            if stat.S_ISDIR(mode):
+                ztype = 'd'
+            elif stat.S_ISLNK(mode):
+                ztype = 'l'
+            elif stat.S_ISREG(mode):
+                ztype = '-'
+            else:
+                ztype = '?'
+            permstr = ''
+            for i in range(8, -1, -1):
+                if mode & (1 << i):
+                    permstr += 'rwx'[(8 - i) % 3]
+                else:
+                    permstr += '-'
+        else:
+            # FAT and friends store no permissions, unzip falls back to these
+            if path.endswith('/'):
+                ztype = 'd'
+                permstr = 'rwxrwxrwx'
+            else:
+                ztype = '-'
+                permstr = 'rw-rw-rw-'
+        return ztype, permstr
+
+    def _archive_entries(self):
+        ''' Read (path, ztype, permstr, size, timestamp) for every member from the central directory '''
+        entries = []
+        archive = ZipFile(self.src)
+        try:
+            for info in archive.infolist():
+                path = to_text(info.filename, errors='surrogate_or_strict')
+                self._infodict[path] = info.CRC
+                ztype, permstr = self._zipinfo_type(info, path)
+                entries.append((path, ztype, permstr, info.file_size, zipinfo_mtime(info)))
+        finally:
+            archive.close()
+        return entries
+
+    def _zipinfo_entries(self, out):
+        ''' Parse (path, ztype, permstr, size, timestamp) for every member from the output of unzip -ZT '''
+        entries = []
+        for line in out.splitlines():
+            pcs = line.split(None, 7)
+            if len(pcs) != 8:
+                # Too few fields... probably a piece of the header or footer
+                continue
+
+            # Check first and seventh field in order to skip header/footer
+            if len(pcs[0]) != 7 and len(pcs[0]) != 10: continue
+            if len(pcs[6]) != 15: continue
+
+            # Possible entries:
+            #   -rw-rws---  1.9 unx    2802 t- defX 11-Aug-91 13:48 perms.2660
+            #   -rw-a--     1.0 hpf    5358 Tl i4:3  4-Dec-91 11:33 longfilename.hpfs
+            #   -r--ahs     1.1 fat    4096 b- i4:2 14-Jul-91 12:58 EA DATA. SF
+            #   --w-------  1.0 mac   17357 bx i8:2  4-May-92 04:02 unzip.macr
+            if pcs[0][0] not in 'dl-?' or not frozenset(pcs[0][1:]).issubset('rwxstah-'):
+                continue
+
+            ztype = pcs[0][0]
+            permstr = pcs[0][1:]
+            size = int(pcs[3])
+            path = to_text(pcs[7], errors='surrogate_or_strict')
+
+            # Note: this timestamp calculation has a rounding error
+            # somewhere... unzip and this timestamp can be one second off
+            # When that happens, we report a change and re-unzip the file
+            dt_object = datetime.datetime(*(time.strptime(pcs[6], '%Y%m%d.%H%M%S')[0:6]))
+            timestamp = time.mktime(dt_object.timetuple())
+
+            entries.append((path, ztype, permstr, size, timestamp))
+        return entries
+
     def is_unarchived(self):
-        cmd = [ self.cmd_path, '-ZT', '-s', self.src ]
-        if self.excludes:
-            cmd.extend([ ' -x ', ] + self.excludes)
-        rc, out, err = self.module.run_command(cmd)
+        # Compare against the central directory read in-process, only list
+        # the archive with unzip when zipfile cannot read it
+        cmd = None
+        rc = 0
+        err = ''
+        try:
+            entries = self._archive_entries()
+        except Exception:
+            self._infodict = dict()
+            cmd = [ self.cmd_path, '-ZT', '-s', self.src ]
+            if self.excludes:
+                cmd.extend([ ' -x ', ] + self.excludes)
+            rc, out, err = self.module.run_command(cmd)
+            entries = self._zipinfo_entries(out)
 
-        old_out = out
         diff = ''
         out = ''
         if rc == 0:
@@ -273,6 +458,9 @@ class ZipArchive(object):
         else:
             unarchived = False
 
+        # Every parent directory in dest is listed once for all its members
+        dest_entries = DirectoryListing()
+
         # Get some information related to user/group ownership
         umask = os.umask(0)
         os.umask(umask)
@@ -328,33 +516,9 @@ class ZipArchive(object):
                 pass
             fut_gid = run_gid
 
-        for line in old_out.splitlines():
+        for path, ztype, permstr, size, timestamp in entries:
             change = False
 
-            pcs = line.split(None, 7)
-            if len(pcs) != 8:
-                # Too few fields... probably a piece of the header or footer
-                continue
-
-            # Check first and seventh field in order to skip header/footer
-            if len(pcs[0]) != 7 and len(pcs[0]) != 10: continue
-            if len(pcs[6]) != 15: continue
- 
-            # Possible entries:
-            #   -rw-rws---  1.9 unx    2802 t- defX 11-Aug-91 13:48 perms.2660
-            #   -rw-a--     1.0 hpf    5358 Tl i4:3  4-Dec-91 11:33 longfilename.hpfs
-            #   -r--ahs     1.1 fat    4096 b- i4:2 14-Jul-91 12:58 EA DATA. SF
-            #   --w-------  1.0 mac   17357 bx i8:2  4-May-92 04:02 unzip.macr
-            if pcs[0][0] not in 'dl-?' or not frozenset(pcs[0][1:]).issubset('rwxstah-'):
-                continue
-
-            ztype = pcs[0][0]
-            permstr = pcs[0][1:]
-            version = pcs[1]
-            ostype = pcs[2]
-            size = int(pcs[3])
-            path = to_text(pcs[7], errors='surrogate_or_strict')
-
             # Skip excluded files
             if path in self.excludes:
                 out += 'Path %s is excluded on request\n' % path
@@ -390,7 +554,7 @@ class ZipArchive(object):
 
             dest = os.path.join(self.dest, path)
             try:
-                st = os.lstat(dest)
+                st = dest_entries.lstat(dest)
             except:
                 change = True
                 self.includes.append(path)
@@ -423,12 +587,6 @@ class ZipArchive(object):
 
             itemized = list('.%s.......??' % ftype)
 
-            # Note: this timestamp calculation has a rounding error
-            # somewhere... unzip and this timestamp can be one second off
-            # When that happens, we report a change and re-unzip the file
-            dt_object = datetime.datetime(*(time.strptime(pcs[6], '%Y%m%d.%H%M%S')[0:6]))
-            timestamp = time.mktime(dt_object.timetuple())
-
             # Compare file timestamps
             if stat.S_ISREG(st.st_mode):
                 if self.module.params['keep_newer']:
@@ -444,8 +602,7 @@ class ZipArchive(object):
                         continue
                 else:
                     if timestamp != st.st_mtime:
-                        change = True
-                        self.includes.append(path)
+                        # whether the content changed as well is up to size and CRC
                         err += 'File %s differs in mtime (%f vs %f)\n' % (path, timestamp, st.st_mtime)
                         itemized[4] = 't'
 
@@ -455,13 +612,19 @@ class ZipArchive(object):
                 err += 'File %s differs in size (%d vs %d)\n' % (path, size, st.st_size)
                 itemized[3] = 's'
 
-            # Compare file checksums
-            if stat.S_ISREG(st.st_mode):
+            # Compare file checksums, only needed when size and mtime cannot tell
+            # whether the content is the same: same size, different mtime
+            touched = False
+            if stat.S_ISREG(st.st_mode) and itemized[4] == 't' and itemized[3] != 's' and not self.module.params['keep_newer']:
                 crc = crc32(dest)
                 if crc != self._crc32(path):
                     change = True
                     err += 'File %s differs in CRC32 checksum (0x%08x vs 0x%08x)\n' % (path, self._crc32(path), crc)
                     itemized[2] = 'c'
+                else:
+                    # same content, only the mtime has to be set back
+                    touched = True
+                    self.touched.append((path, timestamp))
 
             # Compare file permissions
 
@@ -533,6 +696,8 @@ class ZipArchive(object):
                 if path not in self.includes:
                     self.includes.append(path)
                 diff += '%s %s\n' % (''.join(itemized), path)
+            elif touched:
+                diff += '%s %s\n' % (''.join(itemized), path)
 
         if self.includes:
             unarchived = False
@@ -540,9 +705,84 @@ class ZipArchive(object):
         # DEBUG
 #        out = old_out + out
 
-        return dict(unarchived=unarchived, rc=rc, out=out, err=err, cmd=cmd, diff=diff)
+        return dict(unarchived=unarchived, rc=rc, out=out, err=err, cmd=cmd, diff=diff, touched=self.touched)
+
+    def _extract_includes(self):
+        ''' Extract only the members is_unarchived() found missing or different, the way unzip -o would '''
+        umask = os.umask(0)
+        os.umask(umask)
+
+        top = os.path.normpath(self.dest)
+        includes = frozenset(self.includes)
+        directories = []
+        out = ''
+        archive = ZipFile(self.src)
+        try:
+            for info in archive.infolist():
+                path = to_text(info.filename, errors='surrogate_or_strict')
+                if path not in includes:
+                    continue
+
+                dest = os.path.normpath(os.path.join(top, path))
+                if not dest.startswith(top + os.sep):
+                    # unzip rewrites absolute and ../ paths, leave those to unzip
+                    raise UnarchiveError('Path %s is outside of %s' % (path, self.dest))
+
+                ztype, permstr = self._zipinfo_type(info, path)
+                if ztype == '?':
+                    mode = self._permstr_to_octal(permstr, 0)
+                else:
+                    mode = self._permstr_to_octal(permstr, umask)
+
+                if path.endswith('/'):
+                    if not os.path.isdir(dest):
+                        os.makedirs(dest)
+                    # Set directory attributes last, extracting their members would alter them
+                    directories.append((dest, mode, zipinfo_mtime(info)))
+                    out += '   creating: %s\n' % path
+                    continue
+
+                parent = os.path.dirname(dest)
+                if not os.path.isdir(parent):
+                    os.makedirs(parent)
+                if os.path.lexists(dest):
+                    os.unlink(dest)
+
+                if ztype == 'l':
+                    os.symlink(to_native(archive.read(info.filename), errors='surrogate_or_strict'), dest)
+                    out += '    linking: %s\n' % path
+                    continue
+
+                source = archive.open(info)
+                try:
+                    target = open(dest, 'wb')
+                    try:
+                        shutil.copyfileobj(source, target, BUFSIZE)
+                    finally:
+                        target.close()
+                finally:
+                    source.close()
+                os.chmod(dest, mode)
+                os.utime(dest, (time.time(), zipinfo_mtime(info)))
+                out += '  inflating: %s\n' % path
+
+            for dest, mode, mtime in directories:
+                os.chmod(dest, mode)
+                os.utime(dest, (time.time(), mtime))
+        finally:
+            archive.close()
+
+        return dict(cmd=None, rc=0, out=out, err='')
 
     def unarchive(self):
+        # Rewrite only what changed, unzip itself cannot be given an arbitrary number of members
+        if self.module.params['incremental'] and self.includes and not self.opts:
+            try:
+                return self._extract_includes()
+            except Exception:
+                # Anything zipfile cannot extract the way unzip does, extract everything with unzip
+                pass
+
         cmd = [ self.cmd_path, '-o', self.src ]
         if self.opts:
             cmd.extend(self.opts)
@@ -584,6 +824,7 @@ class TgzArchive(object):
             # Fallback to tar
             self.cmd_path = self.module.get_bin_path('tar')
         self.zipflag = '-z'
+        self.includes = []
         self._files_in_archive = []
 
     @property
@@ -611,7 +852,118 @@ class TgzArchive(object):
                 self._files_in_archive.append(filename)
         return self._files_in_archive
 
+    def _native_diff(self):
+        ''' Compare the archive members against dest in-process, reporting what tar --diff would '''
+        run_uid = os.getuid()
+        umask = os.umask(0)
+        os.umask(umask)
+
+        dest_entries = DirectoryListing()
+        out = ''
+        diff = ''
+        # only handed over once the whole archive was compared, tar --diff takes over otherwise
+        includes = []
+        archive = tarfile.open(self.src, TARFILE_MODES[self.zipflag])
+        try:
+            for member in archive:
+                path = member.name.lstrip('/')
+                dest = os.path.normpath(os.path.join(self.dest, path))
+                if member.isdir():
+                    ftype = 'd'
+                elif member.issym():
+                    ftype = 'L'
+                else:
+                    ftype = 'f'
+
+                try:
+                    st = dest_entries.lstat(dest)
+                except OSError:
+                    out += '%s: Warning: Cannot stat: No such file or directory\n' % path
+                    diff += '>%s++++++.?? %s\n' % (ftype, path)
+                    includes.append(member.name)
+                    continue
+
+                if member.isdir():
+                    same_type = stat.S_ISDIR(st.st_mode)
+                elif member.issym():
+                    same_type = stat.S_ISLNK(st.st_mode)
+                elif member.ischr():
+                    same_type = stat.S_ISCHR(st.st_mode)
+                elif member.isblk():
+                    same_type = stat.S_ISBLK(st.st_mode)
+                elif member.isfifo():
+                    same_type = stat.S_ISFIFO(st.st_mode)
+                else:
+                    same_type = stat.S_ISREG(st.st_mode)
+                if not same_type:
+                    out += '%s: File type differs\n' % path
+                    diff += 'c%s++++++.?? %s\n' % (ftype, path)
+                    includes.append(member.name)
+                    continue
+
+                itemized = list('.%s.......??' % ftype)
+
+                if member.isreg():
+                    if st.st_size != member.size:
+                        out += '%s: Size differs\n' % path
+                        itemized[3] = 's'
+                    if self.module.params['keep_newer'] and st.st_mtime >= member.mtime:
+                        pass
+                    elif int(st.st_mtime) != int(member.mtime):
+                        out += '%s: Mod time differs\n' % path
+                        itemized[4] = 't'
+                elif member.issym():
+                    if os.readlink(dest) != member.linkname:
+                        out += '%s: Symlink differs\n' % path
+                        itemized[2] = 'c'
+
+                # owner, group and mode requested for the task are left to set_fs_attributes_if_different()
+                if not self.file_args['mode'] and not member.issym():
+                    # tar only restores the exact mode when run as root, others get the umask applied
+                    if run_uid == 0:
+                        mode = stat.S_IMODE(member.mode)
+                    else:
+                        mode = member.mode & (stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO) & ~umask
+                    if stat.S_IMODE(st.st_mode) != mode:
+                        out += '%s: Mode differs\n' % path
+                        itemized[5] = 'p'
+
+                if run_uid == 0 and not self.file_args['owner']:
+                    try:
+                        uid = pwd.getpwnam(member.uname).pw_uid
+                    except (KeyError, TypeError):
+                        uid = member.uid
+                    if st.st_uid != uid:
+                        out += '%s: Uid differs\n' % path
+                        itemized[6] = 'o'
+
+                if run_uid == 0 and not self.file_args['group']:
+                    try:
+                        gid = grp.getgrnam(member.gname).gr_gid
+                    except (KeyError, TypeError):
+                        gid = member.gid
+                    if st.st_gid != gid:
+                        out += '%s: Gid differs\n' % path
+                        itemized[6] = 'g'
+
+                if itemized != list('.%s.......??' % ftype):
+                    diff += '%s %s\n' % (''.join(itemized), path)
+                    includes.append(member.name)
+        finally:
+            archive.close()
+
+        self.includes = includes
+        return dict(unarchived=not out, rc=0, out=out, err='', cmd=None, diff=diff)
+
     def is_unarchived(self):
+        # Without options tar would have to interpret, the archive can be compared in-process
+        if not self.opts and not self.excludes:
+            try:
+                return self._native_diff()
+            except Exception:
+                # unsupported compression (xz on older python) or unreadable, let tar judge
+                pass
+
         cmd = [ self.cmd_path, '--diff', '-C', self.dest ]
         if self.zipflag:
             cmd.append(self.zipflag)
@@ -658,7 +1010,7 @@ class TgzArchive(object):
             unarchived = False
         return dict(unarchived=unarchived, rc=rc, out=out, err=err, cmd=cmd)
 
-    def unarchive(self):
+    def _extract_cmd(self):
         cmd = [ self.cmd_path, '--extract', '-C', self.dest ]
         if self.zipflag:
             cmd.append(self.zipflag)
@@ -672,10 +1024,81 @@ class TgzArchive(object):
             cmd.append('--keep-newer-files')
         if self.excludes:
             cmd.extend([ '--exclude=' + quote(f) for f in self.excludes ])
+        return cmd
+
+    def unarchive(self):
+        cmd = self._extract_cmd()
+
+        # Only extract the members the in-process comparison found to differ,
+        # handing their names over in a file to stay clear of argument limits
+        listfile = None
+        if self.module.params['incremental'] and self.includes:
+            fd, listfile = tempfile.mkstemp(prefix='.ansible_unarchive')
+            f = os.fdopen(fd, 'wb')
+            try:
+                for name in self.includes:
+                    f.write(to_bytes(name, errors='surrogate_or_strict') + to_bytes('\0'))
+            finally:
+                f.close()
+            cmd.extend([ '--null', '--no-recursion', '--no-wildcards', '--files-from=' + listfile ])
+
         cmd.extend([ '-f', self.src ])
-        rc, out, err = self.module.run_command(cmd, cwd=self.dest, environ_update=dict(LANG='C', LC_ALL='C', LC_MESSAGES='C'))
+        try:
+            rc, out, err = self.module.run_command(cmd, cwd=self.dest, environ_update=dict(LANG='C', LC_ALL='C', LC_MESSAGES='C'))
+        finally:
+            if listfile:
+                os.remove(listfile)
         return dict(cmd=cmd, rc=rc, out=out, err=err)
 
+    def unarchive_stream(self, rsp, data):
+        ''' Extract the archive while it is being downloaded, feeding gtar the response instead of a local copy '''
+        cmd = self._extract_cmd() + [ '--verbose', '-f', '-' ]
+        env = os.environ.copy()
+        env.update(LANG='C', LC_ALL='C', LC_MESSAGES='C')
+
+        # gtar writes to files, so a full output pipe cannot stall it while we are feeding it
+        stdout = tempfile.TemporaryFile()
+        stderr = tempfile.TemporaryFile()
+        try:
+            start = time.time()
+            size = 0
+            proc = subprocess.Popen(cmd, cwd=self.dest, env=env, stdin=subprocess.PIPE, stdout=stdout, stderr=stderr)
+            while data:
+                try:
+                    proc.stdin.write(data)
+                except (IOError, OSError):
+                    # gtar gave up on the archive, its exit code and stderr tell why
+                    break
+                size += len(data)
+                data = rsp.read(BUFSIZE)
+            try:
+                proc.stdin.close()
+            except (IOError, OSError):
+                pass
+            rc = proc.wait()
+            elapsed = time.time() - start
+
+            stdout.seek(0)
+            out = to_native(stdout.read(), errors='surrogate_or_strict')
+            stderr.seek(0)
+            err = to_native(stderr.read(), errors='surrogate_or_strict')
+        finally:
+            stdout.close()
+            stderr.close()
+
+        # The archive is gone once extracted, so remember what it contained
+        self._files_in_archive = []
+        for filename in out.splitlines():
+            filename = codecs.escape_decode(filename)[0]
+            if filename and filename not in self.excludes:
+                self._files_in_archive.append(filename)
+
+        if elapsed > 0:
+            rate = int(size / elapsed)
+        else:
+            rate = size
+        return dict(cmd=cmd, rc=rc, out=out, err=err, bytes=size, seconds=round(elapsed, 3), bytes_per_second=rate)
+
     def can_handle_archive(self):
         if not self.cmd_path:
             return False
@@ -712,6 +1135,18 @@ class TarXzArchive(TgzArchive):
         self.zipflag = '-J'
 
 
+def stream_zipflag(data):
+    ''' Return the tar compression flag for an archive starting with data, or None if gtar cannot read it from a pipe '''
+    magic = to_native(binascii.hexlify(data[:6]))
+    for prefix, zipflag in STREAM_MAGIC:
+        if magic.startswith(prefix):
+            return zipflag
+    # Uncompressed tar archives carry their magic in the first header
+    if data[257:262] == to_bytes('ustar'):
+        return ''
+    return None
+
+
 # try handlers in order and return the one that works or bail if none work
 def pick_handler(src, dest, file_args, module):
     handlers = [ZipArchive, TgzArchive, TarArchive, TarBzipArchive, TarXzArchive]
@@ -737,6 +1172,8 @@ def main():
             exclude           = dict(required=False, default=[], type='list'),
             extra_opts        = dict(required=False, default=[], type='list'),
             validate_certs    = dict(required=False, default=True, type='bool'),
+            incremental       = dict(required=False, default=False, type='bool'),
+            stream            = dict(required=False, default=False, type='bool'),
         ),
         add_file_common_args = True,
         mutually_exclusive   = [("copy", "remote_src"),],
@@ -749,6 +1186,13 @@ def main():
     copy       = module.params['copy']
     remote_src = module.params['remote_src']
     file_args = module.load_file_common_arguments(module.params)
+
+    # is dest OK to receive tar file?
+    if not os.path.isdir(dest):
+        module.fail_json(msg="Destination '%s' is not a directory" % dest)
+
+    handler = None
+    extract_results = None
     # did tar file arrive?
     if not os.path.exists(src):
         if not remote_src and copy:
@@ -762,49 +1206,64 @@ def main():
                 # If download fails, raise a proper exception
                 if rsp is None:
                     raise Exception(info['msg'])
-                f = open(package, 'w')
-                # Read 1kb at a time to save on ram
-                while True:
-                    data = rsp.read(BUFSIZE)
-
-                    if data == "":
-                        break # End of file, break while loop
-
-                    f.write(data)
-                f.close()
-                src = package
+                data = rsp.read(BUFSIZE)
+
+                # Tar archives gtar can read from a pipe are extracted while
+                # downloading, anything else (zip) needs a seekable file
+                zipflag = None
+                if module.params['stream'] and not module.check_mode:
+                    zipflag = stream_zipflag(data)
+                if zipflag is not None:
+                    handler = TgzArchive(src, dest, file_args, module)
+                    handler.zipflag = zipflag
+                    extract_results = handler.unarchive_stream(rsp, data)
+                else:
+                    f = open(package, 'wb')
+                    # Read 64kb at a time to save on ram
+                    while data:
+                        f.write(data)
+                        data = rsp.read(BUFSIZE)
+                    f.close()
+                    src = package
             except Exception:
                 e = get_exception()
                 module.fail_json(msg="Failure downloading %s, %s" % (src, e))
         else:
             module.fail_json(msg="Source '%s' does not exist" % src)
-    if not os.access(src, os.R_OK):
-        module.fail_json(msg="Source '%s' not readable" % src)
 
-    # skip working with 0 size archives
-    try:
-        if os.path.getsize(src) == 0:
-            module.fail_json(msg="Invalid archive '%s', the file is 0 bytes" % src)
-    except Exception:
-        e = get_exception()
-        module.fail_json(msg="Source '%s' not readable" % src)
+    if handler is None:
+        if not os.access(src, os.R_OK):
+            module.fail_json(msg="Source '%s' not readable" % src)
 
-    # is dest OK to receive tar file?
-    if not os.path.isdir(dest):
-        module.fail_json(msg="Destination '%s' is not a directory" % dest)
+        # skip working with 0 size archives
+        try:
+            if os.path.getsize(src) == 0:
+                module.fail_json(msg="Invalid archive '%s', the file is 0 bytes" % src)
+        except Exception:
+            e = get_exception()
+            module.fail_json(msg="Source '%s' not readable" % src)
 
-    handler = pick_handler(src, dest, file_args, module)
+        handler = pick_handler(src, dest, file_args, module)
 
     res_args = dict(handler=handler.__class__.__name__, dest=dest, src=src)
 
     # do we need to do unpack?
-    check_results = handler.is_unarchived()
+    if extract_results is not None:
+        # A streamed archive is extracted before it could be compared
+        check_results = dict(unarchived=False)
+    else:
+        check_results = handler.is_unarchived()
 
     # DEBUG
 #    res_args['check_results'] = check_results
 
-    if module.check_mode:
-        res_args['changed'] = not check_results['unarchived']
+    if extract_results is not None:
+        res_args['extract_results'] = extract_results
+        if extract_results['rc'] != 0:
+            module.fail_json(msg="failed to unpack %s to %s" % (src, dest), **res_args)
+        res_args['changed'] = True
+    elif module.check_mode:
+        res_args['changed'] = not check_results['unarchived'] or bool(check_results.get('touched'))
     elif check_results['unarchived']:
         res_args['changed'] = False
     else:
@@ -818,6 +1277,16 @@ def main():
         else:
             res_args['changed'] = True
 
+    # Members that only differ in mtime get it set back instead of being extracted again
+    if check_results.get('touched') and not module.check_mode:
+        for path, timestamp in check_results['touched']:
+            try:
+                os.utime(os.path.join(dest, path), (timestamp, timestamp))
+            except OSError:
+                e = get_exception()
+                module.fail_json(msg="Unexpected error when accessing exploded file: %s" % str(e), **res_args)
+        res_args['changed'] = True
+
     # Get diff if required
     if check_results.get('diff', False):
         res_args['diff'] = { 'prepared': check_results['diff'] }
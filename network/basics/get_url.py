@@ -24,6 +24,13 @@ import shutil
 import datetime
 import re
 import tempfile
+import threading
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
 
 DOCUMENTATION = '''
 ---
@@ -128,6 +135,44 @@ options:
     required: false
     default: 10
     version_added: '1.8'
+  checksum_cache:
+    description:
+      - Path of an on-host cache of file checksums. Files are keyed on their device, inode, size,
+        mtime and ctime, so an unchanged C(dest) is not read again to compare it with C(checksum)
+        or with the downloaded content.
+      - The same cache can be shared with the M(stat) and M(copy) modules.
+    required: false
+    default: null
+    version_added: '2.3'
+  resume:
+    description:
+      - Keep the partially downloaded file when the transfer is interrupted, and continue
+        from where it stopped with HTTP C(Range) requests on the next run.
+      - The partial file is kept in C(tmp_dest), or next to C(dest) when C(tmp_dest) is not
+        set, along with the validators of the server response. It is only resumed while the
+        server reports the same C(ETag) or C(Last-Modified) and size.
+      - Only applies to http and https URLs.
+    required: false
+    choices: [ "yes", "no" ]
+    default: "no"
+    version_added: '2.3'
+  parallel_segments:
+    description:
+      - Download the file in this many byte ranges at once, each over its own connection,
+        written in place into the temporary file.
+      - Falls back to a single download when the server does not support C(Range) requests.
+        Can be combined with C(resume), every segment then continues where it stopped.
+      - Only applies to http and https URLs.
+    required: false
+    default: 1
+    version_added: '2.3'
+  buffer_size:
+    description:
+      - Size in bytes of the reads from the connection. The download is hashed as it is read,
+        for C(checksum) and to compare it with C(dest), so the temporary file is not read again.
+    required: false
+    default: 65536
+    version_added: '2.3'
   headers:
     description:
         - 'Add custom HTTP headers to a request in the format "key:value,key:value"'
@@ -198,6 +243,20 @@ EXAMPLES='''
     dest: /etc/foo.conf
     checksum: md5:66dffb5228a211e61d6d7ef4a86f5758
 
+- name: skip a large download without rehashing dest when it did not change since the last run
+  get_url:
+    url: http://example.com/path/image.qcow2
+    dest: /srv/images/image.qcow2
+    checksum: sha256:b5bb9d8014a0f9b1d61e21e796d78dccdf1352f23cd32812f4850b878ae4944c
+    checksum_cache: /var/cache/ansible/checksums
+
+- name: download a large artifact in 4 parallel ranges, resuming it if the connection drops
+  get_url:
+    url: http://example.com/path/image.qcow2
+    dest: /srv/images/image.qcow2
+    resume: yes
+    parallel_segments: 4
+
 - name: download file from a file path
   get_url: 
     url: "file:///tmp/afile.txt" 
@@ -215,13 +274,45 @@ def url_filename(url):
         return 'index.html'
     return fn
 
-def url_get(module, url, dest, use_proxy, last_mod_time, force, timeout=10, headers=None, tmp_dest=''):
+# default size of the reads from the connection
+BUFSIZE = 65536
+
+def new_digests(algorithms):
+    """ Return a hash object for each algorithm, md5 is left out on FIPS enabled systems """
+    digests = {}
+    for algorithm in algorithms:
+        try:
+            digests[algorithm] = AVAILABLE_HASH_ALGORITHMS[algorithm]()
+        except (KeyError, ValueError):
+            pass
+    return digests
+
+def copy_hashing(src, f, digests, buffer_size):
+    """ Copy the file object src to f, feeding every chunk to the digests """
+    while True:
+        data = src.read(buffer_size)
+        if not data:
+            break
+        f.write(data)
+        for digest in digests.values():
+            digest.update(data)
+
+def hexdigests(digests):
+    return dict((algorithm, digest.hexdigest()) for algorithm, digest in digests.items())
+
+def url_get(module, url, dest, use_proxy, last_mod_time, force, timeout=10, headers=None, tmp_dest='',
+            resume=False, parallel_segments=1, algorithms=('sha1',), buffer_size=BUFSIZE):
     """
-    Download data from the url and store in a temporary file.
+    Download data from the url and store in a temporary file, hashing it on the way
+    with each of algorithms.
 
-    Return (tempfile, info about the request)
+    Return (tempfile, info about the request, hex digest of the content per algorithm)
     """
 
+    if (resume or parallel_segments > 1) and urlsplit(url)[0].lower() in ('http', 'https'):
+        return url_get_ranges(module, url, dest, use_proxy, last_mod_time, force, timeout, headers,
+                              tmp_dest, resume, parallel_segments, algorithms, buffer_size)
+
     rsp, info = fetch_url(module, url, use_proxy=use_proxy, force=force, last_mod_time=last_mod_time, timeout=timeout, headers=headers)
 
     if info['status'] == 304:
@@ -231,29 +322,266 @@ def url_get(module, url, dest, use_proxy, last_mod_time, force, timeout=10, head
     if info['status'] != 200 and not url.startswith('file:/') and not (url.startswith('ftp:/') and info.get('msg', '').startswith('OK')):
         module.fail_json(msg="Request failed", status_code=info['status'], response=info['msg'], url=url, dest=dest)
 
+    check_tmp_dest(module, tmp_dest)
     if tmp_dest != '':
-        # tmp_dest should be an existing dir
-        tmp_dest_is_dir = os.path.isdir(tmp_dest)
-        if not tmp_dest_is_dir:
-            if os.path.exists(tmp_dest):
-                module.fail_json(msg="%s is a file but should be a directory." % tmp_dest)
-            else:
-                module.fail_json(msg="%s directoy does not exist." % tmp_dest)
-
         fd, tempname = tempfile.mkstemp(dir=tmp_dest)
     else:
         fd, tempname = tempfile.mkstemp()
 
+    digests = new_digests(algorithms)
     f = os.fdopen(fd, 'wb')
     try:
-        shutil.copyfileobj(rsp, f)
+        copy_hashing(rsp, f, digests, buffer_size)
     except Exception:
         err = get_exception()
         os.remove(tempname)
         module.fail_json(msg="failed to create temporary content file: %s" % str(err))
     f.close()
     rsp.close()
-    return tempname, info
+    return tempname, info, hexdigests(digests)
+
+def check_tmp_dest(module, tmp_dest):
+    if tmp_dest != '':
+        # tmp_dest should be an existing dir
+        tmp_dest_is_dir = os.path.isdir(tmp_dest)
+        if not tmp_dest_is_dir:
+            if os.path.exists(tmp_dest):
+                module.fail_json(msg="%s is a file but should be a directory." % tmp_dest)
+            else:
+                module.fail_json(msg="%s directoy does not exist." % tmp_dest)
+
+def info_header(info, name):
+    """ Return the response header name from info, whatever the case fetch_url left it in """
+    for key, value in info.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def range_validator(info):
+    """
+    Return the validator to send in If-Range, so a resource that changed is sent whole
+    instead of a range of its new version. Weak ETags cannot be used for ranges.
+    """
+    etag = info_header(info, 'etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return info_header(info, 'last-modified')
+
+def split_segments(total, count):
+    """ Split total bytes in count [start, end, bytes done] ranges, end included """
+    count = max(1, min(count, total))
+    size = total // count
+    segments = []
+    for i in range(count):
+        start = i * size
+        # the last segment takes the remainder
+        end = start + size - 1
+        if i == count - 1:
+            end = total - 1
+        segments.append([start, end, 0])
+    return segments
+
+class SegmentFailed(Exception):
+    pass
+
+class SegmentModule(object):
+    """
+    Stands in for the module in the segment threads. fetch_url calls fail_json on connection
+    and SSL errors, which would print a result of its own before the main thread reports
+    the download, so it raises SegmentFailed instead.
+    """
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+    def fail_json(self, **kwargs):
+        raise SegmentFailed(kwargs.get('msg', 'request failed'))
+
+def fetch_segment(module, url, path, segment, validator, use_proxy, timeout, headers, errors, buffer_size=BUFSIZE):
+    """ Download what is left of a segment into its place in path, recording progress in segment """
+    start, end, done = segment
+    if start + done > end:
+        return
+
+    segment_headers = dict(headers or {})
+    segment_headers['Range'] = 'bytes=%d-%d' % (start + done, end)
+    if validator:
+        segment_headers['If-Range'] = validator
+    try:
+        rsp, info = fetch_url(module, url, use_proxy=use_proxy, force=True, timeout=timeout, headers=segment_headers)
+    except Exception:
+        errors.append("range %s: %s" % (segment_headers['Range'], str(get_exception()) or 'request failed'))
+        return
+    if info['status'] != 206:
+        errors.append("range %s: status %s, %s" % (segment_headers['Range'], info['status'], info.get('msg', '')))
+        return
+
+    f = open(path, 'r+b')
+    try:
+        try:
+            f.seek(start + done)
+            while True:
+                data = rsp.read(min(buffer_size, end + 1 - start - segment[2]))
+                if not data:
+                    break
+                f.write(data)
+                segment[2] += len(data)
+        except Exception:
+            errors.append("range %s: %s" % (segment_headers['Range'], str(get_exception())))
+    finally:
+        f.close()
+        rsp.close()
+
+    if start + segment[2] <= end:
+        errors.append("range %s: connection closed after %d bytes" % (segment_headers['Range'], segment[2] - done))
+
+def url_get_ranges(module, url, dest, use_proxy, last_mod_time, force, timeout, headers, tmp_dest,
+                   resume, parallel_segments, algorithms=('sha1',), buffer_size=BUFSIZE):
+    """
+    Download data from the url with Range requests, into parallel_segments ranges at once
+    and into a partial file that is kept for the next run when resume is set.
+    Ranges do not arrive in order, so the file is hashed once it is complete.
+
+    Return (tempfile, info about the request, hex digest of the content per algorithm)
+    """
+    check_tmp_dest(module, tmp_dest)
+    if resume:
+        if tmp_dest != '':
+            part_dir = tmp_dest
+        elif os.path.isdir(dest):
+            part_dir = dest
+        else:
+            part_dir = os.path.dirname(os.path.abspath(dest))
+        url_digest = AVAILABLE_HASH_ALGORITHMS['sha1']()
+        url_digest.update(to_bytes(url))
+        part_path = os.path.join(part_dir, '.get_url-%s.part' % url_digest.hexdigest())
+        state_path = part_path + '.json'
+    elif tmp_dest != '':
+        fd, part_path = tempfile.mkstemp(dir=tmp_dest)
+        os.close(fd)
+    else:
+        fd, part_path = tempfile.mkstemp()
+        os.close(fd)
+
+    # the first byte tells whether ranges are supported, and the size and validators of the file
+    probe_headers = dict(headers or {})
+    probe_headers['Range'] = 'bytes=0-0'
+    rsp, info = fetch_url(module, url, use_proxy=use_proxy, force=force, last_mod_time=last_mod_time, timeout=timeout, headers=probe_headers)
+
+    if info['status'] == 304:
+        module.exit_json(url=url, dest=dest, changed=False, msg=info.get('msg', ''))
+
+    total = None
+    if info['status'] == 206:
+        m = re.match(r'bytes\s+0-0/(\d+)', info_header(info, 'content-range') or '')
+        if m:
+            total = int(m.group(1))
+
+    if info['status'] == 416 or (info['status'] == 206 and total is None):
+        # an empty file has no first byte to ask for, and without a size in Content-Range
+        # the byte received is all that is known of the file: download it in one piece
+        if rsp is not None:
+            rsp.close()
+        if not resume:
+            os.remove(part_path)
+        return url_get(module, url, dest, use_proxy, last_mod_time, force, timeout, headers, tmp_dest,
+                       algorithms=algorithms, buffer_size=buffer_size)
+
+    if info['status'] != 200 and total is None:
+        if not resume:
+            os.remove(part_path)
+        module.fail_json(msg="Request failed", status_code=info['status'], response=info['msg'], url=url, dest=dest)
+
+    if total is None:
+        # no ranges: the response is the whole file
+        digests = new_digests(algorithms)
+        f = open(part_path, 'wb')
+        try:
+            copy_hashing(rsp, f, digests, buffer_size)
+        except Exception:
+            err = get_exception()
+            f.close()
+            os.remove(part_path)
+            module.fail_json(msg="failed to create temporary content file: %s" % str(err))
+        f.close()
+        rsp.close()
+        if resume and os.path.exists(state_path):
+            os.remove(state_path)
+        return part_path, info, hexdigests(digests)
+    rsp.close()
+
+    validator = range_validator(info)
+    state = dict(url=url, validator=validator, total=total, segments=None)
+    if resume:
+        try:
+            f = open(state_path, 'r')
+            try:
+                previous = json.load(f)
+            finally:
+                f.close()
+            # only continue a download of the same version of the file
+            if (validator and isinstance(previous, dict) and previous.get('url') == url
+                    and previous.get('validator') == validator and previous.get('total') == total
+                    and os.path.getsize(part_path) == total):
+                state['segments'] = previous['segments']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    if state['segments'] is None:
+        state['segments'] = split_segments(total, parallel_segments)
+        f = open(part_path, 'wb')
+        try:
+            f.truncate(total)
+        finally:
+            f.close()
+
+    errors = []
+    threads = []
+    # failures in the threads are reported once, from here
+    segment_module = SegmentModule(module)
+    for segment in state['segments']:
+        thread = threading.Thread(target=fetch_segment, args=(segment_module, url, part_path, segment, validator,
+                                                              use_proxy, timeout, headers, errors, buffer_size))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    # a thread that ended without saying why must not leave a hole in the file
+    for segment in state['segments']:
+        if segment[0] + segment[2] <= segment[1] and not errors:
+            errors.append("range bytes=%d-%d: not downloaded" % (segment[0] + segment[2], segment[1]))
+
+    if errors:
+        if resume and validator:
+            f = open(state_path, 'w')
+            try:
+                json.dump(state, f)
+            finally:
+                f.close()
+            module.fail_json(msg="Download interrupted, it is resumed on the next run", errors=errors, url=url, dest=dest,
+                             bytes_done=sum(segment[2] for segment in state['segments']), bytes_total=total)
+        os.remove(part_path)
+        module.fail_json(msg="Request failed", errors=errors, url=url, dest=dest)
+
+    if resume and os.path.exists(state_path):
+        os.remove(state_path)
+
+    # every algorithm in a single read
+    digests = new_digests(algorithms)
+    f = open(part_path, 'rb')
+    try:
+        data = f.read(buffer_size)
+        while data:
+            for digest in digests.values():
+                digest.update(data)
+            data = f.read(buffer_size)
+    finally:
+        f.close()
+    return part_path, info, hexdigests(digests)
 
 def extract_filename_from_headers(headers):
     """
@@ -275,6 +603,190 @@ def extract_filename_from_headers(headers):
     return res
 
 
+# read size when hashing, large enough to keep syscall overhead low on big files
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def digest_file(module, path, algorithms):
+    '''
+    Compute several digests of path, feeding every hash object from the same buffered read.
+    Returns a dict of algorithm to hex digest, md5 is None when unavailable (FIPS), and the bytes read.
+    '''
+    hashes = {}
+    results = {}
+    for algorithm in algorithms:
+        try:
+            hashes[algorithm] = AVAILABLE_HASH_ALGORITHMS[algorithm]()
+        except (KeyError, ValueError):
+            # md5 raises ValueError on FIPS enabled systems
+            if algorithm != 'md5':
+                module.fail_json(msg="Could not hash file '%s' with algorithm '%s'. Available algorithms: %s" %
+                                     (path, algorithm, ', '.join(AVAILABLE_HASH_ALGORITHMS)))
+            results[algorithm] = None
+
+    read = 0
+    f = open(path, 'rb')
+    try:
+        data = f.read(HASH_BUFFER_SIZE)
+        while data:
+            for h in hashes.values():
+                h.update(data)
+            read += len(data)
+            data = f.read(HASH_BUFFER_SIZE)
+    finally:
+        f.close()
+
+    for algorithm, h in hashes.items():
+        results[algorithm] = h.hexdigest()
+    return results, read
+
+
+class ChecksumCache(object):
+    '''
+    Optional on-host store of file digests, so files that did not change are not hashed again.
+    The stat, copy and get_url modules share the same store. This class and digest_file() are
+    copied verbatim into each of them, files/stat.py holds the canonical copy: change it there
+    and copy it over.
+    '''
+
+    # entries kept, the least recently used ones are dropped first
+    max_entries = 4096
+
+    def __init__(self, module, path=None):
+        self.module = module
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        # bytes read and seconds spent hashing by the last digests() call
+        self.read = 0
+        self.elapsed = 0.0
+        if path is None:
+            return
+        try:
+            f = open(path, 'r')
+            try:
+                entries = json.load(f)
+            finally:
+                f.close()
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (IOError, OSError, ValueError):
+            # missing or unreadable, it is only a cache
+            pass
+
+    def _key(self, st, algorithm):
+        stamps = []
+        for name in ('mtime', 'ctime'):
+            ns = getattr(st, 'st_%s_ns' % name, None)
+            if ns is None:
+                ns = int(getattr(st, 'st_%s' % name) * 1000000000)
+            stamps.append(ns)
+        return '%d:%d:%d:%d:%d:%s' % (st.st_dev, st.st_ino, st.st_size, stamps[0], stamps[1], algorithm)
+
+    def _compute(self, filename, algorithm):
+        if algorithm == 'md5':
+            # keeps raising ValueError on FIPS enabled systems
+            return self.module.md5(filename)
+        return self.module.digest_from_file(filename, algorithm)
+
+    def digest(self, filename, algorithm='sha1'):
+        ''' Return the hex digest of filename, only reading the file when the cache has no entry for it. '''
+        if self.path is None:
+            return self._compute(filename, algorithm)
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return self._compute(filename, algorithm)
+
+        now = time.time()
+        key = self._key(st, algorithm)
+        entry = self.entries.get(key)
+        if entry is not None:
+            # only rewrite the store for access times once in a while
+            if now - entry[1] > 3600:
+                entry[1] = now
+                self.dirty = True
+            return entry[0]
+
+        value = self._compute(filename, algorithm)
+        # a file modified within the timestamp granularity could change again without its
+        # stat changing, do not trust those
+        if value is not None and now - st.st_mtime > 2:
+            self.entries[key] = [value, now]
+            self.dirty = True
+        return value
+
+    def digests(self, filename, algorithms):
+        '''
+        Return a dict of the hex digests of filename, hashing all the ones the cache has no entry
+        for in a single read. The bytes read and the seconds it took are left in read and elapsed.
+        '''
+        st = None
+        if self.path is not None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                pass
+
+        now = time.time()
+        self.read = 0
+        self.elapsed = 0.0
+        results = {}
+        keys = {}
+        missing = []
+        for algorithm in algorithms:
+            if st is not None:
+                keys[algorithm] = self._key(st, algorithm)
+                entry = self.entries.get(keys[algorithm])
+                if entry is not None:
+                    # only rewrite the store for access times once in a while
+                    if now - entry[1] > 3600:
+                        entry[1] = now
+                        self.dirty = True
+                    results[algorithm] = entry[0]
+                    continue
+            missing.append(algorithm)
+
+        if not missing:
+            return results
+
+        computed, self.read = digest_file(self.module, filename, missing)
+        self.elapsed = time.time() - now
+        for algorithm, value in computed.items():
+            results[algorithm] = value
+            # a file modified within the timestamp granularity could change again without its
+            # stat changing, do not trust those
+            if value is not None and st is not None and now - st.st_mtime > 2:
+                self.entries[keys[algorithm]] = [value, now]
+                self.dirty = True
+        return results
+
+    def save(self):
+        ''' Write the store back if anything changed, dropping the oldest entries past max_entries. '''
+        if self.path is None or not self.dirty:
+            return
+
+        if len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda item: item[1][1])[-self.max_entries:]
+            self.entries = dict(keep)
+
+        try:
+            cache_dir = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(self.entries, f)
+            finally:
+                f.close()
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+        self.dirty = False
+
+
 # ==============================================================
 # main
 
@@ -289,6 +801,10 @@ def main():
         timeout = dict(required=False, type='int', default=10),
         headers = dict(required=False, default=None),
         tmp_dest = dict(required=False, default=''),
+        checksum_cache = dict(required=False, type='path'),
+        resume = dict(default=False, type='bool'),
+        parallel_segments = dict(required=False, type='int', default=1),
+        buffer_size = dict(required=False, type='int', default=BUFSIZE),
     )
 
     module = AnsibleModule(
@@ -306,6 +822,10 @@ def main():
     use_proxy = module.params['use_proxy']
     timeout = module.params['timeout']
     tmp_dest = os.path.expanduser(module.params['tmp_dest'])
+    cache = ChecksumCache(module, module.params['checksum_cache'])
+    resume = module.params['resume']
+    parallel_segments = module.params['parallel_segments']
+    buffer_size = module.params['buffer_size']
 
     # Parse headers to dict
     if module.params['headers']:
@@ -334,6 +854,14 @@ def main():
             int(checksum, 16)
         except ValueError:
             module.fail_json(msg="The checksum parameter has to be in format <algorithm>:<checksum>")
+        if algorithm not in AVAILABLE_HASH_ALGORITHMS:
+            module.fail_json(msg="Could not hash file with algorithm '%s'. Available algorithms: %s" %
+                             (algorithm, ', '.join(AVAILABLE_HASH_ALGORITHMS)))
+
+    # the download is hashed while it streams in, for change detection, checksum and md5sum
+    algorithms = ['sha1', 'md5']
+    if checksum != '' and algorithm not in algorithms:
+        algorithms.append(algorithm)
 
     if not dest_is_dir and os.path.exists(dest):
         checksum_mismatch = False
@@ -341,7 +869,8 @@ def main():
         # If the download is not forced and there is a checksum, allow
         # checksum match to skip the download.
         if not force and checksum != '':
-            destination_checksum = module.digest_from_file(dest, algorithm)
+            destination_checksum = cache.digest(dest, algorithm)
+            cache.save()
 
             if checksum == destination_checksum:
                 module.exit_json(msg="file already exists", dest=dest, url=url, changed=False)
@@ -371,7 +900,8 @@ def main():
             force = True
 
     # download to tmpsrc
-    tmpsrc, info = url_get(module, url, dest, use_proxy, last_mod_time, force, timeout, headers, tmp_dest)
+    tmpsrc, info, digests = url_get(module, url, dest, use_proxy, last_mod_time, force, timeout, headers, tmp_dest,
+                                    resume, parallel_segments, algorithms, buffer_size)
 
     # Now the request has completed, we can finally generate the final
     # destination file name from the info dict.
@@ -395,7 +925,7 @@ def main():
     if not os.access(tmpsrc, os.R_OK):
         os.remove(tmpsrc)
         module.fail_json( msg="Source %s not readable" % (tmpsrc))
-    checksum_src = module.sha1(tmpsrc)
+    checksum_src = digests['sha1']
 
     # check if there is no dest file
     if os.path.exists(dest):
@@ -406,7 +936,9 @@ def main():
         if not os.access(dest, os.R_OK):
             os.remove(tmpsrc)
             module.fail_json( msg="Destination %s not readable" % (dest))
-        checksum_dest = module.sha1(dest)
+        # a dest of another size differs, only read it when the size cannot tell
+        if os.path.getsize(dest) == os.path.getsize(tmpsrc):
+            checksum_dest = cache.digest(dest)
     else:
         if not os.access(os.path.dirname(dest), os.W_OK):
             os.remove(tmpsrc)
@@ -428,7 +960,8 @@ def main():
         changed = False
 
     if checksum != '':
-        destination_checksum = module.digest_from_file(dest, algorithm)
+        # dest now has the content of tmpsrc
+        destination_checksum = digests[algorithm]
 
         if checksum != destination_checksum:
             os.remove(dest)
@@ -443,10 +976,8 @@ def main():
     changed = module.set_fs_attributes_if_different(file_args, changed)
 
     # Backwards compat only.  We'll return None on FIPS enabled systems
-    try:
-        md5sum = module.md5(dest)
-    except ValueError:
-        md5sum = None
+    md5sum = digests.get('md5')
+    cache.save()
 
     res_args = dict(
         url = url, dest = dest, src = tmpsrc, md5sum = md5sum, checksum_src = checksum_src,
@@ -461,5 +992,6 @@ def main():
 # import module snippets
 from ansible.module_utils.basic import *
 from ansible.module_utils.urls import *
+from ansible.module_utils._text import to_bytes
 if __name__ == '__main__':
     main()
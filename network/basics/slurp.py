@@ -34,8 +34,39 @@ options:
     required: true
     default: null
     aliases: []
+  offset:
+    description:
+      - Byte offset in the file to start reading at.
+    required: false
+    default: 0
+    version_added: "2.3"
+  length:
+    description:
+      - Number of bytes to read from C(offset). Reads up to the end of the file if not set.
+      - Together with C(offset) this lets large files be pulled in chunks of bounded size,
+        the returned C(eof) tells when the last one was read.
+    required: false
+    default: null
+    version_added: "2.3"
+  compress:
+    description:
+      - Compress the data with zlib before encoding it, C(compression) is then set to C(zlib)
+        in the result. The raw data is compressed as it is read, so it is never held in memory whole.
+    required: false
+    choices: [ "yes", "no" ]
+    default: "no"
+    version_added: "2.3"
+  checksum_algorithm:
+    description:
+      - If set, the digest of the whole file with this algorithm is returned in C(checksum),
+        whatever C(offset) and C(length) are, to verify a file pulled in chunks.
+    required: false
+    choices: [ 'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512' ]
+    default: null
+    version_added: "2.3"
 notes:
    -  This module returns an 'in memory' base64 encoded version of the file, take into account that this will require at least twice the RAM as the original file size.
+      Use C(length) to bound it for large files.
    - "See also: M(fetch)"
 requirements: []
 author: 
@@ -49,30 +80,115 @@ ansible host -m slurp -a 'src=/tmp/xx'
       "content": "aGVsbG8gQW5zaWJsZSB3b3JsZAo=", 
       "encoding": "base64"
    }
+
+# Pull the second 64MB of a large file, compressed, along with the digest of the whole file
+- slurp:
+    src: /var/crash/core.1234
+    offset: 67108864
+    length: 67108864
+    compress: yes
+    checksum_algorithm: sha256
 '''
 
 import base64
+import zlib
+
+# size of the reads from the file
+BUFSIZE = 1024 * 1024
+
+def read_window(f, offset, length, compress):
+    '''
+    read length bytes from offset, all of them if length is None, compressing them as they are read.
+    returns the data and how many bytes of the file it holds, st_size means nothing for /proc or
+    files still being written to
+    '''
+    f.seek(offset)
+    if not compress:
+        if length is None:
+            data = f.read()
+        else:
+            data = f.read(length)
+        return data, len(data)
+
+    compressor = zlib.compressobj()
+    chunks = []
+    read = 0
+    while length is None or read < length:
+        size = BUFSIZE
+        if length is not None:
+            size = min(size, length - read)
+        data = f.read(size)
+        if not data:
+            break
+        read += len(data)
+        chunks.append(compressor.compress(data))
+    chunks.append(compressor.flush())
+    return b('').join(chunks), read
+
+def file_digest(f, algorithm):
+    ''' digest of the whole file, read in chunks '''
+    digest = AVAILABLE_HASH_ALGORITHMS[algorithm]()
+    f.seek(0)
+    data = f.read(BUFSIZE)
+    while data:
+        digest.update(data)
+        data = f.read(BUFSIZE)
+    return digest.hexdigest()
 
 def main():
     module = AnsibleModule(
         argument_spec = dict(
             src = dict(required=True, aliases=['path'], type='path'),
+            offset = dict(default=0, type='int'),
+            length = dict(default=None, type='int'),
+            compress = dict(default=False, type='bool'),
+            checksum_algorithm = dict(default=None, choices=['md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512']),
         ),
         supports_check_mode=True
     )
     source = module.params['src']
+    offset = module.params['offset']
+    length = module.params['length']
+    compress = module.params['compress']
+    checksum_algorithm = module.params['checksum_algorithm']
 
     if not os.path.exists(source):
         module.fail_json(msg="file not found: %s" % source)
     if not os.access(source, os.R_OK):
         module.fail_json(msg="file is not readable: %s" % source)
+    if offset < 0:
+        module.fail_json(msg="offset must not be negative: %s" % offset)
+    if length is not None and length < 0:
+        module.fail_json(msg="length must not be negative: %s" % length)
+    if checksum_algorithm is not None and checksum_algorithm not in AVAILABLE_HASH_ALGORITHMS:
+        module.fail_json(msg="Could not hash file '%s' with algorithm '%s'. Available algorithms: %s" %
+                         (source, checksum_algorithm, ', '.join(AVAILABLE_HASH_ALGORITHMS)))
+
+    f = open(source, 'rb')
+    try:
+        size = os.fstat(f.fileno()).st_size
+        data, read = read_window(f, offset, length, compress)
+        checksum = None
+        if checksum_algorithm is not None:
+            checksum = file_digest(f, checksum_algorithm)
+    finally:
+        f.close()
 
-    data = base64.b64encode(open(source, 'rb').read())
+    result = dict(content=base64.b64encode(data), source=source, encoding='base64',
+                  offset=offset, length=read, size=size,
+                  eof=length is None or read < length or (size > 0 and offset + read >= size))
+    # only the encoded copy is needed from here on
+    del data
+    if compress:
+        result['compression'] = 'zlib'
+    if checksum is not None:
+        result['checksum'] = checksum
 
-    module.exit_json(content=data, source=source, encoding='base64')
+    module.exit_json(**result)
 
 # import module snippets
 from ansible.module_utils.basic import *
+from ansible.module_utils.six import b
 
 if __name__ == '__main__':
     main()
@@ -20,9 +20,17 @@
 #
 # see examples/playbooks/uri.yml
 
+import base64
 import cgi
+import codecs
+import errno
+import re
 import shutil
+import socket
+import sys
 import tempfile
+import threading
+import time
 import datetime
 
 try:
@@ -31,6 +39,13 @@ except ImportError:
     import simplejson as json
 
 import ansible.module_utils.six as six
+from ansible.module_utils.six.moves import http_client, queue
+
+try:
+    import ssl
+    HAS_SSL = True
+except ImportError:
+    HAS_SSL = False
 
 
 DOCUMENTATION = '''
@@ -45,12 +60,17 @@ options:
   url:
     description:
       - HTTP or HTTPS URL in the form (http|https)://host.domain[:port]/path
-    required: true
+      - Required unless C(requests) is given.
+    required: false
     default: null
   dest:
     description:
       - path of where to download the file to (if desired). If I(dest) is a
         directory, the basename of the file on the remote server will be used.
+      - Since 2.3 the body is written out as it is read, and only kept in memory
+        if I(return_content) is set. It is read back from the file to return it in
+        C(content) when the status is not in I(status_code), and in C(json) when the
+        response is JSON of at most 16MB.
     required: false
     default: null
   user:
@@ -160,6 +180,60 @@ options:
     default: 'yes'
     choices: ['yes', 'no']
     version_added: '1.9.2'
+  max_body_size:
+    description:
+      - The largest response body accepted, in bytes. The task fails if the Content-Length
+        of the response, or the body read so far, is larger.
+    required: false
+    default: null
+    version_added: '2.3'
+  json_paths:
+    description:
+      - Only return these values of a JSON response in C(json), picked out as the body is
+        read instead of decoding all of it. A path is keys and list indexes joined with dots,
+        C(*) matches any key or index.
+      - C(json) then maps each path found to its value, paths with a C(*) to the list of
+        the values they matched. The body is only kept in memory if I(return_content) is set.
+    required: false
+    default: null
+    version_added: '2.3'
+  timing:
+    description:
+      - Return a C(timing) breakdown, in seconds, of the request. C(dns), C(connect) and
+        C(tls) are the name lookup, TCP connect and TLS handshake of a new connection,
+        C(ttfb) is from sending the request to the response headers arriving and
+        C(transfer) the reading of the body. C(total), C(bytes), C(bytes_per_sec) of the
+        body and whether the connection was C(reused) are given as well.
+      - With C(requests) each response has its own C(timing). Without it the connection is
+        made by the underlying url library, its set up is counted in C(ttfb) and C(dns),
+        C(connect) and C(tls) are null.
+    required: false
+    default: 'no'
+    choices: ['yes', 'no']
+    version_added: '2.3'
+  requests:
+    description:
+      - A list of requests to make in this single task, each a hash of C(url), C(method),
+        C(body), C(body_format), C(headers), C(status_code) and C(return_content), with the
+        same meaning as the options of that name. Keys left out are taken from the task,
+        C(headers) are merged with the task's.
+      - Connections are kept alive and reused for later requests to the same scheme, host
+        and port. The responses are returned in C(responses), in the order of the requests,
+        each with its C(status), C(msg), response headers, C(elapsed) time and, if asked
+        for, C(content) and C(json). The task fails if any status is not in its C(status_code).
+      - Redirects are not followed, proxies are not used and C(dest) is not supported.
+        Credentials from C(user) and C(password) are always sent, as with C(force_basic_auth).
+      - Needs python 2.6 or later on the managed host, and the ssl module for https.
+    required: false
+    default: null
+    version_added: '2.3'
+  concurrency:
+    description:
+      - The number of C(requests) in flight at once, which is also the most connections
+        kept open.
+    required: false
+    default: 4
+    version_added: '2.3'
 notes:
   - The dependency on httplib2 was removed in Ansible 2.1
 author: "Romeo Theriault (@romeotheriault)"
@@ -215,22 +289,44 @@ EXAMPLES = '''
     force_basic_auth: yes
     status_code: 201
 
+# Download a large export to a file, keeping only the paging cursor of the JSON
+- uri:
+    url: https://api.example.com/v1/export
+    dest: /srv/exports/items.json
+    max_body_size: 1073741824
+    json_paths:
+      - meta.next_cursor
+      - items.*.id
+  register: export
+
+# Tell a slow network from a slow service in a health check
+- uri:
+    url: https://api.example.com/health
+    timing: yes
+  register: health
+
+# Make many requests to a REST API over a few kept-alive connections
+- uri:
+    headers:
+      Authorization: "Bearer {{ token }}"
+    return_content: yes
+    requests:
+      - url: https://api.example.com/v1/items/1
+      - url: https://api.example.com/v1/items/2
+      - url: https://api.example.com/v1/items/3
+        method: DELETE
+        status_code: 204
+
 '''
 
+BUFSIZE = 65536
+# largest JSON response read back from dest to return it in json
+MAX_JSON_READ_BACK = 16 * 1024 * 1024
 
-def write_file(module, url, dest, content):
-    # create a tempfile with some test content
-    fd, tmpsrc = tempfile.mkstemp()
-    f = open(tmpsrc, 'wb')
-    try:
-        f.write(content)
-    except Exception:
-        err = get_exception()
-        os.remove(tmpsrc)
-        module.fail_json(msg="failed to create temporary content file: %s" % str(err))
-    f.close()
 
-    checksum_src   = None
+def install_file(module, tmpsrc, dest, checksum_src=None):
+    """Copies the temporary file tmpsrc to dest unless they are the same,
+    and removes it."""
     checksum_dest  = None
 
     # raise an error if there is no tmpsrc file
@@ -240,7 +336,8 @@ def write_file(module, url, dest, content):
     if not os.access(tmpsrc, os.R_OK):
         os.remove(tmpsrc)
         module.fail_json( msg="Source %s not readable" % (tmpsrc))
-    checksum_src = module.sha1(tmpsrc)
+    if checksum_src is None:
+        checksum_src = module.sha1(tmpsrc)
 
     # check if there is no dest file
     if os.path.exists(dest):
@@ -296,6 +393,469 @@ def absolute_location(url, location):
         return location
 
 
+class ConnectionPool(object):
+    '''Keeps the idle HTTP/1.1 connections of a task, per scheme, host and
+    port, so later requests to the same server reuse them.'''
+
+    def __init__(self, timeout, validate_certs=True):
+        self.timeout = timeout
+        self.validate_certs = validate_certs
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.opened = 0
+        self.context = None
+        if HAS_SSL and hasattr(ssl, 'create_default_context'):
+            self.context = ssl.create_default_context()
+            if not validate_certs:
+                self.context.check_hostname = False
+                self.context.verify_mode = ssl.CERT_NONE
+
+    def get(self, key):
+        '''Returns an idle connection for key, True and no phases, or a new
+        one, False and the times it took to set up'''
+        self.lock.acquire()
+        try:
+            conns = self.idle.get(key)
+            if conns:
+                return conns.pop(), True, None
+        finally:
+            self.lock.release()
+        conn, phases = self.connect(key)
+        return conn, False, phases
+
+    def connect(self, key):
+        '''Opens a connection for key, timing the name lookup, the TCP
+        connect and the TLS handshake'''
+        scheme, host, port = key
+        self.lock.acquire()
+        try:
+            self.opened += 1
+        finally:
+            self.lock.release()
+
+        kwargs = {}
+        if scheme == 'https':
+            conn_class = http_client.HTTPSConnection
+            if self.context is not None:
+                # or it loads the CA certificates for a context of its own
+                kwargs['context'] = self.context
+        else:
+            conn_class = http_client.HTTPConnection
+        if port is None:
+            port = conn_class.default_port
+        conn = conn_class(host, port, timeout=self.timeout, **kwargs)
+        phases = dict(dns=None, connect=None, tls=None)
+
+        start = time.time()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        phases['dns'] = time.time() - start
+
+        start = time.time()
+        sock = None
+        for family, socktype, proto, canonname, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(address)
+                break
+            except socket.error:
+                e = get_exception()
+                sock.close()
+                sock = None
+        if sock is None:
+            raise e
+        phases['connect'] = time.time() - start
+
+        if scheme == 'https':
+            start = time.time()
+            if self.context is not None:
+                sock = self.context.wrap_socket(sock, server_hostname=host)
+            else:
+                sock = ssl.wrap_socket(sock)
+            phases['tls'] = time.time() - start
+
+        conn.sock = sock
+        return conn, phases
+
+    def release(self, key, conn):
+        self.lock.acquire()
+        try:
+            self.idle.setdefault(key, []).append(conn)
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle = {}
+        finally:
+            self.lock.release()
+
+
+def transfer_timing(phases, start, sent, headers, done, size, reused):
+    '''Puts the phases of setting up a connection together with the time
+    from sending the request to the response headers and of reading the
+    body, in seconds'''
+    timing = dict(dns=None, connect=None, tls=None)
+    if phases:
+        timing.update(phases)
+    timing.update(ttfb=headers - sent, transfer=done - headers, total=done - start,
+                  bytes=size, bytes_per_sec=None, reused=reused)
+    if done > headers:
+        timing['bytes_per_sec'] = int(size / (done - headers))
+    return timing
+
+
+def closed_before_response(e):
+    '''Tells whether a request on a reused connection failed because the
+    server had closed it before responding, so it is safe to send again.'''
+    if isinstance(e, http_client.BadStatusLine):
+        # also covers RemoteDisconnected, nothing came back at all
+        return True
+    return isinstance(e, socket.error) and getattr(e, 'errno', None) in (errno.ECONNRESET, errno.EPIPE)
+
+
+def pooled_request(pool, request):
+    '''Makes one request over a connection from the pool and returns the
+    response info, in the form fetch_url() gives it, and the content.'''
+    parts = six.moves.urllib.parse.urlsplit(request['url'])
+    key = (parts.scheme, parts.hostname, parts.port)
+    path = parts.path or '/'
+    if parts.query:
+        path = '%s?%s' % (path, parts.query)
+
+    start = time.time()
+    conn = None
+    reused = False
+    try:
+        conn, reused, phases = pool.get(key)
+        try:
+            sent = time.time()
+            conn.request(request['method'], path, request['body'], request['headers'])
+            rsp = conn.getresponse()
+        except Exception:
+            conn.close()
+            if not reused or not closed_before_response(get_exception()):
+                raise
+            # the server closed the idle connection meanwhile
+            conn, phases = pool.connect(key)
+            reused = False
+            sent = time.time()
+            conn.request(request['method'], path, request['body'], request['headers'])
+            rsp = conn.getresponse()
+        headers = time.time()
+        content = rsp.read()
+    except Exception:
+        if conn is not None:
+            conn.close()
+        e = get_exception()
+        return dict(url=request['url'], status=-1, msg="Request failed: %s" % str(e),
+                    reused=reused, elapsed=time.time() - start), ''
+    done = time.time()
+
+    if rsp.will_close:
+        conn.close()
+    else:
+        pool.release(key, conn)
+
+    info = dict(url=request['url'], status=rsp.status, msg=rsp.reason,
+                reused=reused, elapsed=done - start)
+    for name, value in rsp.getheaders():
+        info[name.lower()] = value
+    if request.get('timing'):
+        info['timing'] = transfer_timing(phases, start, sent, headers, done, len(content), reused)
+    return info, content
+
+
+def run_requests(pool, requests, concurrency):
+    '''Runs the requests on at most concurrency threads and returns the
+    (info, content) of each, in the order of the requests.'''
+    results = [None] * len(requests)
+    pending = queue.Queue()
+    for index, request in enumerate(requests):
+        pending.put((index, request))
+
+    def worker():
+        while True:
+            try:
+                index, request = pending.get_nowait()
+            except queue.Empty:
+                return
+            results[index] = pooled_request(pool, request)
+
+    threads = []
+    for i in range(min(concurrency, len(requests))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def transmogrify(resp):
+    '''Replaces '-' with '_' in the header names, since variables dont work
+    with dashes.'''
+    uresp = {}
+    for key, value in six.iteritems(resp):
+        ukey = key.replace("-", "_")
+        uresp[ukey] = value
+    return uresp
+
+
+def decode_content(uresp, content):
+    '''Returns the content as text, in the charset of the response, and sets
+    json in uresp if the response is JSON.'''
+    # Default content_encoding to try
+    content_encoding = 'utf-8'
+    if 'content_type' in uresp:
+        content_type, params = cgi.parse_header(uresp['content_type'])
+        if 'charset' in params:
+            content_encoding = params['charset']
+        u_content = unicode(content, content_encoding, errors='replace')
+        if 'application/json' in content_type or 'text/json' in content_type:
+            try:
+                js = json.loads(u_content)
+                uresp['json'] = js
+            except:
+                pass
+    else:
+        u_content = unicode(content, content_encoding, errors='replace')
+    return u_content
+
+
+JSON_TOKEN_RE = re.compile(r'\s*(?:("[^"\\]*(?:\\.[^"\\]*)*")|([{}\[\],:])|([^\s{}\[\],:"]+))')
+JSON_SPAN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}\[\]]')
+
+
+class JsonPathExtractor(object):
+    """Picks the values at some paths out of a JSON document that is fed in
+    chunks. Containers on the way to a path are followed token by token,
+    everything else is skipped over without being decoded."""
+
+    def __init__(self, paths, encoding='utf-8'):
+        self.paths = [(path, path.split('.')) for path in paths]
+        self.results = {}
+        for path, segments in self.paths:
+            if '*' in segments:
+                self.results[path] = []
+        try:
+            self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.buf = ''
+        self.pos = 0
+        # per open container: its key or index, whether it is an object,
+        # whether a key comes next, its start if it is also a value to keep
+        # and the paths that go on into it
+        self.stack = []
+        # the value being read past: its start, nesting and matched paths
+        self.span = None
+
+    def feed(self, data, final=False):
+        self.buf += self.decoder.decode(data, final)
+        while self.pos < len(self.buf):
+            if self.span is not None:
+                if not self._skip():
+                    break
+            elif not self._track(final):
+                break
+
+        keep = self.pos
+        if self.span is not None and self.span[2]:
+            keep = self.span[0]
+        for frame in self.stack:
+            if frame[3] is not None:
+                keep = min(keep, frame[3][0])
+        if keep:
+            self.buf = self.buf[keep:]
+            self.pos -= keep
+            if self.span is not None:
+                self.span[0] -= keep
+            for frame in self.stack:
+                if frame[3] is not None:
+                    frame[3][0] -= keep
+
+    def close(self):
+        """Returns the values found, by path"""
+        self.feed(six.b(''), True)
+        return self.results
+
+    def _store(self, paths, value):
+        for path, segments in paths:
+            if '*' in segments:
+                self.results[path].append(value)
+            else:
+                self.results[path] = value
+
+    def _skip(self):
+        start, depth, paths = self.span
+        while True:
+            m = JSON_SPAN_RE.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                self.span[1] = depth
+                return False
+            token = m.group()
+            if token == '"':
+                # a string that is not complete yet
+                self.pos = m.start()
+                self.span[1] = depth
+                return False
+            self.pos = m.end()
+            if token in '{[':
+                depth += 1
+            elif token in '}]':
+                depth -= 1
+                if depth == 0:
+                    break
+        self.span = None
+        self._value_done(start, paths)
+        return True
+
+    def _value_done(self, start=None, paths=None):
+        if paths:
+            try:
+                self._store(paths, json.loads(self.buf[start:self.pos]))
+            except ValueError:
+                pass
+        if self.stack and self.stack[-1][1]:
+            self.stack[-1][2] = False
+
+    def _track(self, final):
+        m = JSON_TOKEN_RE.match(self.buf, self.pos)
+        if m is None or (m.group(3) and m.end() == len(self.buf) and not final):
+            # whitespace, or a token that may not be complete yet
+            return False
+        string, punct, scalar = m.groups()
+        self.pos = m.end()
+
+        if punct == ',':
+            if self.stack:
+                frame = self.stack[-1]
+                if frame[1]:
+                    frame[2] = True
+                else:
+                    frame[0] += 1
+            return True
+        if punct == ':':
+            return True
+        if punct in ('}', ']'):
+            if self.stack:
+                capture = self.stack.pop()[3]
+                if capture is not None:
+                    self._value_done(*capture)
+                else:
+                    self._value_done()
+            return True
+        if string is not None and self.stack and self.stack[-1][2]:
+            self.stack[-1][0] = json.loads(string)
+            self.stack[-1][2] = False
+            return True
+
+        matched = []
+        inner = []
+        if self.stack:
+            frame = self.stack[-1]
+            depth = len(self.stack)
+            key = '%s' % frame[0]
+            for p in frame[4]:
+                if p[1][depth - 1] in ('*', key):
+                    if len(p[1]) == depth:
+                        matched.append(p)
+                    else:
+                        inner.append(p)
+        else:
+            inner = self.paths
+
+        if punct is not None:
+            if inner:
+                # longer paths go on into it, keep it as a whole as well if matched
+                capture = None
+                if matched:
+                    capture = [m.start(2), matched]
+                self.stack.append([0, punct == '{', punct == '{', capture, inner])
+            else:
+                self.span = [m.start(2), 1, matched]
+            return True
+
+        if matched:
+            try:
+                self._store(matched, json.loads(string or scalar))
+            except ValueError:
+                pass
+        self._value_done()
+        return True
+
+
+def read_body(module, resp, length, to_file, keep_content, extractor, max_body_size):
+    """Reads the response in chunks, into a temporary file hashed on the way
+    if to_file is set, into memory if keep_content is and through the
+    extractor. Returns the content or None, the temporary file, its sha1 and
+    the size of the body."""
+    if max_body_size is not None and length is not None and length > max_body_size:
+        module.fail_json(msg="The response of %d bytes is larger than max_body_size %d" % (length, max_body_size))
+
+    chunks = []
+    size = 0
+    f = tmpsrc = checksum = None
+    if to_file:
+        fd, tmpsrc = tempfile.mkstemp()
+        f = os.fdopen(fd, 'wb')
+        digest = AVAILABLE_HASH_ALGORITHMS['sha1']()
+
+    while True:
+        data = resp.read(BUFSIZE)
+        if not data:
+            break
+        size += len(data)
+        if max_body_size is not None and size > max_body_size:
+            if f is not None:
+                f.close()
+                os.remove(tmpsrc)
+            module.fail_json(msg="The response is larger than max_body_size %d" % max_body_size)
+        if f is not None:
+            try:
+                f.write(data)
+            except Exception:
+                err = get_exception()
+                f.close()
+                os.remove(tmpsrc)
+                module.fail_json(msg="failed to create temporary content file: %s" % str(err))
+            digest.update(data)
+        if keep_content:
+            chunks.append(data)
+        if extractor is not None:
+            extractor.feed(data)
+
+    if f is not None:
+        f.close()
+        checksum = digest.hexdigest()
+    content = None
+    if keep_content:
+        content = six.b('').join(chunks)
+    return content, tmpsrc, checksum, size
+
+
+def read_back(resp, tmpsrc, status_code):
+    """Returns the body of a response that was only written to tmpsrc when
+    the task still reports it: on an unexpected status, or when it is JSON of
+    at most MAX_JSON_READ_BACK bytes. Returns None otherwise."""
+    content_type = cgi.parse_header(resp.get('content-type', ''))[0]
+    is_json = 'application/json' in content_type or 'text/json' in content_type
+    if resp['status'] in status_code and not (is_json and os.path.getsize(tmpsrc) <= MAX_JSON_READ_BACK):
+        return None
+    f = open(tmpsrc, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
 def uri(module, url, dest, body, body_format, method, headers, socket_timeout):
     # is dest is set and is a directory, let's check if we get redirected and
     # set the filename from that url
@@ -329,21 +889,142 @@ def uri(module, url, dest, body, body_format, method, headers, socket_timeout):
         # Reset follow_redirects back to the stashed value
         module.params['follow_redirects'] = follow_redirects
 
+    start = time.time()
     resp, info = fetch_url(module, url, data=body, headers=headers,
                            method=method, timeout=socket_timeout)
+    response_start = time.time()
 
-    try:
-        content = resp.read()
-    except AttributeError:
+    if resp is None:
         # there was no content, but the error read()
         # may have been stored in the info as 'body'
-        content = info.pop('body', '')
+        resp = six.BytesIO(to_bytes(info.pop('body', '')))
+
+    extractor = None
+    if module.params['json_paths']:
+        content_type, params = cgi.parse_header(info.get('content-type', ''))
+        if 'application/json' in content_type or 'text/json' in content_type:
+            extractor = JsonPathExtractor(module.params['json_paths'], params.get('charset', 'utf-8'))
+
+    keep_content = module.params['return_content'] or (dest is None and extractor is None)
+    try:
+        length = int(info['content-length'])
+    except (KeyError, ValueError):
+        length = None
+    content, tmpsrc, checksum, size = read_body(module, resp, length, dest is not None, keep_content,
+                                                extractor, module.params['max_body_size'])
+    done = time.time()
 
     r['redirected'] = redirected or info['url'] != url
     r.update(redir_info)
     r.update(info)
+    if checksum is not None:
+        r['checksum'] = checksum
+    if module.params['timing']:
+        # fetch_url does not tell the connection set up apart from waiting
+        # for the response, all of it is in ttfb
+        r['timing'] = transfer_timing(None, start, start, response_start, done, size, False)
+
+    js = None
+    if extractor is not None:
+        js = extractor.close()
+
+    return r, content, dest, tmpsrc, js
+
+
+REQUEST_KEYS = ('url', 'method', 'body', 'body_format', 'headers', 'status_code', 'return_content')
+
+
+def build_requests(module, task_headers):
+    '''Fills in the items of the requests option from the task'''
+    params = module.params
+    requests = []
+    for item in params['requests']:
+        if isinstance(item, basestring):
+            item = dict(url=item)
+        if not isinstance(item, dict) or 'url' not in item:
+            module.fail_json(msg="each of requests must be a url or a hash with a url, got %s" % item)
+        unknown = [key for key in item if key not in REQUEST_KEYS]
+        if unknown:
+            module.fail_json(msg="unsupported keys %s in requests, use %s" % (', '.join(sorted(unknown)), ', '.join(REQUEST_KEYS)))
+
+        scheme = six.moves.urllib.parse.urlsplit(item['url'])[0]
+        if scheme not in ('http', 'https'):
+            module.fail_json(msg="requests only support http and https urls, got %s" % item['url'])
+
+        request = dict(url=item['url'],
+                       method=item.get('method', params['method']).upper(),
+                       body=item.get('body', params['body']),
+                       return_content=module.boolean(item.get('return_content', params['return_content'])),
+                       timing=params['timing'])
+        try:
+            request['status_code'] = [int(x) for x in list(item.get('status_code', params['status_code']))]
+        except (TypeError, ValueError):
+            module.fail_json(msg="status_code of %s must be a list of integers" % item['url'])
 
-    return r, content, dest
+        headers = dict(task_headers)
+        headers.update(item.get('headers', {}))
+        body = request['body']
+        if item.get('body_format', params['body_format']).lower() == 'json':
+            if not isinstance(body, basestring):
+                body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if body is not None:
+            body = to_bytes(body, errors='surrogate_or_strict')
+        request['body'] = body
+
+        headers.setdefault('User-Agent', params['http_agent'])
+        if params['url_username']:
+            credentials = '%s:%s' % (params['url_username'], params['url_password'] or '')
+            headers['Authorization'] = 'Basic %s' % base64.b64encode(to_bytes(credentials)).decode('ascii')
+        request['headers'] = headers
+        requests.append(request)
+    return requests
+
+
+def run_request_list(module, task_headers):
+    '''Makes the requests over kept-alive connections and exits the module'''
+    # connection timeouts and the ssl module are only there from python 2.6
+    if sys.version_info < (2, 6):
+        module.fail_json(msg="requests needs python 2.6 or later, make the requests with url instead")
+
+    concurrency = module.params['concurrency']
+    if concurrency < 1:
+        module.fail_json(msg="concurrency must be at least 1")
+
+    requests = build_requests(module, task_headers)
+    validate_certs = module.params['validate_certs']
+    if not HAS_SSL:
+        for request in requests:
+            if request['url'].startswith('https'):
+                module.fail_json(msg="https requests need the python ssl module")
+    if validate_certs and not (HAS_SSL and hasattr(ssl, 'create_default_context')):
+        for request in requests:
+            if request['url'].startswith('https'):
+                module.fail_json(msg="validating certificates of requests needs python 2.7.9 or later,"
+                                     " set validate_certs=no to make them without")
+
+    pool = ConnectionPool(module.params['timeout'], validate_certs)
+    try:
+        results = run_requests(pool, requests, concurrency)
+    finally:
+        pool.close()
+
+    responses = []
+    failed = 0
+    for request, (info, content) in zip(requests, results):
+        uresp = transmogrify(info)
+        if request['return_content'] or uresp['status'] not in request['status_code']:
+            uresp['content'] = decode_content(uresp, content)
+        if uresp['status'] not in request['status_code']:
+            failed += 1
+            uresp['failed'] = True
+            uresp['msg'] = 'Status code was not %s: %s' % (request['status_code'], uresp['msg'])
+        responses.append(uresp)
+
+    if failed:
+        module.fail_json(msg="%d of %d requests failed" % (failed, len(requests)),
+                         responses=responses, connections=pool.opened)
+    module.exit_json(changed=False, responses=responses, connections=pool.opened)
 
 
 def main():
@@ -361,13 +1042,20 @@ def main():
         removes = dict(required=False, default=None, type='path'),
         status_code = dict(required=False, default=[200], type='list'),
         timeout = dict(required=False, default=30, type='int'),
-        headers = dict(required=False, type='dict', default={})
+        headers = dict(required=False, type='dict', default={}),
+        requests = dict(required=False, default=None, type='list'),
+        concurrency = dict(required=False, default=4, type='int'),
+        max_body_size = dict(required=False, default=None, type='int'),
+        json_paths = dict(required=False, default=None, type='list'),
+        timing = dict(required=False, default='no', type='bool'),
     ))
 
     module = AnsibleModule(
         argument_spec=argument_spec,
         check_invalid_arguments=False,
-        add_file_common_args=True
+        add_file_common_args=True,
+        required_one_of=[['url', 'requests']],
+        mutually_exclusive=[['url', 'requests'], ['dest', 'requests']],
     )
 
     url  = module.params['url']
@@ -411,17 +1099,24 @@ def main():
         if not os.path.exists(removes):
             module.exit_json(stdout="skipped, since %s does not exist" % removes, changed=False, stderr=False, rc=0)
 
+    if module.params['requests'] is not None:
+        run_request_list(module, dict_headers)
+
     # Make the request
-    resp, content, dest = uri(module, url, dest, body, body_format, method,
-                              dict_headers, socket_timeout)
+    resp, content, dest, tmpsrc, js = uri(module, url, dest, body, body_format, method,
+                                          dict_headers, socket_timeout)
     resp['status'] = int(resp['status'])
 
+    if content is None and tmpsrc is not None and js is None:
+        content = read_back(resp, tmpsrc, status_code)
+
     # Write the file out if requested
     if dest is not None:
         if resp['status'] == 304:
+            os.remove(tmpsrc)
             changed = False
         else:
-            write_file(module, url, dest, content)
+            install_file(module, tmpsrc, dest, resp['checksum'])
             # allow file attribute changes
             changed = True
             module.params['path'] = dest
@@ -432,33 +1127,19 @@ def main():
     else:
         changed = False
 
-    # Transmogrify the headers, replacing '-' with '_', since variables dont
-    # work with dashes.
-    uresp = {}
-    for key, value in six.iteritems(resp):
-        ukey = key.replace("-", "_")
-        uresp[ukey] = value
+    uresp = transmogrify(resp)
 
     try:
         uresp['location'] = absolute_location(url, uresp['location'])
     except KeyError:
         pass
 
-    # Default content_encoding to try
-    content_encoding = 'utf-8'
-    if 'content_type' in uresp:
-        content_type, params = cgi.parse_header(uresp['content_type'])
-        if 'charset' in params:
-            content_encoding = params['charset']
-        u_content = unicode(content, content_encoding, errors='replace')
-        if 'application/json' in content_type or 'text/json' in content_type:
-            try:
-                js = json.loads(u_content)
-                uresp['json'] = js
-            except:
-                pass
+    if content is not None:
+        u_content = decode_content(uresp, content)
     else:
-        u_content = unicode(content, content_encoding, errors='replace')
+        u_content = ''
+    if js is not None:
+        uresp['json'] = js
 
     if resp['status'] not in status_code:
         uresp['msg'] = 'Status code was not %s: %s' % (status_code, uresp.get('msg', ''))
@@ -472,6 +1153,7 @@ def main():
 # import module snippets
 from ansible.module_utils.basic import *
 from ansible.module_utils.urls import *
+from ansible.module_utils._text import to_bytes
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import mock
+import pytest
+
+from ansible.module_utils.six.moves import BaseHTTPServer, socketserver
+
+from network.basics import get_url
+
+
+class AnsibleFail(Exception):
+    pass
+
+
+class AnsibleExit(Exception):
+    pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''A local HTTP server with a single file, answering Range requests
+    unless ranges is False and cutting the first drop responses short.
+    Without content_range its 206 responses leave out Content-Range.'''
+
+    daemon_threads = True
+
+    def __init__(self, data, ranges=True, drop=0, content_range=True):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.data = data
+        self.ranges = ranges
+        self.content_range = content_range
+        self.drop = drop
+        self.etag = '"v1"'
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/artifact' % self.server_address[1]
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.data
+        byte_range = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        server.requests.append(byte_range)
+
+        if byte_range and server.ranges and if_range in (None, server.etag):
+            start, end = [int(i) for i in re.match(r'bytes=(\d+)-(\d+)', byte_range).groups()]
+            if start >= len(data):
+                self.send_response(416)
+                self.end_headers()
+                return
+            end = min(end, len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            if server.content_range:
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(data)))
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        self.end_headers()
+
+        if server.drop and len(body) > 1:
+            server.drop -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+class TestUrlGet(object):
+
+    def setup_method(self, method):
+        self.module = mock.MagicMock()
+        self.module.params = {}
+        self.module.fail_json.side_effect = AnsibleFail()
+        self.module.exit_json.side_effect = AnsibleExit()
+        self.tmpdir = tempfile.mkdtemp()
+        self.data = os.urandom(300001)
+        self.server = StandInServer(self.data)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_digests_while_streaming(self):
+        tempname, info, digests = get_url.url_get(self.module, self.server.url, os.path.join(self.tmpdir, 'artifact'),
+                                                  True, None, False, 10, None, self.tmpdir,
+                                                  algorithms=('sha1', 'sha256'), buffer_size=4096)
+
+        assert(digests == {'sha1': hashlib.sha1(self.data).hexdigest(),
+                           'sha256': hashlib.sha256(self.data).hexdigest()})
+        assert(self.server.requests == [None])
+
+
+class TestUrlGetRanges(object):
+
+    def setup_method(self, method):
+        self.module = mock.MagicMock()
+        self.module.params = {}
+        self.module.fail_json.side_effect = AnsibleFail()
+        self.module.exit_json.side_effect = AnsibleExit()
+        self.tmpdir = tempfile.mkdtemp()
+        self.dest = os.path.join(self.tmpdir, 'artifact')
+        self.data = os.urandom(1000003)
+        self.server = None
+
+    def teardown_method(self, method):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def serve(self, **kwargs):
+        self.server = StandInServer(self.data, **kwargs)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def url_get(self, **kwargs):
+        return get_url.url_get(self.module, self.server.url, self.dest, True, None, False,
+                               10, None, '', **kwargs)
+
+    def read(self, path):
+        f = open(path, 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_parallel_segments(self):
+        self.serve()
+        tempname, info, digests = self.url_get(parallel_segments=4)
+
+        assert(self.read(tempname) == self.data)
+        assert(digests['sha1'] == hashlib.sha1(self.data).hexdigest())
+        # the probe for the first byte and one request per segment
+        assert(len(self.server.requests) == 5)
+        os.remove(tempname)
+
+    def test_parallel_segments_without_ranges(self):
+        self.serve(ranges=False)
+        tempname, info, digests = self.url_get(parallel_segments=4)
+
+        assert(self.read(tempname) == self.data)
+        assert(digests['sha1'] == hashlib.sha1(self.data).hexdigest())
+        assert(self.server.requests == ['bytes=0-0'])
+        os.remove(tempname)
+
+    def test_range_without_content_range(self):
+        self.serve(content_range=False)
+        tempname, info, digests = self.url_get(parallel_segments=4)
+
+        assert(self.read(tempname) == self.data)
+        assert(self.server.requests == ['bytes=0-0', None])
+        os.remove(tempname)
+
+    def test_fail_json_in_segment(self):
+        self.serve()
+        fetch_url = get_url.fetch_url
+
+        def failing_fetch_url(module, url, **kwargs):
+            if kwargs['headers'].get('Range') != 'bytes=0-0':
+                module.fail_json(msg='Connection refused')
+            return fetch_url(module, url, **kwargs)
+
+        patcher = mock.patch.object(get_url, 'fetch_url', failing_fetch_url)
+        patcher.start()
+        try:
+            pytest.raises(AnsibleFail, self.url_get, parallel_segments=2)
+        finally:
+            patcher.stop()
+        assert(self.module.fail_json.call_count == 1)
+        fail_args = self.module.fail_json.call_args[1]
+        assert(fail_args['msg'] == 'Request failed')
+        assert(len(fail_args['errors']) == 2)
+        assert([e.endswith(': Connection refused') for e in fail_args['errors']] == [True, True])
+
+    def test_resume_after_interruption(self):
+        self.serve(drop=2)
+        pytest.raises(AnsibleFail, self.url_get, resume=True, parallel_segments=3)
+
+        fail_args = self.module.fail_json.call_args[1]
+        assert(0 < fail_args['bytes_done'] < len(self.data))
+        assert(len(os.listdir(self.tmpdir)) == 2)
+
+        requests = len(self.server.requests)
+        tempname, info, digests = self.url_get(resume=True, parallel_segments=3)
+
+        assert(self.read(tempname) == self.data)
+        # only the unfinished second halves are asked for again
+        resumed = [r for r in self.server.requests[requests:] if r != 'bytes=0-0']
+        assert(len(resumed) == 2)
+        assert(not [r for r in resumed if r.startswith('bytes=0-')])
+        assert(os.listdir(self.tmpdir) == [os.path.basename(tempname)])
+
+    def test_resume_restarts_when_file_changed(self):
+        self.serve(drop=1)
+        pytest.raises(AnsibleFail, self.url_get, resume=True, parallel_segments=2)
+
+        self.server.data = self.data = os.urandom(1000003)
+        self.server.etag = '"v2"'
+        tempname, info, digests = self.url_get(resume=True, parallel_segments=2)
+
+        assert(self.read(tempname) == self.data)
@@ -0,0 +1,296 @@
+import hashlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import mock
+import pytest
+
+from ansible.module_utils.six.moves import BaseHTTPServer, socketserver
+
+from network.basics import uri
+
+
+class AnsibleFail(Exception):
+    pass
+
+
+class AnsibleExit(Exception):
+    pass
+
+
+class KeepAliveServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''A local HTTP/1.1 server answering every path with its name as JSON,
+    and 404 for paths ending in missing. After requests_per_connection it
+    drops the connection without telling the client, as servers do with
+    idle ones.'''
+
+    daemon_threads = True
+
+    def __init__(self, requests_per_connection=0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), KeepAliveHandler)
+        self.requests_per_connection = requests_per_connection
+        self.connections = []
+        self.requests = []
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d/%s' % (self.server_address[1], path)
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections.append(self.client_address)
+        self.served = 0
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict((k.lower(), v) for k, v in self.headers.items())))
+        if self.path.endswith('slow'):
+            time.sleep(1)
+        body = json.dumps(dict(path=self.path)).encode('ascii')
+
+        if self.path.endswith('missing'):
+            self.send_response(404)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        self.served += 1
+        if self.served == server.requests_per_connection:
+            self.close_connection = True
+
+    do_POST = do_GET
+
+
+class TestRunRequests(object):
+
+    def setup_method(self, method):
+        self.server = None
+        self.pool = uri.ConnectionPool(10)
+
+    def teardown_method(self, method):
+        self.pool.close()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def serve(self, **kwargs):
+        self.server = KeepAliveServer(**kwargs)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def requests(self, paths):
+        return [dict(url=self.server.url(path), method='GET', body=None, headers={}) for path in paths]
+
+    def test_connections_are_reused(self):
+        self.serve()
+        paths = ['item/%d' % i for i in range(20)]
+        results = uri.run_requests(self.pool, self.requests(paths), 3)
+
+        assert([info['status'] for info, content in results] == [200] * 20)
+        assert([json.loads(content.decode('ascii'))['path'] for info, content in results] == ['/' + p for p in paths])
+        assert(self.pool.opened <= 3)
+        assert(len(self.server.connections) == self.pool.opened)
+        assert(len([info for info, content in results if info['reused']]) >= 17)
+
+    def test_dropped_idle_connection_is_retried(self):
+        self.serve(requests_per_connection=2)
+        results = uri.run_requests(self.pool, self.requests(['a', 'b', 'c', 'd', 'e']), 1)
+
+        assert([info['status'] for info, content in results] == [200] * 5)
+        assert([info['reused'] for info, content in results] == [False, True, False, True, False])
+        assert(self.pool.opened == 3)
+
+    def test_failed_post_is_not_sent_again(self):
+        self.serve()
+        self.pool = uri.ConnectionPool(0.2)
+        requests = self.requests(['a', 'slow'])
+        requests[1]['method'] = 'POST'
+        results = uri.run_requests(self.pool, requests, 1)
+
+        assert(results[0][0]['status'] == 200)
+        assert(results[1][0]['status'] == -1 and results[1][0]['reused'])
+        assert([path for path, headers in self.server.requests] == ['/a', '/slow'])
+
+    def test_timing(self):
+        self.serve()
+        requests = self.requests(['a', 'b'])
+        for request in requests:
+            request['timing'] = True
+        results = uri.run_requests(self.pool, requests, 1)
+
+        first, second = [info['timing'] for info, content in results]
+        assert(first['dns'] >= 0 and first['connect'] >= 0 and first['tls'] is None)
+        assert(not first['reused'] and second['reused'])
+        assert(second['dns'] is None and second['connect'] is None)
+        assert(second['bytes'] == len(results[1][1]))
+        assert(second['ttfb'] + second['transfer'] <= second['total'])
+
+    def test_unreachable_server(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        request = dict(url='http://127.0.0.1:%d/' % port, method='GET', body=None, headers={})
+        info, content = uri.pooled_request(self.pool, request)
+
+        assert(info['status'] == -1)
+        assert(info['msg'].startswith('Request failed'))
+        assert(content == '')
+
+
+class TestRunRequestList(object):
+
+    def setup_method(self, method):
+        self.module = mock.MagicMock()
+        self.module.params = dict(method='GET', body=None, body_format='raw', return_content=False,
+                                  status_code=[200], http_agent='ansible-httpget', url_username=None,
+                                  url_password=None, validate_certs=True, timeout=10, concurrency=2,
+                                  timing=False)
+        self.module.boolean.side_effect = bool
+        self.module.fail_json.side_effect = AnsibleFail()
+        self.module.exit_json.side_effect = AnsibleExit()
+        self.server = KeepAliveServer()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_responses(self):
+        self.module.params['url_username'] = 'admin'
+        self.module.params['url_password'] = 'secret'
+        self.module.params['requests'] = [self.server.url('one'),
+                                          dict(url=self.server.url('two'), return_content=True,
+                                               headers={'X-Item': '2'})]
+        pytest.raises(AnsibleExit, uri.run_request_list, self.module, {'X-Task': 'yes'})
+
+        exit_args = self.module.exit_json.call_args[1]
+        assert(exit_args['connections'] <= 2)
+        one, two = exit_args['responses']
+        assert(one['status'] == 200 and 'content' not in one)
+        assert(two['json'] == {'path': '/two'})
+        assert(two['content_type'] == 'application/json')
+
+        headers = dict(self.server.requests)['/two']
+        assert(headers['x-task'] == 'yes' and headers['x-item'] == '2')
+        assert(headers['authorization'] == 'Basic YWRtaW46c2VjcmV0')
+
+    def test_unexpected_status_fails(self):
+        self.module.params['requests'] = [self.server.url('one'), self.server.url('missing'),
+                                          dict(url=self.server.url('missing'), status_code=[404])]
+        pytest.raises(AnsibleFail, uri.run_request_list, self.module, {})
+
+        fail_args = self.module.fail_json.call_args[1]
+        assert(fail_args['msg'] == '1 of 3 requests failed')
+        assert([r.get('failed', False) for r in fail_args['responses']] == [False, True, False])
+        assert(fail_args['responses'][1]['json'] == {'path': '/missing'})
+
+    def test_old_python_fails_cleanly(self):
+        self.module.params['requests'] = [self.server.url('one')]
+        patcher = mock.patch.object(uri.sys, 'version_info', (2, 5, 6, 'final', 0))
+        patcher.start()
+        try:
+            pytest.raises(AnsibleFail, uri.run_request_list, self.module, {})
+        finally:
+            patcher.stop()
+        assert(self.module.fail_json.call_args[1]['msg'].startswith('requests needs python 2.6'))
+        assert(self.server.requests == [])
+
+
+class TestJsonPathExtractor(object):
+
+    document = {'meta': {'cursor': 'a"}]b', 'count': 2},
+                'items': [{'id': 1, 'tags': ['x', {'deep': [1]}]}, {'id': 2, 'tags': []}],
+                'empty': {}, 'total': -1.5e3}
+
+    def extract(self, paths, chunk):
+        data = json.dumps(self.document).encode('utf-8')
+        extractor = uri.JsonPathExtractor(paths)
+        for i in range(0, len(data), chunk):
+            extractor.feed(data[i:i + chunk])
+        return extractor.close()
+
+    def test_paths(self):
+        paths = ['meta.cursor', 'items.*.id', 'items.0.tags.1', 'empty', 'total', 'missing.key']
+        for chunk in (1, 3, 4096):
+            results = self.extract(paths, chunk)
+            assert(results == {'meta.cursor': 'a"}]b', 'items.*.id': [1, 2],
+                               'items.0.tags.1': {'deep': [1]}, 'empty': {}, 'total': -1500.0})
+
+    def test_overlapping_paths(self):
+        results = self.extract(['items.1', 'items.*.id', 'meta'], 2)
+        assert(results == {'items.1': {'id': 2, 'tags': []}, 'items.*.id': [1, 2],
+                           'meta': {'cursor': 'a"}]b', 'count': 2}})
+
+
+class TestReadBody(object):
+
+    def setup_method(self, method):
+        self.module = mock.MagicMock()
+        self.module.fail_json.side_effect = AnsibleFail()
+        self.data = json.dumps(dict(items=list(range(50000)))).encode('ascii')
+
+    def test_streams_to_file(self):
+        extractor = uri.JsonPathExtractor(['items.*'])
+        content, tmpsrc, checksum, size = uri.read_body(self.module, io.BytesIO(self.data), len(self.data),
+                                                        True, False, extractor, None)
+        f = open(tmpsrc, 'rb')
+        try:
+            assert(f.read() == self.data)
+        finally:
+            f.close()
+            os.remove(tmpsrc)
+        assert(content is None and size == len(self.data))
+        assert(checksum == hashlib.sha1(self.data).hexdigest())
+        assert(extractor.close() == {'items.*': list(range(50000))})
+
+    def test_max_body_size(self):
+        pytest.raises(AnsibleFail, uri.read_body, self.module, io.BytesIO(self.data), len(self.data),
+                      False, True, None, 1000)
+        pytest.raises(AnsibleFail, uri.read_body, self.module, io.BytesIO(self.data), None,
+                      True, True, None, 100000)
+        assert(not self.module.fail_json.call_args[1]['msg'].startswith('The response of'))
+
+        content, tmpsrc, checksum, size = uri.read_body(self.module, io.BytesIO(self.data), None,
+                                                        False, True, None, len(self.data))
+        assert(content == self.data and tmpsrc is None)
+
+
+class TestReadBack(object):
+
+    def setup_method(self, method):
+        fd, self.tmpsrc = tempfile.mkstemp()
+        os.write(fd, '{"path": "/one"}'.encode('ascii'))
+        os.close(fd)
+
+    def teardown_method(self, method):
+        os.remove(self.tmpsrc)
+
+    def test_json(self):
+        resp = {'status': 200, 'content-type': 'application/json; charset=utf-8'}
+        assert(uri.read_back(resp, self.tmpsrc, [200]) == '{"path": "/one"}'.encode('ascii'))
+        resp['content-type'] = 'application/octet-stream'
+        assert(uri.read_back(resp, self.tmpsrc, [200]) is None)
+
+    def test_unexpected_status(self):
+        resp = {'status': 500, 'content-type': 'text/plain'}
+        assert(uri.read_back(resp, self.tmpsrc, [200]) == '{"path": "/one"}'.encode('ascii'))
@@ -0,0 +1,125 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import mock
+import pytest
+
+from utilities.logic import wait_for
+
+
+class AnsibleFail(Exception):
+    pass
+
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class BannerServer(object):
+    '''A listening socket that greets whoever connects with banner'''
+
+    def __init__(self, banner=None):
+        self.banner = banner
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, address = self.sock.accept()
+            except socket.error:
+                return
+            if self.banner:
+                conn.sendall(self.banner)
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class TestWaitForConditions(object):
+
+    def setup_method(self, method):
+        self.module = mock.MagicMock()
+        self.module.params = dict(host='127.0.0.1', state='started', timeout=10, connect_timeout=5)
+        self.module.fail_json.side_effect = AnsibleFail()
+        self.tmpdir = tempfile.mkdtemp()
+        self.servers = []
+
+    def teardown_method(self, method):
+        for server in self.servers:
+            server.close()
+        shutil.rmtree(self.tmpdir)
+
+    def serve(self, banner=None):
+        server = BannerServer(banner)
+        self.servers.append(server)
+        return server.port
+
+    def wait(self, conditions, quorum=None):
+        self.module.params['conditions'] = conditions
+        conditions = wait_for._build_conditions(self.module, time.time())
+        if quorum is None:
+            quorum = len(conditions)
+        wait_for._wait_for_conditions(conditions, quorum)
+        return [c.result() for c in conditions]
+
+    def test_all_met(self):
+        path = os.path.join(self.tmpdir, 'ready')
+        f = open(path, 'w')
+        f.write('service is up\n')
+        f.close()
+
+        results = self.wait([dict(port=self.serve()),
+                             dict(port=self.serve('SSH-2.0-OpenSSH_7.4\r\n'.encode('ascii')), search_regex='OpenSSH'),
+                             dict(port=closed_port(), state='stopped'),
+                             dict(path=path, search_regex='^service is up$'),
+                             dict(path=os.path.join(self.tmpdir, 'lock'), state='absent')])
+
+        assert([r['satisfied'] for r in results] == [True] * 5)
+        assert(max([r['elapsed'] for r in results]) < 1)
+
+    def test_conditions_are_waited_for_together(self):
+        start = time.time()
+        results = self.wait([dict(port=closed_port(), timeout=2) for i in range(20)])
+
+        assert([r['satisfied'] for r in results] == [False] * 20)
+        assert(results[0]['msg'].startswith('Timeout when waiting for 127.0.0.1:'))
+        assert(time.time() - start < 5)
+
+    def test_quorum(self):
+        start = time.time()
+        results = self.wait([dict(port=self.serve()), dict(port=closed_port()), dict(port=self.serve())],
+                            quorum=2)
+
+        assert([r['satisfied'] for r in results] == [True, False, True])
+        assert(results[1]['elapsed'] is None)
+        assert(time.time() - start < 1)
+
+    def test_quorum_out_of_reach(self):
+        start = time.time()
+        results = self.wait([dict(port=closed_port(), timeout=1), dict(port=closed_port(), timeout=60),
+                             dict(port=self.serve())], quorum=3)
+
+        assert(results[0]['satisfied'] is False and results[2]['satisfied'])
+        assert(results[1]['elapsed'] is None)
+        assert(time.time() - start < 5)
+
+    def test_invalid_conditions(self):
+        pytest.raises(AnsibleFail, self.wait, [dict(port=22, path='/etc/hosts')])
+        pytest.raises(AnsibleFail, self.wait, [dict(port=22, state='drained')])
+        pytest.raises(AnsibleFail, self.wait, [dict(path='/etc/hosts', state='stopped')])
+        pytest.raises(AnsibleFail, self.wait, [dict(port=22, exclude_hosts=['10.0.0.1'])])
@@ -20,6 +20,7 @@
 
 import binascii
 import datetime
+import errno
 import math
 import re
 import select
@@ -100,6 +101,24 @@ options:
     required: false
     description:
       - list of hosts or IPs to ignore when looking for active TCP connections for C(drained) state
+  conditions:
+    version_added: "2.3"
+    required: false
+    description:
+      - A list of conditions to wait for at once, each a hash of C(host), C(port), C(path),
+        C(search_regex), C(state), C(timeout) and C(connect_timeout) with the same meaning as the
+        options of that name. C(host), C(state), C(timeout) and C(connect_timeout) default to
+        those of the task. C(drained) is not supported.
+      - All ports are polled together over non-blocking sockets, and every condition has its own
+        timeout, counted from the start of the task.
+      - The result has the conditions in C(conditions), each with whether it was C(satisfied) and
+        after how many seconds, C(elapsed).
+  quorum:
+    version_added: "2.3"
+    required: false
+    description:
+      - The number of C(conditions) that must be met. The task returns as soon as they are, and
+        fails as soon as too many have timed out to reach it. Defaults to all of them.
 notes:
   - The ability to use search_regex with a port connection was added in 1.7.
 requirements: []
@@ -132,6 +151,14 @@ EXAMPLES = '''
 # wait until the process is finished and pid was destroyed
 - wait_for: path=/proc/3466/status state=absent
 
+# wait for the nodes of a cluster at once, going on as soon as two of the three are up
+- wait_for:
+    quorum: 2
+    conditions:
+      - { host: node1.example.com, port: 9200 }
+      - { host: node2.example.com, port: 9200 }
+      - { host: node3.example.com, port: 9200, timeout: 60 }
+
 # wait 300 seconds for port 22 to become open and contain "OpenSSH", don't assume the inventory_hostname is resolvable
 # and don't start checking for 10 seconds
 - local_action: wait_for port=22 host="{{ ansible_ssh_host | default(inventory_hostname) }}" search_regex=OpenSSH delay=10
@@ -350,6 +377,335 @@ def _timedelta_total_seconds(timedelta):
         timedelta.microseconds + 0.0 +
         (timedelta.seconds + timedelta.days * 24 * 3600) * 10 ** 6) / 10 ** 6
 
+CONDITION_KEYS = ('host', 'port', 'path', 'search_regex', 'state', 'timeout', 'connect_timeout')
+
+
+class WaitCondition(object):
+    """
+    One of the conditions of a multiplexed wait, with its own timeout
+    counted from start. satisfied stays None while it is waited for.
+    """
+
+    def __init__(self, spec, start):
+        self.spec = spec
+        self.start = start
+        self.deadline = start + spec['timeout']
+        self.next_check = start
+        self.stop = spec['state'] in ('stopped', 'absent')
+        self.search_re = None
+        if spec['search_regex'] is not None:
+            self.search_re = re.compile(spec['search_regex'], re.MULTILINE)
+        self.sock = None
+        self.satisfied = None
+        self.elapsed = None
+        self.msg = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def finish(self, now, satisfied, msg=None):
+        self.close()
+        self.satisfied = satisfied
+        self.elapsed = now - self.start
+        self.msg = msg
+
+    def expire(self, now):
+        if self.satisfied is None and now >= self.deadline:
+            self.finish(now, False, self.timeout_msg())
+
+    def close(self):
+        pass
+
+    def result(self):
+        result = dict(self.spec)
+        result['satisfied'] = bool(self.satisfied)
+        result['elapsed'] = self.elapsed
+        if self.msg:
+            result['msg'] = self.msg
+        return result
+
+
+class PathCondition(WaitCondition):
+    """
+    Waits for a file to be present, hold a search_regex, or be absent,
+    looking at it once a second.
+    """
+
+    def check(self, now):
+        self.next_check = now + 1
+        path = self.spec['path']
+        if self.stop:
+            try:
+                f = open(path)
+                f.close()
+            except IOError:
+                self.finish(now, True)
+            return
+
+        try:
+            os.stat(path)
+        except OSError:
+            e = get_exception()
+            # If anything except file not present, give up on it
+            if e.errno != errno.ENOENT:
+                self.finish(now, False, "Failed to stat %s, %s" % (path, e.strerror))
+            return
+        if self.search_re is None:
+            self.finish(now, True)
+            return
+        try:
+            f = open(path)
+            try:
+                if self.search_re.search(f.read()):
+                    self.finish(now, True)
+            finally:
+                f.close()
+        except IOError:
+            pass
+
+    def timeout_msg(self):
+        if self.stop:
+            return "Timeout when waiting for %s to be absent." % self.spec['path']
+        if self.search_re is not None:
+            return "Timeout when waiting for search string %s in %s" % (self.spec['search_regex'], self.spec['path'])
+        return "Timeout when waiting for file %s" % self.spec['path']
+
+
+class PortCondition(WaitCondition):
+    """
+    Waits for a port to be open, send a search_regex, or be closed. Each
+    attempt is a non-blocking connect whose socket is polled along with
+    those of the other conditions, a second after the last attempt ended.
+    """
+
+    def __init__(self, spec, start):
+        WaitCondition.__init__(self, spec, start)
+        self.addresses = []
+        self.address_index = 0
+        self.attempt_end = None
+        self.connecting = False
+        self.data = ''
+
+    def check(self, now):
+        if not self.addresses:
+            try:
+                self.addresses = socket.getaddrinfo(self.spec['host'], self.spec['port'], 0, socket.SOCK_STREAM)
+            except socket.error:
+                self.attempt_failed(now)
+                return
+        self.address_index = 0
+        self.attempt_end = now + self.spec['connect_timeout']
+        self.connect_next(now)
+
+    def connect_next(self, now):
+        # like socket.create_connection(), try each address in turn
+        while self.address_index < len(self.addresses):
+            family, socktype, proto, canonname, address = self.addresses[self.address_index]
+            self.address_index += 1
+            try:
+                sock = socket.socket(family, socktype, proto)
+            except socket.error:
+                continue
+            sock.setblocking(0)
+            err = sock.connect_ex(address)
+            if err in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                self.sock = sock
+                self.connecting = True
+                if err == 0:
+                    self.connected(now)
+                return
+            sock.close()
+        self.attempt_failed(now)
+
+    def ready(self, now):
+        if self.connecting:
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self.close()
+                self.connect_next(now)
+            else:
+                self.connected(now)
+            return
+
+        try:
+            response = self.sock.recv(1024)
+        except socket.error:
+            response = ''
+        if not response:
+            # Server shutdown, try again
+            self.retry(now)
+            return
+        self.data += to_native(response, errors='surrogate_or_strict')
+        if self.search_re.search(self.data):
+            self.finish(now, True)
+
+    def connected(self, now):
+        self.connecting = False
+        if self.stop:
+            self.retry(now)
+        elif self.search_re is None:
+            self.finish(now, True)
+        else:
+            # read what it has to say until the condition times out
+            self.data = ''
+            self.attempt_end = None
+
+    def attempt_failed(self, now):
+        if self.stop:
+            self.finish(now, True)
+        else:
+            self.retry(now)
+
+    def retry(self, now):
+        self.close()
+        self.attempt_end = None
+        self.next_check = now + 1
+
+    def expire(self, now):
+        if self.connecting and now >= self.attempt_end:
+            # Failed to connect by connect_timeout
+            self.close()
+            self.attempt_failed(now)
+        WaitCondition.expire(self, now)
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            self.sock.close()
+            self.sock = None
+        self.connecting = False
+
+    def timeout_msg(self):
+        if self.stop:
+            return "Timeout when waiting for %s:%s to stop." % (self.spec['host'], self.spec['port'])
+        if self.search_re is not None:
+            return "Timeout when waiting for search string %s in %s:%s" % (self.spec['search_regex'], self.spec['host'], self.spec['port'])
+        return "Timeout when waiting for %s:%s" % (self.spec['host'], self.spec['port'])
+
+
+def _ready_conditions(conditions, timeout):
+    """
+    Wait up to timeout seconds for the sockets of conditions, with poll()
+    where the platform has it and select() otherwise.
+
+    Returns:
+        List of the conditions whose socket is ready
+    """
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        by_fd = {}
+        for condition in conditions:
+            fd = condition.fileno()
+            by_fd[fd] = condition
+            if condition.connecting:
+                poller.register(fd, select.POLLOUT)
+            else:
+                poller.register(fd, select.POLLIN)
+        try:
+            events = poller.poll(int(math.ceil(timeout * 1000)))
+        except select.error:
+            return []
+        return [by_fd[fd] for fd, event in events]
+
+    readers = [c for c in conditions if not c.connecting]
+    writers = [c for c in conditions if c.connecting]
+    try:
+        (readable, writable, errored) = select.select(readers, writers, writers, timeout)
+    except select.error:
+        return []
+    ready = readable + writable
+    for condition in errored:
+        if condition not in ready:
+            ready.append(condition)
+    return ready
+
+
+def _wait_for_conditions(conditions, quorum):
+    """
+    Wait on all conditions at once until quorum of them are satisfied, or
+    so many have failed that quorum can not be reached any more.
+    """
+    while True:
+        now = time.time()
+        for condition in conditions:
+            condition.expire(now)
+            if condition.satisfied is None and condition.sock is None and condition.next_check <= now:
+                condition.check(now)
+
+        waiting = [c for c in conditions if c.satisfied is None]
+        met = len([c for c in conditions if c.satisfied])
+        if met >= quorum or met + len(waiting) < quorum:
+            break
+
+        wake = []
+        for condition in waiting:
+            wake.append(condition.deadline)
+            if condition.sock is None:
+                wake.append(condition.next_check)
+            elif condition.connecting:
+                wake.append(condition.attempt_end)
+        timeout = max(0, min(wake) - time.time())
+
+        polled = [c for c in waiting if c.sock is not None]
+        if polled:
+            for condition in _ready_conditions(polled, timeout):
+                condition.ready(time.time())
+        else:
+            time.sleep(timeout)
+
+    for condition in conditions:
+        condition.close()
+
+
+def _build_conditions(module, start):
+    """
+    Fill in the items of the conditions option from the task.
+
+    Returns:
+        List of PathCondition and PortCondition
+    """
+    params = module.params
+    conditions = []
+    for item in params['conditions']:
+        if not isinstance(item, dict):
+            module.fail_json(msg="each of conditions must be a hash, got %s" % item)
+        unknown = [key for key in item if key not in CONDITION_KEYS]
+        if unknown:
+            module.fail_json(msg="unsupported keys %s in conditions, use %s" % (', '.join(sorted(unknown)), ', '.join(CONDITION_KEYS)))
+
+        spec = dict(host=params['host'], port=None, path=None, search_regex=None, state=params['state'],
+                    timeout=params['timeout'], connect_timeout=params['connect_timeout'])
+        spec.update(item)
+        try:
+            for key in ('port', 'timeout', 'connect_timeout'):
+                if spec[key] is not None:
+                    spec[key] = int(spec[key])
+        except (TypeError, ValueError):
+            module.fail_json(msg="%s of conditions must be an integer, got %s" % (key, spec[key]))
+        if spec['search_regex'] is not None:
+            try:
+                re.compile(spec['search_regex'])
+            except re.error:
+                e = get_exception()
+                module.fail_json(msg="invalid search_regex %s in conditions: %s" % (spec['search_regex'], str(e)))
+
+        if spec['state'] not in ('started', 'stopped', 'present', 'absent'):
+            module.fail_json(msg="state of conditions must be one of started, stopped, present or absent")
+        if spec['port'] and not spec['path']:
+            conditions.append(PortCondition(spec, start))
+        elif spec['path'] and not spec['port']:
+            if spec['state'] == 'stopped':
+                module.fail_json(msg="state=stopped should only be used for checking a port in the wait_for module")
+            spec['path'] = os.path.expanduser(os.path.expandvars(spec['path']))
+            conditions.append(PathCondition(spec, start))
+        else:
+            module.fail_json(msg="each of conditions needs either a port or a path, got %s" % item)
+    return conditions
+
+
 def main():
 
     module = AnsibleModule(
@@ -362,8 +718,11 @@ def main():
             path=dict(default=None, type='path'),
             search_regex=dict(default=None),
             state=dict(default='started', choices=['started', 'stopped', 'present', 'absent', 'drained']),
-            exclude_hosts=dict(default=None, type='list')
+            exclude_hosts=dict(default=None, type='list'),
+            conditions=dict(default=None, type='list'),
+            quorum=dict(default=None, type='int'),
         ),
+        mutually_exclusive=[['conditions', 'port'], ['conditions', 'path'], ['conditions', 'exclude_hosts']],
     )
 
     params = module.params
@@ -389,13 +748,33 @@ def main():
         module.fail_json(msg="state=drained should only be used for checking a port in the wait_for module")
     if params['exclude_hosts'] is not None and state != 'drained':
         module.fail_json(msg="exclude_hosts should only be with state=drained")
+    if params['quorum'] is not None and params['conditions'] is None:
+        module.fail_json(msg="quorum should only be used with conditions")
 
+    if params['conditions'] is not None:
+        conditions = _build_conditions(module, time.time())
+        quorum = params['quorum']
+        if quorum is None:
+            quorum = len(conditions)
+        if quorum < 1 or quorum > len(conditions):
+            module.fail_json(msg="quorum must be between 1 and the number of conditions, %d" % len(conditions))
 
     start = datetime.datetime.now()
 
     if delay:
         time.sleep(delay)
 
+    if params['conditions'] is not None:
+        _wait_for_conditions(conditions, quorum)
+
+        met = len([c for c in conditions if c.satisfied])
+        results = [c.result() for c in conditions]
+        elapsed = datetime.datetime.now() - start
+        if met < quorum:
+            module.fail_json(msg="Timeout when waiting for %d of %d conditions, %d were met" % (quorum, len(conditions), met),
+                             conditions=results, satisfied=met, quorum=quorum, elapsed=elapsed.seconds)
+        module.exit_json(conditions=results, satisfied=met, quorum=quorum, elapsed=elapsed.seconds)
+
     if not port and not path and state != 'drained':
         time.sleep(timeout)
     elif state in [ 'stopped', 'absent' ]:
@@ -534,5 +913,6 @@ def main():
 
 # import module snippets
 from ansible.module_utils.basic import *
+from ansible.module_utils._text import to_native
 if __name__ == '__main__':
     main()